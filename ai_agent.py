@@ -1,15 +1,26 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
 from database import db
-import google.generativeai as genai
+from answer_cache import answer_cache
+from intent_classifier import intent_classifier
+from llm_client import create_model, create_client
+from summarizer import summarizer, estimate_tokens
+import asyncio
 import json
+import os
+import threading
+import metrics
+import tracing
+from tracing import Trace
 from datetime import datetime, timedelta
-import re
+
+# format_response-ийн prompt өөрчлөгдөх бүрт нэмэгдүүлэх (хуучин cache-ийг хүчингүй болгоно)
+PROMPT_VERSION = "2"
 
 class BusinessAIAgent:
     def __init__(self, api_key: str):
-        # Gemini API тохируулах
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+        # Gemini API тохируулах (дуудлагууд LLMClient-ээр: timeout, concurrency хязгаар, retry)
+        self.model = create_model(api_key)
+        self.llm = create_client(self.model)
         self.system_prompt = """Та нь retail beverage ordering системийн бизнесийн мэдээлэл өгөх AI туслах юм.
 
 Таны үүрэг:
@@ -19,77 +30,10 @@ class BusinessAIAgent:
 
 Асуултуудыг шинжилж, зөв database query-г сонгох хэрэгтэй."""
 
-    def parse_query(self, user_query: str) -> Dict[str, Any]:
+    async def parse_query(self, user_query: str) -> Dict[str, Any]:
         """Хэрэглэгчийн асуултыг шинжлэх"""
-        query_lower = user_query.lower()
-        
-        # Query төрөл тодорхойлох
-        query_type = None
-        filters = {}
-        
-        # SKU асуулт
-        if any(word in query_lower for word in ['sku', 'бүтээгдэхүүн', 'product', 'item']):
-            query_type = "sku"
-            # SKU ID эсвэл нэр олох
-            sku_match = re.search(r'sku[:\s]+(\d+)', query_lower)
-            if sku_match:
-                filters['sku_id'] = int(sku_match.group(1))
-        
-        # Merchant асуулт
-        if any(word in query_lower for word in ['merchant', 'худалдаачин', 'client', 'customer']):
-            query_type = "merchant"
-            merchant_match = re.search(r'merchant[:\s]+(\d+)', query_lower)
-            if merchant_match:
-                filters['merchant_id'] = int(merchant_match.group(1))
-        
-        # District асуулт
-        if any(word in query_lower for word in ['district', 'бүс', 'region', 'area']):
-            query_type = "district"
-            # District нэр олох
-            district_match = re.search(r'district[:\s]+([a-zа-я\s]+)', query_lower, re.IGNORECASE)
-            if district_match:
-                filters['district'] = district_match.group(1).strip()
-        
-        # Time period асуулт
-        if any(word in query_lower for word in ['day', 'week', 'month', 'өдөр', 'долоо хоног', 'сар']):
-            if 'daily' in query_lower or 'өдөр' in query_lower:
-                query_type = "time_period"
-                filters['period'] = "daily"
-            elif 'week' in query_lower or 'долоо хоног' in query_lower:
-                query_type = "time_period"
-                filters['period'] = "weekly"
-            elif 'month' in query_lower or 'сар' in query_lower:
-                query_type = "time_period"
-                filters['period'] = "monthly"
-        
-        # Sales rep асуулт
-        if any(word in query_lower for word in ['sales rep', 'rep', 'төлөөлөгч', 'salesperson']):
-            query_type = "sales_rep"
-            rep_match = re.search(r'rep[:\s]+(\d+)', query_lower)
-            if rep_match:
-                filters['sales_rep_id'] = int(rep_match.group(1))
-        
-        # Top/Insights асуулт
-        if any(word in query_lower for word in ['top', 'best', 'highest', 'дээд', 'хамгийн']):
-            if 'sku' in query_lower:
-                query_type = "top_skus"
-            elif 'district' in query_lower or 'trend' in query_lower:
-                query_type = "district_trends"
-            elif 'category' in query_lower:
-                query_type = "category_summary"
-        
-        # Date range олох
-        date_pattern = r'(\d{4}-\d{2}-\d{2})'
-        dates = re.findall(date_pattern, user_query)
-        if len(dates) >= 2:
-            filters['start_date'] = dates[0]
-            filters['end_date'] = dates[1]
-        elif len(dates) == 1:
-            filters['start_date'] = dates[0]
-        
-        # Хэрэв тодорхойлогдоогүй бол LLM ашиглах
-        if not query_type:
-            query_type = self._classify_with_llm(user_query)
+        # Түлхүүр үгсээр хурдан ангилах, тохирохгүй бол LLM (memo-той)
+        query_type, filters = await intent_classifier.classify_async(user_query, fallback=self._classify_with_llm)
         
         return {
             'type': query_type,
@@ -97,9 +41,8 @@ class BusinessAIAgent:
             'original_query': user_query
         }
     
-    def _classify_with_llm(self, query: str) -> str:
-        """LLM ашиглан query төрөл тодорхойлох"""
-        prompt = f"""Дараах асуултыг шинжилж, query төрлийг тодорхойл:
+    def _classification_prompt(self, query: str) -> str:
+        return f"""Дараах асуултыг шинжилж, query төрлийг тодорхойл:
         
 Асуулт: {query}
 
@@ -114,18 +57,20 @@ class BusinessAIAgent:
 - category_summary: Category summary
 
 Зөвхөн төрлийн нэрийг хариул (жишээ: sku)"""
-        
+
+    async def _classify_with_llm(self, query: str) -> Optional[str]:
+        """LLM ашиглан query төрөл тодорхойлох (алдаа эсвэл хоосон хариу бол None - memo-д орохгүй)"""
+        prompt = self._classification_prompt(query)
+        tracing.annotate(classify_prompt_tokens=estimate_tokens(prompt))
         try:
-            response = self.model.generate_content(prompt)
-            # Gemini response-ийг авах
-            if hasattr(response, 'text') and response.text:
-                return response.text.strip().lower()
-            elif hasattr(response, 'candidates') and response.candidates:
-                return response.candidates[0].content.parts[0].text.strip().lower()
-            return "general"
+            with tracing.stage("llm_classify"):
+                text = await self.llm.generate(prompt, operation="classify")
+            return text.strip().lower() if text else None
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             print(f"Gemini API алдаа: {e}")
-            return "general"
+            return None
     
     def execute_query(self, parsed_query: Dict[str, Any]) -> Any:
         """Query ажиллуулах"""
@@ -190,48 +135,151 @@ class BusinessAIAgent:
         # LLM ашиглан SQL query үүсгэх эсвэл бусад query ажиллуулах
         return {"message": "Энэ төрлийн асуултыг одоогоор дэмжихгүй байна"}
     
-    def format_response(self, data: Any, query_type: str) -> str:
-        """Хариуг форматлах"""
-        if isinstance(data, dict) and 'error' in data:
-            return f"Алдаа гарлаа: {data['error']}"
-        
-        if not data:
-            return "Мэдээлэл олдсонгүй."
-        
-        # LLM ашиглан хариуг форматлах
-        full_prompt = f"""{self.system_prompt}
+    def _format_prompt(self, data: Any, query_type: str) -> Tuple[str, Dict[str, Any]]:
+        """Хариу форматлах prompt. Үр дүнг token budget-д багтаан товчилно."""
+        compact, info = summarizer.summarize(data)
+        prompt = f"""{self.system_prompt}
 
-Дараах database query-ийн үр дүнг хэрэглэгчид ойлгомжтой хэлбэрээр тайлбарла:
+Дараах database query-ийн үр дүнг хэрэглэгчид ойлгомжтой хэлбэрээр тайлбарла.
+Үр дүн "багана|багана" хэлбэрийн хүснэгт, эсвэл (мөр олон бол) хураангуй байна:
 
 Query төрөл: {query_type}
-Үр дүн: {json.dumps(data, indent=2, default=str)}
+Үр дүн:
+{compact}
 
 Хариуг Монгол хэлээр, товч, ойлгомжтой байлга. Тоон мэдээлэл, харьцуулалт, insights оруул."""
+        prompt_tokens = estimate_tokens(prompt)
+        info["prompt_tokens_after"] = prompt_tokens
+        info["prompt_tokens_before"] = prompt_tokens - info["tokens_after"] + info["tokens_before"]
+        tracing.annotate(prompt_mode=info["mode"], prompt_tokens_before=info["prompt_tokens_before"],
+                         prompt_tokens_after=info["prompt_tokens_after"])
+        return prompt, info
+
+    @staticmethod
+    def _static_response(data: Any) -> Optional[str]:
+        """LLM шаардлагагүй хариу (алдаа, хоосон үр дүн)"""
+        if isinstance(data, dict) and 'error' in data:
+            return f"Алдаа гарлаа: {data['error']}"
+        if not data:
+            return "Мэдээлэл олдсонгүй."
+        return None
+
+    async def format_response(self, data: Any, query_type: str) -> str:
+        """Хариуг форматлах"""
+        static = self._static_response(data)
+        if static is not None:
+            return static
+        
+        # Ижил өгөгдөл, query төрөлд өмнө нь гаргасан хариу байвал LLM дуудахгүй
+        cache_key = answer_cache.make_key(query_type, data, PROMPT_VERSION)
+        cached = answer_cache.get(cache_key)
+        tracing.annotate(answer_cached=cached is not None)
+        if cached is not None:
+            return cached
         
+        # LLM ашиглан хариуг форматлах
         try:
-            response = self.model.generate_content(full_prompt)
-            # Gemini response-ийг авах
-            if hasattr(response, 'text') and response.text:
-                return response.text
-            elif hasattr(response, 'candidates') and response.candidates:
-                return response.candidates[0].content.parts[0].text
+            prompt, _ = self._format_prompt(data, query_type)
+            with tracing.stage("llm_format"):
+                text = await self.llm.generate(prompt, operation="format")
+            if text:
+                answer_cache.set(cache_key, text)
+                return text
             # Fallback формат
             return json.dumps(data, indent=2, default=str)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             print(f"Gemini API алдаа: {e}")
             # Fallback формат
             return json.dumps(data, indent=2, default=str)
     
-    def answer(self, user_query: str) -> str:
-        """Асуултанд хариулах"""
-        # Query шинжлэх
-        parsed_query = self.parse_query(user_query)
-        
-        # Query ажиллуулах
-        data = self.execute_query(parsed_query)
+    async def answer_async(self, user_query: str, trace: Optional[Trace] = None) -> str:
+        """Асуултанд хариулах (event loop-ыг блоклохгүй; cancel хийвэл LLM дуудлага зогсоно)
         
-        # Хариуг форматлах
-        response = self.format_response(data, parsed_query['type'])
+        trace өгвөл үе шат бүрийн хугацаа, prompt-ын хэмжээ түүнд бичигдэнэ.
+        """
+        trace = trace or Trace()
+        with tracing.activate(trace):
+            tracing.annotate(question=user_query)
+            # Query шинжлэх
+            with tracing.stage("parse"):
+                parsed_query = await self.parse_query(user_query)
+            tracing.annotate(intent=parsed_query['type'], filters=parsed_query['filters'])
+            
+            # Query ажиллуулах (sync pool тул thread дээр)
+            with tracing.stage("db"):
+                data = await asyncio.to_thread(self.execute_query, parsed_query)
+            tracing.annotate(rows=len(data) if isinstance(data, list) else None)
+            
+            # Хариуг форматлах
+            with tracing.stage("format"):
+                response = await self.format_response(data, parsed_query['type'])
         
+        metrics.AGENT_SECONDS.observe(trace.finish() / 1000, parsed_query['type'])
+        tracing.log_if_slow(trace)
         return response
+    
+    async def answer_stream(self, user_query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Асуултанд хариулах явцыг event-үүдээр (parse, query, token, done) дамжуулах"""
+        parsed_query = await self.parse_query(user_query)
+        yield {"event": "parse", "data": {"type": parsed_query['type'], "filters": parsed_query['filters']}}
+
+        data = await asyncio.to_thread(self.execute_query, parsed_query)
+        failed = isinstance(data, dict) and 'error' in data
+        rows = len(data) if isinstance(data, list) else None
+        yield {"event": "query", "data": {"status": "error" if failed else "success", "rows": rows}}
+
+        static = self._static_response(data)
+        if static is not None:
+            yield {"event": "token", "data": {"text": static}}
+            yield {"event": "done", "data": {"cached": False}}
+            return
+
+        cache_key = answer_cache.make_key(parsed_query['type'], data, PROMPT_VERSION)
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            yield {"event": "token", "data": {"text": cached}}
+            yield {"event": "done", "data": {"cached": True}}
+            return
+
+        prompt, info = self._format_prompt(data, parsed_query['type'])
+        yield {"event": "prompt", "data": {key: info[key] for key in ("mode", "prompt_tokens_before", "prompt_tokens_after")}}
+
+        parts = []
+        try:
+            async for text in self.llm.stream(prompt, operation="format_stream"):
+                parts.append(text)
+                yield {"event": "token", "data": {"text": text}}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Gemini API алдаа: {e}")
+            if parts:
+                # Хэсэгчилсэн хариу илгээгдсэн тул cache-д хадгалахгүй
+                yield {"event": "error", "data": {"message": "Хариу бүрэн ирсэнгүй"}}
+                return
+        if parts:
+            answer_cache.set(cache_key, "".join(parts))
+        else:
+            # Fallback формат
+            yield {"event": "token", "data": {"text": json.dumps(data, indent=2, default=str)}}
+        yield {"event": "done", "data": {"cached": False}}
+
+    def answer(self, user_query: str, trace: Optional[Trace] = None) -> str:
+        """Асуултанд хариулах (sync дуудагчдад, жишээ нь mcp_server_simple)"""
+        return asyncio.run(self.answer_async(user_query, trace))
+
+
+# Global agent - api.py, MCP серверүүд get_agent()-ээр авна
+_agent: Optional[BusinessAIAgent] = None
+_agent_lock = threading.Lock()
 
+def get_agent() -> BusinessAIAgent:
+    """Agent-ийг анх хэрэглэхэд үүсгэх (Gemini SDK import, тохиргоо процессын эхлэлд биш)"""
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = BusinessAIAgent(os.getenv("GEMINI_API_KEY", ""))
+    return _agent
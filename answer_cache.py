@@ -0,0 +1,166 @@
+"""
+Gemini-ээр форматласан хариултын cache (content-addressed)
+
+Түлхүүр нь (query_type, үр дүнгийн өгөгдөл, prompt version)-ийн SHA-256 hash.
+Санах ойд LRU байдлаар, ANSWER_CACHE_PATH өгвөл SQLite файлд хадгалж restart-ын
+дараа ч ашиглана.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+load_dotenv()
+
+
+class AnswerCache:
+    """Санах ой + сонголтоор SQLite дээрх хариултын cache (TTL, хэмжээний хязгаартай)"""
+
+    # Хэдэн бичилт тутамд disk дээрх хуучин мөрүүдийг цэвэрлэх
+    PRUNE_EVERY = 100
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 86400.0,
+                 path: Optional[str] = None, max_disk_entries: int = 10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (answer, created_at)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        if path:
+            self._open_disk(path)
+
+    def _open_disk(self, path: str):
+        try:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used_idx ON answers (last_used)")
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠ Answer cache файл нээж чадсангүй ({path}): {e}")
+            self._conn = None
+
+    @staticmethod
+    def make_key(query_type: str, data: Any, prompt_version: str) -> str:
+        """Өгөгдлийн агуулгаас хамаарах түлхүүр"""
+        payload = json.dumps(
+            [query_type, prompt_version, data],
+            sort_keys=True, separators=(",", ":"), default=str, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Хариултыг авах (олдохгүй эсвэл хугацаа нь дууссан бол None)"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                answer, created_at = entry
+                if now - created_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return answer
+                del self._memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT answer, created_at FROM answers WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and now - row[1] < self.ttl:
+                        self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+                        self._conn.commit()
+                        self._remember(key, row[0], row[1])
+                        self._stats["disk_hits"] += 1
+                        return row[0]
+                except sqlite3.Error as e:
+                    print(f"⚠ Answer cache унших алдаа: {e}")
+
+            self._stats["misses"] += 1
+            return None
+
+    def _remember(self, key: str, answer: str, created_at: float):
+        self._memory[key] = (answer, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def set(self, key: str, answer: str):
+        """Хариултыг хадгалах"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, answer, now)
+            self._stats["stores"] += 1
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO answers (key, answer, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, answer, now, now)
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune(now)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠ Answer cache бичих алдаа: {e}")
+
+    def _prune(self, now: float):
+        """Хугацаа нь дууссан болон хязгаараас хэтэрсэн (хамгийн удаан хэрэглэгдээгүй) мөрүүдийг устгах"""
+        self._conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl,))
+        self._conn.execute("""
+            DELETE FROM answers WHERE key IN (
+                SELECT key FROM answers ORDER BY last_used ASC
+                LIMIT MAX((SELECT COUNT(*) FROM answers) - ?, 0)
+            )
+        """, (self.max_disk_entries,))
+
+    def clear(self):
+        """Бүх хариултыг устгах"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM answers")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss тоолуур"""
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+            disk_entries = None
+            if self._conn is not None:
+                try:
+                    disk_entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                **self._stats,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "path": self.path,
+            }
+
+
+# Global answer cache instance
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+    path=os.getenv("ANSWER_CACHE_PATH") or None,
+    max_disk_entries=int(os.getenv("ANSWER_CACHE_MAX_DISK_ENTRIES", "10000")),
+)
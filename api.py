@@ -1,20 +1,48 @@
 """
 FastAPI backend for Retail Beverage AI Assistant
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-from database import db
-from ai_agent import BusinessAIAgent
+from fastapi.responses import HTMLResponse, StreamingResponse, Response
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal
+from database import db, next_page_token, MAX_TOP_LIMIT
+from async_database import adb
+import ai_agent
+from ai_agent import get_agent
+from answer_cache import answer_cache
+from intent_classifier import intent_classifier
+from summarizer import summarizer
+import rollups
+import columnar
+import batch
+import metrics
+import serialization
+from tracing import Trace
+from contextvars import ContextVar
+import asyncio
 import os
+import time
+import psycopg2
 from dotenv import load_dotenv
 load_dotenv()
-import json
 
-app = FastAPI(title="Retail Beverage AI Assistant")
+# ?pretty=true үед хариултыг догол мөрлөх (middleware тохируулна)
+_pretty: ContextVar[bool] = ContextVar("pretty", default=False)
+
+class FastJSONResponse(Response):
+    """serialization.dumps-аар (orjson байвал) бичих JSON response"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return serialization.dumps(content, pretty=_pretty.get())
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Endpoint-ийн үр дүнг FastAPI-ийн jsonable_encoder-ийг алгасаж шууд JSON болгох"""
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+app = FastAPI(title="Retail Beverage AI Assistant", default_response_class=FastJSONResponse)
 
 # CORS тохируулах
 app.add_middleware(
@@ -25,12 +53,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Endpoint бүрийн хугацааг metrics-д бүртгэх (stream-ийн хувьд эхний byte хүртэл)"""
+    started = time.perf_counter()
+    status = 500
+    token = _pretty.set(request.query_params.get("pretty", "").lower() in ("1", "true"))
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label нь route-ийн template (/api/sales/sku), бодит path биш
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - started, endpoint, request.method, str(status))
+        _pretty.reset(token)
+
 # Exception handler нэмэх
 @app.exception_handler(ConnectionError)
 async def connection_error_handler(request, exc):
     """Database холболтын алдааг боловсруулах"""
-    from fastapi.responses import JSONResponse
-    return JSONResponse(
+    return json_response(
         status_code=503,
         content={
             "status": "error",
@@ -39,22 +83,129 @@ async def connection_error_handler(request, exc):
         }
     )
 
-# AI agent үүсгэх
-agent = BusinessAIAgent(os.getenv("GEMINI_API_KEY", ""))
+# Client салсныг шалгах интервал (секунд)
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+@app.on_event("startup")
+async def startup():
+    """Rollup хүснэгтүүд, columnar engine-ийг (идэвхжсэн бол) background-д бэлдэх"""
+    rollups.enable_from_env()
+    columnar.enable_from_env()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Холболтуудыг хаах"""
+    await adb.close()
+    db.close()
+
+async def run_until_disconnect(http_request: Request, coro):
+    """Coroutine-ийг ажиллуулж, client салвал цуцлах (LLM дуудлагыг дэмий үргэлжлүүлэхгүй)"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client холболтоо таслав")
+    finally:
+        if not task.done():
+            task.cancel()
+
+# ndjson_response-д мөр дууссаныг илэрхийлэх утга
+_END = object()
+
+def _ndjson_chunks(first, rows, batch_size: int = 500):
+    """Мөрүүдийг NDJSON болгож, batch_size мөр тутамд нэг chunk болгон буцаах
+
+    Дундуур алдаа гарвал (header аль хэдийн илгээгдсэн) error мөрөөр төгсөнө.
+    """
+    lines = [] if first is _END else [serialization.dumps(first, pretty=False)]
+    try:
+        for row in rows:
+            lines.append(serialization.dumps(row, pretty=False))
+            if len(lines) >= batch_size:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+    except Exception as e:
+        print(f"NDJSON stream алдаа: {e}")
+        lines.append(serialization.dumps({"status": "error", "message": str(e)}, pretty=False))
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+async def ndjson_response(rows) -> StreamingResponse:
+    """Sync generator-ийг chunked NDJSON response болгох (Starlette threadpool дээр уншина)
+
+    Эхний мөрийг header илгээхээс өмнө уншдаг тул холболт/SQL-ийн алдаа
+    stream-гүй замтай адил 503/400/500 болно.
+    """
+    rows = iter(rows)
+    try:
+        first = await asyncio.to_thread(next, rows, _END)
+    except (ConnectionError, psycopg2.OperationalError) as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Database холболт байхгүй байна: {str(e)}. Database серверийг шалгана уу."
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(_ndjson_chunks(first, rows), media_type="application/x-ndjson")
+
+def check_stream_options(result_format: str, page_size: Optional[int] = None, cursor: Optional[str] = None):
+    """stream=true нь dict мөрүүдийг бүгдийг нь буцаадаг тул format/page_size/cursor-той хамт өгвөл 400"""
+    ignored = [name for name, value in (("format", result_format != "dicts"), ("page_size", page_size is not None),
+                                        ("cursor", cursor is not None)) if value]
+    if ignored:
+        raise HTTPException(status_code=400, detail=f"stream=true үед {', '.join(ignored)} ашиглах боломжгүй")
+
+def _sse_event(event: str, data: Any) -> str:
+    """Server-Sent Events форматын нэг event"""
+    return f"event: {event}\ndata: {serialization.dumps_str(data, pretty=False)}\n\n"
+
+async def _sse_chunks(events):
+    try:
+        async for item in events:
+            yield _sse_event(item["event"], item["data"])
+    except ConnectionError as e:
+        yield _sse_event("error", {"message": f"Database холболт байхгүй байна: {str(e)}"})
+    except Exception as e:
+        yield _sse_event("error", {"message": str(e)})
+
+def sse_response(events) -> StreamingResponse:
+    """Async event generator-ийг text/event-stream болгох (client салвал Starlette цуцална)"""
+    return StreamingResponse(
+        _sse_chunks(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ?format=: dicts (анхдагч), columnar ({"columns": [...], "data": [[...]]}), arrays (багана бүр жагсаалт)
+ResultFormat = Literal["dicts", "columnar", "arrays"]
+FORMAT_QUERY = Query("dicts", alias="format")
 
 # Request models
 class QueryRequest(BaseModel):
     question: str
+    debug: bool = False
 
 class SalesBySKURequest(BaseModel):
     sku_id: Optional[int] = None
     start_date: Optional[str] = None
     end_date: Optional[str] = None
+    stream: bool = False
+    page_size: Optional[int] = Field(None, ge=1, le=1000)
+    cursor: Optional[str] = None
 
 class SalesByMerchantRequest(BaseModel):
     merchant_id: Optional[int] = None
     start_date: Optional[str] = None
     end_date: Optional[str] = None
+    stream: bool = False
+    page_size: Optional[int] = Field(None, ge=1, le=1000)
+    cursor: Optional[str] = None
 
 class SalesByDistrictRequest(BaseModel):
     district: Optional[str] = None
@@ -70,19 +221,35 @@ class SalesRepPerformanceRequest(BaseModel):
     sales_rep_id: Optional[int] = None
     start_date: Optional[str] = None
     end_date: Optional[str] = None
+    page_size: Optional[int] = Field(None, ge=1, le=1000)
+    cursor: Optional[str] = None
+
+class BatchItem(BaseModel):
+    name: Optional[str] = None
+    query: str
+    params: Dict[str, Any] = {}
+
+class BatchRequest(BaseModel):
+    queries: List[BatchItem]
 
 # API Endpoints
 @app.get("/")
 async def root():
     """Root endpoint"""
-    return {"message": "Retail Beverage AI Assistant API", "status": "running"}
+    return json_response({"message": "Retail Beverage AI Assistant API", "status": "running"})
 
 @app.post("/api/query")
-async def answer_query(request: QueryRequest):
-    """Байгалийн хэл дээрх асуултанд хариулах"""
+async def answer_query(request: QueryRequest, http_request: Request):
+    """Байгалийн хэл дээрх асуултанд хариулах (үе шатуудын хугацаа Server-Timing header-т)"""
+    trace = Trace("api_query")
     try:
-        response = agent.answer(request.question)
-        return {"answer": response, "status": "success"}
+        answer = await run_until_disconnect(http_request, get_agent().answer_async(request.question, trace))
+        result = {"answer": answer, "status": "success"}
+        if request.debug:
+            result["trace"] = trace.to_dict()
+        return json_response(result, headers={"Server-Timing": trace.server_timing()})
+    except HTTPException:
+        raise
     except ConnectionError as e:
         raise HTTPException(
             status_code=503, 
@@ -91,107 +258,230 @@ async def answer_query(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/query/stream")
+async def answer_query_stream(request: QueryRequest):
+    """Асуултын хариуг SSE-ээр дамжуулах (parse, query, token, done event-үүд)"""
+    return sse_response(get_agent().answer_stream(request.question))
+
 @app.post("/api/sales/sku")
-async def get_sales_by_sku(request: SalesBySKURequest):
-    """SKU-аар борлуулалт"""
-    try:
-        result = db.get_sales_by_sku(
+async def get_sales_by_sku(request: SalesBySKURequest, result_format: ResultFormat = FORMAT_QUERY):
+    """SKU-аар борлуулалт (stream=true бол NDJSON)"""
+    if request.stream:
+        check_stream_options(result_format, request.page_size, request.cursor)
+        return await ndjson_response(db.stream(
+            db.build_sales_by_sku,
             sku_id=request.sku_id,
             start_date=request.start_date,
             end_date=request.end_date
+        ))
+    try:
+        result = await adb.get_sales_by_sku(
+            sku_id=request.sku_id,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            page_size=request.page_size,
+            after=request.cursor,
+            result_format=result_format
         )
-        return {"data": result, "status": "success"}
+        return json_response({
+            "data": result,
+            "next_cursor": next_page_token(result, "sku_id", request.page_size),
+            "status": "success"
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/sales/merchant")
-async def get_sales_by_merchant(request: SalesByMerchantRequest):
-    """Merchant-аар борлуулалт"""
-    try:
-        result = db.get_sales_by_merchant(
+async def get_sales_by_merchant(request: SalesByMerchantRequest, result_format: ResultFormat = FORMAT_QUERY):
+    """Merchant-аар борлуулалт (stream=true бол NDJSON)"""
+    if request.stream:
+        check_stream_options(result_format, request.page_size, request.cursor)
+        return await ndjson_response(db.stream(
+            db.build_sales_by_merchant,
             merchant_id=request.merchant_id,
             start_date=request.start_date,
             end_date=request.end_date
+        ))
+    try:
+        result = await adb.get_sales_by_merchant(
+            merchant_id=request.merchant_id,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            page_size=request.page_size,
+            after=request.cursor,
+            result_format=result_format
         )
-        return {"data": result, "status": "success"}
+        return json_response({
+            "data": result,
+            "next_cursor": next_page_token(result, "merchant_id", request.page_size),
+            "status": "success"
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/sales/district")
-async def get_sales_by_district(request: SalesByDistrictRequest):
+async def get_sales_by_district(request: SalesByDistrictRequest, result_format: ResultFormat = FORMAT_QUERY):
     """District-аар борлуулалт"""
     try:
-        result = db.get_sales_by_district(
+        result = await adb.get_sales_by_district(
             district=request.district,
             start_date=request.start_date,
-            end_date=request.end_date
+            end_date=request.end_date,
+            result_format=result_format
         )
-        return {"data": result, "status": "success"}
+        return json_response({"data": result, "status": "success"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/sales/time-period")
-async def get_sales_by_time_period(request: SalesByTimePeriodRequest):
+async def get_sales_by_time_period(request: SalesByTimePeriodRequest, result_format: ResultFormat = FORMAT_QUERY):
     """Цаг хугацааны дагуу борлуулалт"""
     try:
-        result = db.get_sales_by_time_period(
+        result = await adb.get_sales_by_time_period(
             period=request.period,
             start_date=request.start_date,
-            end_date=request.end_date
+            end_date=request.end_date,
+            result_format=result_format
         )
-        return {"data": result, "status": "success"}
+        return json_response({"data": result, "status": "success"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/sales/sales-rep")
-async def get_sales_rep_performance(request: SalesRepPerformanceRequest):
+async def get_sales_rep_performance(request: SalesRepPerformanceRequest, result_format: ResultFormat = FORMAT_QUERY):
     """Sales rep гүйцэтгэл"""
     try:
-        result = db.get_sales_rep_performance(
+        result = await adb.get_sales_rep_performance(
             sales_rep_id=request.sales_rep_id,
             start_date=request.start_date,
-            end_date=request.end_date
+            end_date=request.end_date,
+            page_size=request.page_size,
+            after=request.cursor,
+            result_format=result_format
         )
-        return {"data": result, "status": "success"}
+        return json_response({
+            "data": result,
+            "next_cursor": next_page_token(result, "sales_rep_id", request.page_size),
+            "status": "success"
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/insights/top-skus")
-async def get_top_skus(limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None):
-    """Top SKU-ууд"""
+async def get_top_skus(
+    limit: int = Query(10, ge=1, le=MAX_TOP_LIMIT),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    group_by: Optional[Literal["district", "category", "sales_rep"]] = None,
+    result_format: ResultFormat = FORMAT_QUERY
+):
+    """Top SKU-ууд (group_by өгвөл district/category/sales rep бүрийн top SKU)"""
     try:
-        result = db.get_top_skus(limit=limit, start_date=start_date, end_date=end_date)
-        return {"data": result, "status": "success"}
+        if group_by:
+            result = await adb.get_top_skus_by_group(
+                group_by=group_by, limit=limit, start_date=start_date, end_date=end_date,
+                result_format=result_format
+            )
+        else:
+            result = await adb.get_top_skus(limit=limit, start_date=start_date, end_date=end_date, result_format=result_format)
+        return json_response({"data": result, "status": "success"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/insights/district-trends")
-async def get_district_trends(start_date: Optional[str] = None, end_date: Optional[str] = None):
+async def get_district_trends(start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: ResultFormat = FORMAT_QUERY):
     """District trends"""
     try:
-        result = db.get_district_trends(start_date=start_date, end_date=end_date)
-        return {"data": result, "status": "success"}
+        result = await adb.get_district_trends(start_date=start_date, end_date=end_date, result_format=result_format)
+        return json_response({"data": result, "status": "success"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/insights/category-summary")
-async def get_category_summary(start_date: Optional[str] = None, end_date: Optional[str] = None):
+async def get_category_summary(start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: ResultFormat = FORMAT_QUERY):
     """Category summary"""
     try:
-        result = db.get_category_summary(start_date=start_date, end_date=end_date)
-        return {"data": result, "status": "success"}
+        result = await adb.get_category_summary(start_date=start_date, end_date=end_date, result_format=result_format)
+        return json_response({"data": result, "status": "success"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/insights/merchant-patterns")
-async def get_merchant_patterns(merchant_id: Optional[int] = None):
-    """Merchant ordering patterns"""
+async def get_merchant_patterns(merchant_id: Optional[int] = None, stream: bool = False, result_format: ResultFormat = FORMAT_QUERY):
+    """Merchant ordering patterns (stream=true бол NDJSON)"""
+    if stream:
+        check_stream_options(result_format)
+        return await ndjson_response(db.stream(db.build_merchant_ordering_patterns, merchant_id=merchant_id))
     try:
-        result = db.get_merchant_ordering_patterns(merchant_id=merchant_id)
-        return {"data": result, "status": "success"}
+        result = await adb.get_merchant_ordering_patterns(merchant_id=merchant_id, result_format=result_format)
+        return json_response({"data": result, "status": "success"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/batch")
+async def run_batch(request: BatchRequest):
+    """Олон aggregation-ийг нэг хүсэлтээр зэрэг ажиллуулах (item тус бүрийн хугацаатай)"""
+    try:
+        result = await batch.run_batch_async(adb, [item.model_dump() for item in request.queries])
+        return json_response({"data": result["results"], "elapsed_ms": result["elapsed_ms"], "status": "success"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/stats/pool")
+async def get_pool_stats():
+    """Database connection pool-ийн статистик"""
+    return json_response({"data": {"sync": db.pool_stats(), "async": adb.pool_stats()}, "status": "success"})
+
+@app.get("/api/stats/cache")
+async def get_cache_stats():
+    """Үр дүнгийн cache-ийн hit/miss статистик (timeseries нь хаагдсан bucket-уудын cache)"""
+    return json_response({"data": {**db.cache.stats(), "timeseries": db.timeseries.stats()}, "status": "success"})
+
+@app.get("/api/stats/columnar")
+async def get_columnar_stats():
+    """Columnar engine-ийн ачаалсан мөр, санах ой, сүүлийн refresh"""
+    return json_response({"data": columnar.columnar.stats(), "status": "success"})
+
+@app.get("/api/stats/answer-cache")
+async def get_answer_cache_stats():
+    """Gemini хариултын cache-ийн hit/miss статистик"""
+    return json_response({"data": answer_cache.stats(), "status": "success"})
+
+@app.get("/api/stats/intents")
+async def get_intent_stats():
+    """Асуултын ангиллын статистик (LLM-ээр ангилагдсан хувь)"""
+    return json_response({"data": intent_classifier.stats(), "status": "success"})
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/stats/llm")
+async def get_llm_stats():
+    """Gemini дуудлагын статистик (timeout, retry, идэвхтэй дуудлага)"""
+    # get_agent() дуудахгүй: scrape хийхэд Gemini SDK import хийж, agent үүсгэхгүй
+    agent = ai_agent._agent
+    llm_stats = agent.llm.stats() if agent is not None else {}
+    return json_response({"data": {**llm_stats, "agent_loaded": agent is not None, "prompt": summarizer.stats()},
+                          "status": "success"})
+
+@app.post("/api/cache/invalidate")
+async def invalidate_cache(method: Optional[str] = None):
+    """Үр дүнгийн cache цэвэрлэх (method өгвөл зөвхөн тэр method-ийнх)"""
+    removed = db.invalidate_cache(method)
+    return json_response({"data": {"removed": removed}, "status": "success"})
+
 # Static files (HTML, CSS, JS)
 import os
 static_dir = os.path.join(os.path.dirname(__file__), "static")
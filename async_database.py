@@ -0,0 +1,160 @@
+"""
+Async PostgreSQL холболт (psycopg3 + psycopg_pool)
+Database-тэй ижил query method-уудтай, FastAPI event loop-ийг блоклохгүй
+"""
+import asyncio
+import os
+import time
+from typing import List, Dict, Any, Optional
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import AsyncConnectionPool
+from psycopg_pool import PoolTimeout as AsyncPoolTimeout
+from database import SalesQueries, connection_params, check_result_format, check_limit, shape_rows, format_rows, copy_result
+from result_cache import result_cache
+from timeseries_cache import timeseries_cache
+import metrics
+from dotenv import load_dotenv
+load_dotenv()
+
+
+class AsyncDatabase(SalesQueries):
+    def __init__(self):
+        self.pool: Optional[AsyncConnectionPool] = None
+        self._pool_lock: Optional[asyncio.Lock] = None
+        self.cache = result_cache
+        self.timeseries = timeseries_cache
+
+    async def _get_pool(self) -> AsyncConnectionPool:
+        """Pool-ийг анх хэрэглэх үед нээх"""
+        if self.pool is not None:
+            return self.pool
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            if self.pool is None:
+                pool = AsyncConnectionPool(
+                    kwargs={**connection_params(), "autocommit": True, "row_factory": dict_row},
+                    min_size=int(os.getenv("DATABASE_POOL_MIN", "1")),
+                    max_size=int(os.getenv("DATABASE_POOL_MAX", "10")),
+                    timeout=float(os.getenv("DATABASE_POOL_TIMEOUT", "10")),
+                    check=AsyncConnectionPool.check_connection,
+                    open=False,
+                )
+                await pool.open()
+                self.pool = pool
+        return self.pool
+
+    async def execute_query(self, query: str, params: Optional[tuple] = None, template: str = "custom",
+                            result_format: str = "dicts") -> Any:
+        """SQL query ажиллуулах (template нь metrics-ийн label, result_format-ийг database.RESULT_FORMATS-аас харна уу)"""
+        check_result_format(result_format)
+        started = time.perf_counter()
+        pool = await self._get_pool()
+        try:
+            async with pool.connection() as conn:
+                if result_format == "dicts":
+                    cur = await conn.execute(query, params)
+                    rows = await cur.fetchall()
+                else:
+                    # Мөр бүрт баганын нэрийг давтахгүй - tuple мөрүүд
+                    async with conn.cursor(row_factory=tuple_row) as cur:
+                        await cur.execute(query, params)
+                        rows = await cur.fetchall()
+                        columns = [column.name for column in cur.description]
+        except AsyncPoolTimeout as e:
+            metrics.observe_query(template, time.perf_counter() - started, error=True)
+            raise ConnectionError(f"Database холболт авах хугацаа дууслаа: {e}") from e
+        except Exception as e:
+            print(f"Query алдаа: {e}")
+            metrics.observe_query(template, time.perf_counter() - started, error=True)
+            raise
+        metrics.observe_query(template, time.perf_counter() - started, len(rows))
+        return rows if result_format == "dicts" else shape_rows(columns, rows, result_format)
+
+    async def _fetch(self, method: str, builder, result_format: str = "dicts", **params) -> Any:
+        """Query-г cache-ээс эсвэл database-ээс авах (формат бүр cache-д тусдаа)"""
+        check_result_format(result_format)
+        key = self.cache.make_key(method, params if result_format == "dicts" else {**params, "result_format": result_format})
+        hit, rows = self.cache.get(key)
+        if not hit:
+            if self.columnar is not None and self.columnar.can_serve(method, params):
+                # NumPy-ийн тооцоо CPU ашигладаг тул event loop-ийг блоклохгүй
+                rows = format_rows(await asyncio.to_thread(self.columnar.query, method, **params), result_format, method)
+            else:
+                rows = await self.execute_query(*builder(**params), template=method, result_format=result_format)
+            self.cache.set(key, rows)
+        return copy_result(rows)
+
+    async def get_sales_by_sku(self, sku_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: Optional[int] = None, after: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """SKU-аар борлуулалт авах"""
+        return await self._fetch("get_sales_by_sku", self.build_sales_by_sku, result_format=result_format, sku_id=sku_id, start_date=start_date, end_date=end_date, page_size=page_size, after=after)
+
+    async def get_sales_by_merchant(self, merchant_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: Optional[int] = None, after: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """Merchant-аар борлуулалт авах"""
+        return await self._fetch("get_sales_by_merchant", self.build_sales_by_merchant, result_format=result_format, merchant_id=merchant_id, start_date=start_date, end_date=end_date, page_size=page_size, after=after)
+
+    async def get_sales_by_district(self, district: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """District-аар борлуулалт авах"""
+        return await self._fetch("get_sales_by_district", self.build_sales_by_district, result_format=result_format, district=district, start_date=start_date, end_date=end_date)
+
+    async def get_sales_by_time_period(self, period: str = "daily", start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """Цаг хугацааны дагуу борлуулалт авах (daily/weekly/monthly)
+
+        Хаагдсан bucket-уудыг timeseries_cache-ээс, бусдыг нь database-ээс (зэрэг) авна.
+        """
+        check_result_format(result_format)
+        params = {"period": period, "start_date": start_date, "end_date": end_date}
+        # Columnar engine бүх хугацааг санах ойд тооцдог тул bucket-д хуваах шаардлагагүй
+        if self.columnar is not None and self.columnar.can_serve("get_sales_by_time_period", params):
+            plan = None
+        else:
+            plan = self.timeseries.plan(period, start_date, end_date)
+        if plan is None:
+            return await self._fetch("get_sales_by_time_period", self.build_sales_by_time_period, result_format=result_format, **params)
+        # Үлдсэн хэсгүүд ч үр дүнгийн cache-ээр дамжина (before нь cache key-д орно)
+        results = await asyncio.gather(*(
+            self._fetch("get_sales_by_time_period", self.build_sales_by_time_period, period=period, **query["params"])
+            for query in plan["queries"]
+        ))
+        return format_rows(self.timeseries.merge(plan, results), result_format, "get_sales_by_time_period")
+
+    async def get_sales_rep_performance(self, sales_rep_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: Optional[int] = None, after: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """Sales rep-ийн гүйцэтгэл авах"""
+        return await self._fetch("get_sales_rep_performance", self.build_sales_rep_performance, result_format=result_format, sales_rep_id=sales_rep_id, start_date=start_date, end_date=end_date, page_size=page_size, after=after)
+
+    async def get_top_skus(self, limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """Хамгийн их борлуулалттай SKU-ууд"""
+        check_limit(limit)
+        return await self._fetch("get_top_skus", self.build_top_skus, result_format=result_format, limit=limit, start_date=start_date, end_date=end_date)
+
+    async def get_top_skus_by_group(self, group_by: str, limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """District/category/sales rep бүрийн top SKU-ууд (нэг query-гээр)"""
+        check_limit(limit)
+        return await self._fetch("get_top_skus_by_group", self.build_top_skus_by_group, result_format=result_format, group_by=group_by, limit=limit, start_date=start_date, end_date=end_date)
+
+    async def get_district_trends(self, start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """District-ийн чиг хандлага"""
+        return await self.get_sales_by_district(start_date=start_date, end_date=end_date, result_format=result_format)
+
+    async def get_category_summary(self, start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """Категори-ийн хураангуй"""
+        return await self._fetch("get_category_summary", self.build_category_summary, result_format=result_format, start_date=start_date, end_date=end_date)
+
+    async def get_merchant_ordering_patterns(self, merchant_id: Optional[int] = None, result_format: str = "dicts") -> Any:
+        """Merchant-ийн захиалгын хэв маяг"""
+        return await self._fetch("get_merchant_ordering_patterns", self.build_merchant_ordering_patterns, result_format=result_format, merchant_id=merchant_id)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Async connection pool-ийн статистик"""
+        if self.pool is None:
+            return {"opened": False}
+        return {"opened": True, **self.pool.get_stats()}
+
+    async def close(self):
+        """Холболтын pool хаах"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+# Global async database instance (lazy pool)
+adb = AsyncDatabase()
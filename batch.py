@@ -0,0 +1,171 @@
+"""
+Олон aggregation-ийг нэг хүсэлтээр зэрэг ажиллуулах (/api/batch, MCP batch_query болон call_tools tool)
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+from result_cache import ResultCache
+from dotenv import load_dotenv
+load_dotenv()
+
+# Batch-д зөвшөөрөгдсөн query-нүүд: нэр -> (Database method, зөвшөөрөгдсөн параметрүүд)
+DATE_PARAMS = {"start_date", "end_date"}
+BATCH_QUERIES: Dict[str, Tuple[str, set]] = {
+    "sales_by_sku": ("get_sales_by_sku", {"sku_id", "page_size", "after"} | DATE_PARAMS),
+    "sales_by_merchant": ("get_sales_by_merchant", {"merchant_id", "page_size", "after"} | DATE_PARAMS),
+    "sales_by_district": ("get_sales_by_district", {"district"} | DATE_PARAMS),
+    "sales_by_time_period": ("get_sales_by_time_period", {"period"} | DATE_PARAMS),
+    "sales_rep_performance": ("get_sales_rep_performance", {"sales_rep_id", "page_size", "after"} | DATE_PARAMS),
+    "top_skus": ("get_top_skus", {"limit"} | DATE_PARAMS),
+    "top_skus_by_group": ("get_top_skus_by_group", {"group_by", "limit"} | DATE_PARAMS),
+    "district_trends": ("get_district_trends", set(DATE_PARAMS)),
+    "category_summary": ("get_category_summary", set(DATE_PARAMS)),
+    "merchant_patterns": ("get_merchant_ordering_patterns", {"merchant_id"}),
+}
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "20"))
+
+
+def resolve_item(item: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Batch item-ийг (method нэр, параметрүүд) болгох. Буруу бол ValueError"""
+    query = item.get("query")
+    if query not in BATCH_QUERIES:
+        raise ValueError(f"Тодорхойгүй query: {query}. Боломжтой: {', '.join(BATCH_QUERIES)}")
+    method, allowed = BATCH_QUERIES[query]
+    params = {k: v for k, v in (item.get("params") or {}).items() if v is not None}
+    unknown = set(params) - allowed
+    if unknown:
+        raise ValueError(f"{query}: тодорхойгүй параметр {', '.join(sorted(unknown))}")
+    return method, params
+
+
+def validate_items(items: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Бүх item-ийг шалгах (нэг нь буруу бол бүхэлд нь татгалзана)"""
+    if not items:
+        raise ValueError("Batch хоосон байна")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"Batch-д хамгийн ихдээ {BATCH_MAX_ITEMS} query байна")
+    return [resolve_item(item) for item in items]
+
+
+def _item_result(item: Dict[str, Any], index: int, outcome: Dict[str, Any]) -> Dict[str, Any]:
+    return {"name": item.get("name") or f"{item['query']}_{index}", "query": item["query"], **outcome}
+
+
+def _dedupe(resolved: List[Tuple[str, Dict[str, Any]]]) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[int]]:
+    """Ижил (method, параметр)-тэй item-уудыг нэг удаа л ажиллуулах"""
+    unique, index_of, mapping = [], {}, []
+    for method, params in resolved:
+        key = ResultCache.make_key(method, params)
+        if key not in index_of:
+            index_of[key] = len(unique)
+            unique.append((method, params))
+        mapping.append(index_of[key])
+    return unique, mapping
+
+
+async def run_batch_async(database, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """AsyncDatabase дээр query-нүүдийг зэрэг ажиллуулах"""
+    started = time.perf_counter()
+    unique, mapping = _dedupe(validate_items(items))
+
+    async def run(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            data = await getattr(database, method)(**params)
+            outcome = {"status": "success", "data": data}
+        except Exception as e:
+            outcome = {"status": "error", "error": str(e)}
+        outcome["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return outcome
+
+    outcomes = await asyncio.gather(*(run(method, params) for method, params in unique))
+    return {
+        "results": [_item_result(item, i, outcomes[mapping[i]]) for i, item in enumerate(items)],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def run_batch(database, items: List[Dict[str, Any]], max_workers: int = 4) -> Dict[str, Any]:
+    """Sync Database дээр query-нүүдийг thread pool-оор зэрэг ажиллуулах (connection pool хуваалцана)"""
+    started = time.perf_counter()
+    unique, mapping = _dedupe(validate_items(items))
+
+    def run(job: Tuple[str, Dict[str, Any]]) -> Dict[str, Any]:
+        method, params = job
+        t0 = time.perf_counter()
+        try:
+            data = getattr(database, method)(**params)
+            outcome = {"status": "success", "data": data}
+        except Exception as e:
+            outcome = {"status": "error", "error": str(e)}
+        outcome["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as executor:
+        outcomes = list(executor.map(run, unique))
+    return {
+        "results": [_item_result(item, i, outcomes[mapping[i]]) for i, item in enumerate(items)],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+# call_tools-оор нэг дуудлагад нийлүүлж болох MCP tool-ууд (LLM дууддаг answer_business_question орохгүй)
+SALES_TOOLS = (
+    "get_sales_by_sku", "get_sales_by_merchant", "get_sales_by_district", "get_sales_by_time_period",
+    "get_sales_rep_performance", "get_top_skus", "get_district_trends", "get_category_summary",
+)
+
+
+def validate_tool_calls(calls: List[Dict[str, Any]], allowed: Tuple[str, ...] = SALES_TOOLS) -> List[Tuple[str, Dict[str, Any]]]:
+    """call_tools-ийн дуудлагуудыг (tool нэр, arguments) болгох. Буруу бол ValueError"""
+    if not calls:
+        raise ValueError("calls хоосон байна")
+    if len(calls) > BATCH_MAX_ITEMS:
+        raise ValueError(f"Нэг дуудлагад хамгийн ихдээ {BATCH_MAX_ITEMS} tool байна")
+    resolved = []
+    for call in calls:
+        name = call.get("name") if isinstance(call, dict) else None
+        if name not in allowed:
+            raise ValueError(f"call_tools-оор ажиллуулах боломжгүй tool: {name}. Боломжтой: {', '.join(allowed)}")
+        resolved.append((name, call.get("arguments") or {}))
+    return resolved
+
+
+def _tool_outcome(run_tool, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        outcome = {"status": "success", "data": run_tool(name, arguments)}
+    except Exception as e:
+        outcome = {"status": "error", "error": str(e)}
+    outcome["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return outcome
+
+
+def run_tool_calls(run_tool, calls: List[Dict[str, Any]], allowed: Tuple[str, ...] = SALES_TOOLS,
+                   max_workers: int = 4) -> Dict[str, Any]:
+    """Sync run_tool(name, arguments)-аар tool-уудыг зэрэг ажиллуулж, үр дүнг хүсэлтийн дарааллаар буцаах"""
+    started = time.perf_counter()
+    resolved = validate_tool_calls(calls, allowed)
+    unique, mapping = _dedupe(resolved)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as executor:
+        outcomes = list(executor.map(lambda job: _tool_outcome(run_tool, *job), unique))
+    return {
+        "results": [{"name": name, **outcomes[mapping[i]]} for i, (name, _) in enumerate(resolved)],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+async def run_tool_calls_async(run_tool, calls: List[Dict[str, Any]], allowed: Tuple[str, ...] = SALES_TOOLS) -> Dict[str, Any]:
+    """run_tool_calls-тэй адил, sync run_tool-ийг asyncio.to_thread-ээр зэрэг ажиллуулна"""
+    started = time.perf_counter()
+    resolved = validate_tool_calls(calls, allowed)
+    unique, mapping = _dedupe(resolved)
+    outcomes = await asyncio.gather(*(asyncio.to_thread(_tool_outcome, run_tool, name, arguments)
+                                      for name, arguments in unique))
+    return {
+        "results": [{"name": name, **outcomes[mapping[i]]} for i, (name, _) in enumerate(resolved)],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
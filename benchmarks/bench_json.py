@@ -0,0 +1,125 @@
+"""
+JSON serialization-ийн benchmark (хуучин json.dumps/jsonable_encoder болон serialization.dumps)
+
+Ашиглах:
+    python -m benchmarks.bench_json
+    python -m benchmarks.bench_json --rows 1000 10000 100000 --repeat 5
+    python -m benchmarks.bench_json --method get_sales_by_sku   # бодит database-ийн мөрүүдээр
+
+Мөрүүд нь get_sales_by_sku-ийн үр дүнтэй ижил бүтэцтэй (int, str, Decimal,
+datetime). Database шаардахгүй (--method өгөөгүй бол). Хувилбар бүрийн
+хамгийн бага хугацаа (ms), хэмжээ (KB), serialization.dumps-тай харьцуулсан
+удаашралыг хэвлэнэ. Мөн result_format (dicts/tuples/columnar/arrays) бүрийн
+Python бүтцийн санах ой (утгуудаас гадна) болон JSON хэмжээг харьцуулна.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Tuple
+import serialization
+from database import RESULT_FORMATS, shape_rows
+
+
+def synthetic_rows(count: int, seed: int = 1) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    started = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        quantity = rng.randint(1, 5000)
+        rows.append({
+            "sku_id": i + 1,
+            "sku_name": f"Ундаа {rng.choice(['Кола', 'Спрайт', 'Ус', 'Жүүс'])} {rng.randint(250, 2000)}мл",
+            "category": rng.choice(["Carbonated", "Water", "Juice", "Energy"]),
+            "order_count": rng.randint(1, 400),
+            "total_quantity": quantity,
+            "total_revenue": Decimal(rng.randint(100, 10_000_000)) / 100,
+            "avg_price": Decimal(rng.randint(100, 500_000)) / 100,
+            "last_order": started + timedelta(seconds=rng.randint(0, 3600 * 24 * 365)),
+        })
+    return rows
+
+
+def database_rows(method: str) -> List[Dict[str, Any]]:
+    from database import db
+    db.cache.enabled = False
+    return getattr(db, method)()
+
+
+def variants() -> List[Tuple[str, Callable[[Any], Any]]]:
+    """(нэр, payload -> bytes/str) хувилбарууд"""
+    items = [
+        ("json indent=2 default=str (хуучин MCP)", lambda payload: json.dumps(payload, indent=2, default=str)),
+    ]
+    try:
+        from fastapi.encoders import jsonable_encoder
+        items.append(("jsonable_encoder + json (хуучин API)",
+                      lambda payload: json.dumps(jsonable_encoder(payload), ensure_ascii=False,
+                                                 allow_nan=False, separators=(",", ":"))))
+    except ImportError:
+        pass
+    items.append((f"serialization.dumps ({serialization.ENGINE})", lambda payload: serialization.dumps(payload)))
+    items.append((f"serialization.dumps pretty ({serialization.ENGINE})",
+                  lambda payload: serialization.dumps(payload, pretty=True)))
+    return items
+
+
+def measure(encode: Callable[[Any], Any], payload: Any, repeat: int) -> Tuple[float, int]:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = encode(payload)
+        best = min(best, time.perf_counter() - started)
+        size = len(output.encode("utf-8") if isinstance(output, str) else output)
+    return best * 1000, size
+
+
+def format_footprint(rows: List[Dict[str, Any]], result_format: str) -> Tuple[int, int, float]:
+    """(бүтцийн санах ой byte, JSON byte, serialize ms) - cursor-ийн tuple мөрүүдээс эхэлж"""
+    columns = list(rows[0].keys()) if rows else []
+    tracemalloc.start()
+    try:
+        # Утгууд (Decimal, str ...) формат бүрт ижил тул зөвхөн мөр/баганын бүтцийг хэмжинэ
+        tuples = [tuple(row[name] for name in columns) for row in rows]
+        result = shape_rows(columns, tuples, result_format)
+        del tuples
+        memory = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    ms, size = measure(serialization.dumps, {"data": result, "status": "success"}, 3)
+    return memory, size, ms
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="JSON serialization benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--method", help="synthetic биш db.<method>() үр дүнг ашиглах (жишээ нь get_sales_by_sku)")
+    args = parser.parse_args(argv)
+
+    if args.method:
+        datasets = [(args.method, database_rows(args.method))]
+    else:
+        datasets = [("synthetic", synthetic_rows(count)) for count in args.rows]
+
+    for label, rows in datasets:
+        payload = {"data": rows, "status": "success"}
+        print(f"\n{label} ({len(rows)} мөр)")
+        timings = [(name, *measure(encode, payload, args.repeat)) for name, encode in variants()]
+        baseline = next(ms for name, ms, _ in timings if name.startswith("serialization.dumps ("))
+        for name, ms, size in timings:
+            print(f"  {name:<48} {ms:>10.1f} ms {size / 1024:>10.1f} KB  x{ms / baseline:.1f}")
+        print(f"  {'result_format':<14}{'санах ой KB':>14}{'JSON KB':>12}{'ms':>10}")
+        for result_format in RESULT_FORMATS:
+            memory, size, ms = format_footprint(rows, result_format)
+            print(f"  {result_format:<14}{memory / 1024:>14.1f}{size / 1024:>12.1f}{ms:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+API болон mcp_server_simple-ийн load test (throughput, p50/p95/p99 latency)
+
+Ашиглах:
+    python -m benchmarks.bench_load --concurrency 8 --requests 200
+    python -m benchmarks.bench_load --scale 5 --reset --output results/scale5.json
+    python -m benchmarks.bench_load --baseline results/main.json   # regression шалгах
+
+API серверийг (--url өгөөгүй бол) LLM_FAKE=1-тэй subprocess-оор, MCP серверийг
+stdin/stdout pipe-аар ажиллуулна. Gemini-г дуудахгүй тул зөвхөн local PostgreSQL
+хэрэгтэй. Үр дүн JSON файлд бичигдэж, --baseline-тэй харьцуулагдана.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlparse
+from benchmarks import datagen
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TOLERANCE = 0.10
+
+
+def _date_window(rng: random.Random) -> Tuple[str, str]:
+    """Сүүлийн 2 жилийн доторх санамсаргүй 30-180 өдрийн интервал"""
+    end = date.today() - timedelta(days=rng.randint(0, 540))
+    start = end - timedelta(days=rng.randint(30, 180))
+    return start.isoformat(), end.isoformat()
+
+
+def _dates(rng: random.Random) -> Dict[str, str]:
+    start, end = _date_window(rng)
+    return {"start_date": start, "end_date": end}
+
+
+# (нэр, HTTP method, path, параметр үүсгэгч)
+HTTP_SCENARIOS: List[Tuple[str, str, str, Callable[[random.Random], Dict[str, Any]]]] = [
+    ("sales/sku", "POST", "/api/sales/sku", lambda rng: _dates(rng)),
+    ("sales/sku (id)", "POST", "/api/sales/sku", lambda rng: {"sku_id": rng.randint(1, 1500), **_dates(rng)}),
+    ("sales/merchant", "POST", "/api/sales/merchant", lambda rng: {"page_size": 100, **_dates(rng)}),
+    ("sales/district", "POST", "/api/sales/district", lambda rng: _dates(rng)),
+    ("sales/time-period", "POST", "/api/sales/time-period",
+     lambda rng: {"period": rng.choice(["daily", "weekly", "monthly"]), **_dates(rng)}),
+    ("sales/sales-rep", "POST", "/api/sales/sales-rep", lambda rng: _dates(rng)),
+    ("insights/top-skus", "GET", "/api/insights/top-skus", lambda rng: {"limit": 10, **_dates(rng)}),
+    ("insights/top-skus (group)", "GET", "/api/insights/top-skus",
+     lambda rng: {"limit": 5, "group_by": rng.choice(["district", "category", "sales_rep"]), **_dates(rng)}),
+    ("insights/district-trends", "GET", "/api/insights/district-trends", lambda rng: _dates(rng)),
+    ("insights/category-summary", "GET", "/api/insights/category-summary", lambda rng: _dates(rng)),
+    ("insights/merchant-patterns", "GET", "/api/insights/merchant-patterns",
+     lambda rng: {"merchant_id": rng.randint(1, 3000)}),
+    ("query (fake LLM)", "POST", "/api/query",
+     lambda rng: {"question": "Top SKU " + " ".join(_date_window(rng))}),
+]
+
+# (нэр, tool, argument үүсгэгч)
+MCP_SCENARIOS: List[Tuple[str, str, Callable[[random.Random], Dict[str, Any]]]] = [
+    ("mcp/get_sales_by_sku", "get_sales_by_sku", lambda rng: _dates(rng)),
+    ("mcp/get_sales_by_merchant", "get_sales_by_merchant", lambda rng: _dates(rng)),
+    ("mcp/get_sales_by_district", "get_sales_by_district", lambda rng: _dates(rng)),
+    ("mcp/get_sales_by_time_period", "get_sales_by_time_period", lambda rng: {"period": "monthly", **_dates(rng)}),
+    ("mcp/get_sales_rep_performance", "get_sales_rep_performance", lambda rng: _dates(rng)),
+    ("mcp/get_top_skus", "get_top_skus", lambda rng: {"limit": 10, **_dates(rng)}),
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Эрэмбэлсэн жагсаалтын percentile (linear interpolation)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ms = [value * 1000 for value in latencies]
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2) if ms else 0.0,
+    }
+
+
+# ---------- HTTP ----------
+
+class HTTPWorker:
+    """Thread бүрт нэг keep-alive холболт"""
+
+    def __init__(self, base_url: str, timeout: float):
+        parsed = urlparse(base_url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.timeout = timeout
+        self.conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, params: Dict[str, Any]) -> int:
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        body, headers = None, {}
+        if method == "GET":
+            path = f"{path}?{urlencode(params)}" if params else path
+        else:
+            body = json.dumps(params)
+            headers["Content-Type"] = "application/json"
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+
+
+def run_http_scenario(base_url: str, method: str, path: str, make_params, requests: int,
+                      concurrency: int, seed: int, timeout: float) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    jobs = [make_params(rng) for _ in range(requests)]
+    local = threading.local()
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    def call(params):
+        worker = getattr(local, "worker", None)
+        if worker is None:
+            worker = local.worker = HTTPWorker(base_url, timeout)
+        started = time.perf_counter()
+        try:
+            ok = worker.request(method, path, params) < 400
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, jobs))
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def start_api_server(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("API сервер эхэлж чадсангүй")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API сервер 30 секундэд бэлэн болсонгүй")
+
+
+# ---------- MCP ----------
+
+class MCPClient:
+    """mcp_server_simple-ийг subprocess-оор ажиллуулж stdin/stdout-оор ярих"""
+
+    def __init__(self, env: Dict[str, str]):
+        self.process = subprocess.Popen(
+            [sys.executable, "mcp_server_simple.py"], cwd=REPO_ROOT, env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1,
+        )
+        self._next_id = 0
+
+    def call_many(self, calls: List[Tuple[str, Dict[str, Any]]], concurrency: int) -> Tuple[List[float], int]:
+        """Хамгийн ихдээ concurrency хүсэлт зэрэг явуулж, хариу бүрийн latency-г хэмжих"""
+        sent: Dict[Any, float] = {}
+        order: List[Any] = []
+        latencies, errors = [], 0
+        pending = list(calls)
+        while pending or sent:
+            while pending and len(sent) < concurrency:
+                tool, arguments = pending.pop(0)
+                self._next_id += 1
+                request = {"jsonrpc": "2.0", "id": self._next_id, "method": "tools/call",
+                           "params": {"name": tool, "arguments": arguments}}
+                sent[self._next_id] = time.perf_counter()
+                order.append(self._next_id)
+                self.process.stdin.write(json.dumps(request) + "\n")
+                self.process.stdin.flush()
+            line = self.process.stdout.readline()
+            if not line:
+                raise RuntimeError("MCP сервер хаагдлаа")
+            try:
+                response = json.loads(line)
+            except ValueError:
+                # Протоколын бус (print) мөрийг алгасна
+                continue
+            # id-гүй хариуг (хуучин протокол) дарааллаар нь тааруулна
+            request_id = response.get("id", order[0])
+            order.remove(request_id)
+            started = sent.pop(request_id)
+            result = response.get("result", {})
+            if "error" in response or "error" in result or result.get("isError"):
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+        return latencies, errors
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+
+
+def run_mcp_scenario(client: MCPClient, tool: str, make_args, requests: int,
+                     concurrency: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    calls = [(tool, make_args(rng)) for _ in range(requests)]
+    started = time.perf_counter()
+    latencies, errors = client.call_many(calls, concurrency)
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+# ---------- Baseline ----------
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """p95 болон throughput-ийг baseline-тай харьцуулж regression-уудыг буцаах"""
+    regressions = []
+    print(f"\n{'scenario':<34}{'p95 ms':>10}{'base':>10}{'Δ':>9}{'rps':>10}{'base':>10}{'Δ':>9}")
+    for name, current in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        p95_delta = (current["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        rps_delta = ((current["throughput_rps"] - base["throughput_rps"]) / base["throughput_rps"]
+                     if base["throughput_rps"] else 0.0)
+        flag = ""
+        if p95_delta > tolerance or rps_delta < -tolerance:
+            flag = "  ✗"
+            regressions.append(name)
+        print(f"{name:<34}{current['p95_ms']:>10.1f}{base['p95_ms']:>10.1f}{p95_delta:>+9.1%}"
+              f"{current['throughput_rps']:>10.1f}{base['throughput_rps']:>10.1f}{rps_delta:>+9.1%}{flag}")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="API/MCP load test")
+    parser.add_argument("--url", help="ажиллаж буй API (өгөөгүй бол subprocess-оор эхлүүлнэ)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="scenario тус бүрийн хүсэлтийн тоо")
+    parser.add_argument("--mcp-concurrency", type=int, default=1)
+    parser.add_argument("--only", help="нэр нь энэ текстийг агуулсан scenario-г л ажиллуулах")
+    parser.add_argument("--skip-mcp", action="store_true")
+    parser.add_argument("--cache", action="store_true", help="үр дүнгийн болон timeseries cache-ийг асаалттай үлдээх")
+    parser.add_argument("--scale", type=float, help="өгвөл эхлээд synthetic өгөгдөл үүсгэнэ")
+    parser.add_argument("--reset", action="store_true", help="--scale-тэй хамт: хүснэгтүүдийг дахин үүсгэх")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "latest.json"))
+    parser.add_argument("--baseline", help="харьцуулах өмнөх үр дүнгийн JSON")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="зөвшөөрөх муудалт (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    if args.scale is not None:
+        datagen.generate(args.scale, args.seed, reset=args.reset)
+
+    env = {**os.environ, "LLM_FAKE": "1", "METRICS_REPORT_INTERVAL": "0"}
+    if not args.cache:
+        env["RESULT_CACHE_ENABLED"] = "0"
+        env["TIMESERIES_CACHE_ENABLED"] = "0"
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "concurrency": args.concurrency,
+            "mcp_concurrency": args.mcp_concurrency,
+            "requests_per_scenario": args.requests,
+            "result_cache": args.cache,
+            "data": datagen.table_counts(),
+        },
+        "scenarios": {},
+    }
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server = start_api_server(args.port, env)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        for i, (name, method, path, make_params) in enumerate(HTTP_SCENARIOS):
+            if args.only and args.only not in name:
+                continue
+            result = run_http_scenario(base_url, method, path, make_params, args.requests,
+                                       args.concurrency, args.seed + i, args.timeout)
+            results["scenarios"][name] = result
+            print(f"{name:<34} {result['throughput_rps']:>8.1f} rps  p50={result['p50_ms']:.1f}ms "
+                  f"p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms errors={result['errors']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    if not args.skip_mcp:
+        client = MCPClient(env)
+        try:
+            for i, (name, tool, make_args) in enumerate(MCP_SCENARIOS):
+                if args.only and args.only not in name:
+                    continue
+                result = run_mcp_scenario(client, tool, make_args, args.requests, args.mcp_concurrency, args.seed + i)
+                results["scenarios"][name] = result
+                print(f"{name:<34} {result['throughput_rps']:>8.1f} rps  p50={result['p50_ms']:.1f}ms "
+                      f"p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms errors={result['errors']}")
+        finally:
+            client.close()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nҮр дүн: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} scenario {args.tolerance:.0%}-аас илүү муудсан: {', '.join(regressions)}")
+            return 1
+        print("\n✓ Baseline-аас муудаагүй")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
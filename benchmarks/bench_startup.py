@@ -0,0 +1,190 @@
+"""
+Серверүүдийн эхлэх хугацааны benchmark (процесс эхэлснээс эхний хариу хүртэл)
+
+Ашиглах:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --only mcp_simple --repeat 10
+    python -m benchmarks.bench_startup --imports          # хамгийн удаан import-ууд
+    python -m benchmarks.bench_startup --output results/startup.json
+
+mcp_simple, mcp_sdk: шинэ процессын stdin-д tools/list (SDK-д initialize-ийн
+дараа) бичээд хариу ирэх хүртэлх хугацаа. api: uvicorn эхэлснээс GET /
+хариулах хүртэлх хугацаа. Database, Gemini шаардахгүй (tools/list нь query
+явуулахгүй). Хувилбар бүрийн min/median-ийг хэвлэнэ.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMEOUT = 60.0
+
+
+def _read_response(process: subprocess.Popen, request_id: int) -> Dict[str, Any]:
+    """stdout-оос request_id-тай хариу ирэх хүртэл унших (протоколын бус мөрийг алгасна)"""
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError("Сервер хариу өгөлгүй хаагдлаа")
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(message, dict) and message.get("id") == request_id:
+            return message
+
+
+def _send(process: subprocess.Popen, message: Dict[str, Any]):
+    process.stdin.write(json.dumps(message) + "\n")
+    process.stdin.flush()
+
+
+def _spawn(script: str, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, script], cwd=REPO_ROOT, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1,
+    )
+
+
+def _stop(process: subprocess.Popen):
+    try:
+        process.stdin.close()
+        process.wait(timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        process.kill()
+        process.wait()
+
+
+def mcp_simple(env: Dict[str, str], port: int) -> float:
+    started = time.perf_counter()
+    process = _spawn("mcp_server_simple.py", env)
+    try:
+        _send(process, {"jsonrpc": "2.0", "id": 1, "method": "tools/list"})
+        response = _read_response(process, 1)
+        elapsed = time.perf_counter() - started
+    finally:
+        _stop(process)
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return elapsed
+
+
+def mcp_sdk(env: Dict[str, str], port: int) -> float:
+    started = time.perf_counter()
+    process = _spawn("mcp_server.py", env)
+    try:
+        _send(process, {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+            "protocolVersion": "2024-11-05", "capabilities": {},
+            "clientInfo": {"name": "bench_startup", "version": "1"}}})
+        _read_response(process, 1)
+        _send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _send(process, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        response = _read_response(process, 2)
+        elapsed = time.perf_counter() - started
+    finally:
+        _stop(process)
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return elapsed
+
+
+def api(env: Dict[str, str], port: int) -> float:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("API сервер эхэлж чадсангүй")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/")
+                conn.getresponse().read()
+                return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"API сервер {TIMEOUT:.0f} секундэд бэлэн болсонгүй")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+TARGETS: Dict[str, Callable[[Dict[str, str], int], float]] = {
+    "mcp_simple": mcp_simple,
+    "mcp_sdk": mcp_sdk,
+    "api": api,
+}
+
+
+def slowest_imports(module: str, env: Dict[str, str], top: int = 15) -> List[Dict[str, Any]]:
+    """python -X importtime-ийн cumulative хугацаагаар хамгийн удаан top import"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "ms": int(cumulative) / 1000})
+    rows.sort(key=lambda row: row["ms"], reverse=True)
+    return rows[:top]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Server startup benchmark")
+    parser.add_argument("--only", choices=sorted(TARGETS), action="append", help="зөвхөн энэ target (олон удаа өгч болно)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--imports", action="store_true", help="module бүрийн хамгийн удаан import-уудыг хэвлэх")
+    parser.add_argument("--output", help="үр дүнг JSON файлд бичих")
+    args = parser.parse_args(argv)
+
+    env = {**os.environ, "METRICS_REPORT_INTERVAL": "0"}
+    results: Dict[str, Any] = {"meta": {"timestamp": datetime.now().isoformat(timespec="seconds"),
+                                        "repeat": args.repeat}, "targets": {}}
+
+    print(f"{'target':<14}{'min ms':>10}{'median ms':>12}")
+    for name in args.only or list(TARGETS):
+        samples: List[float] = []
+        error: Optional[str] = None
+        for _ in range(args.repeat):
+            try:
+                samples.append(TARGETS[name](env, args.port) * 1000)
+            except Exception as e:
+                error = str(e)
+                break
+        if error is not None:
+            print(f"{name:<14}  алдаа: {error}")
+            results["targets"][name] = {"error": error}
+            continue
+        results["targets"][name] = {"min_ms": round(min(samples), 1),
+                                    "median_ms": round(statistics.median(samples), 1)}
+        print(f"{name:<14}{min(samples):>10.1f}{statistics.median(samples):>12.1f}")
+
+    if args.imports:
+        for module in ("mcp_server_simple", "api"):
+            print(f"\n{module}: хамгийн удаан import (cumulative)")
+            for row in slowest_imports(module, env):
+                print(f"  {row['ms']:>8.1f} ms  {row['module']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Benchmark-д зориулсан synthetic retail өгөгдөл (COPY FROM STDIN-ээр bulk load)
+
+Ашиглах:
+    python -m benchmarks.datagen --scale 1 --reset     # ~330k захиалга, ~1M order_items
+    python -m benchmarks.datagen --scale 10 --reset    # ~3.3M захиалга, ~10M order_items
+    python -m benchmarks.datagen --scale 1 --seed 7 --end-date 2024-12-31
+
+Мөрүүдийг Python дээр batch-аар үүсгэж шууд COPY-д дамжуулна (INSERT-гүй).
+Constraint, index-үүдийг ачаалсны дараа үүсгэдэг тул 10M order_items хэдхэн
+минутад орно. Ижил --seed, --scale, --end-date бол яг ижил өгөгдөл үүснэ.
+Merchant, SKU, sales rep, district, category-ийн борлуулалт Zipf маягаар хазайсан.
+"""
+import argparse
+import io
+import math
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import Callable, Dict, Iterator, List, Optional
+from database import db
+
+TABLES = ["order_items", "orders", "sku", "merchants", "sales_reps"]
+
+# Constraint-гүй хүснэгтүүд (ачаалсны дараа CONSTRAINTS-ийг нэмнэ)
+SCHEMA = {
+    "sales_reps": "id INTEGER NOT NULL, name TEXT NOT NULL",
+    "merchants": "id INTEGER NOT NULL, name TEXT NOT NULL, district TEXT",
+    "sku": "id INTEGER NOT NULL, name TEXT NOT NULL, category TEXT",
+    "orders": "id BIGINT NOT NULL, merchant_id INTEGER, sales_rep_id INTEGER, order_date TIMESTAMP NOT NULL",
+    "order_items": "id BIGINT NOT NULL, order_id BIGINT, sku_id INTEGER, quantity INTEGER NOT NULL, price NUMERIC(12, 2) NOT NULL",
+}
+
+CONSTRAINTS = [
+    "ALTER TABLE sales_reps ADD PRIMARY KEY (id)",
+    "ALTER TABLE merchants ADD PRIMARY KEY (id)",
+    "ALTER TABLE sku ADD PRIMARY KEY (id)",
+    "ALTER TABLE orders ADD PRIMARY KEY (id)",
+    "ALTER TABLE order_items ADD PRIMARY KEY (id)",
+    "ALTER TABLE orders ADD FOREIGN KEY (merchant_id) REFERENCES merchants (id)",
+    "ALTER TABLE orders ADD FOREIGN KEY (sales_rep_id) REFERENCES sales_reps (id)",
+    "ALTER TABLE order_items ADD FOREIGN KEY (order_id) REFERENCES orders (id)",
+    "ALTER TABLE order_items ADD FOREIGN KEY (sku_id) REFERENCES sku (id)",
+]
+
+# Id-г өөрсдөө олгосон тул дараагийн INSERT-д зориулж sequence үүсгэнэ
+SEQUENCES = ["sales_reps", "merchants", "sku", "orders", "order_items"]
+
+DISTRICTS = ["Баянзүрх", "Сонгинохайрхан", "Баянгол", "Хан-Уул", "Сүхбаатар", "Чингэлтэй", "Налайх", "Багануур"]
+CATEGORIES = ["Ус", "Газтай ундаа", "Жүүс", "Шар айраг", "Энерги ундаа", "Цай", "Сүүн ундаа", "Кофе"]
+# Ангилал бүрийн үнийн хүрээ (төгрөг)
+PRICE_RANGES = {
+    "Ус": (800, 2500), "Газтай ундаа": (1500, 4500), "Жүүс": (2000, 7000), "Шар айраг": (3000, 9000),
+    "Энерги ундаа": (2500, 6000), "Цай": (1200, 4000), "Сүүн ундаа": (1800, 5500), "Кофе": (2500, 8000),
+}
+
+# scale=1 үеийн хэмжээ. Захиалга шугаман, dimension хүснэгтүүд sqrt(scale)-аар өснө.
+BASE_SIZES = {"sales_reps": 60, "merchants": 3000, "sku": 1500, "orders": 330000}
+ITEMS_PER_ORDER = 3  # дундаж (1..2*N-1 жигд)
+DAYS = 730
+BATCH_ROWS = 50000
+
+
+def sizes_for(scale: float) -> Dict[str, int]:
+    dimension = math.sqrt(scale)
+    return {
+        "sales_reps": max(int(BASE_SIZES["sales_reps"] * dimension), 1),
+        "merchants": max(int(BASE_SIZES["merchants"] * dimension), 1),
+        "sku": max(int(BASE_SIZES["sku"] * dimension), 1),
+        "orders": max(int(BASE_SIZES["orders"] * scale), 1),
+    }
+
+
+def zipf_weights(n: int, s: float = 1.1) -> List[float]:
+    """Zipf маягийн хуримтлагдсан жин (эхний элементүүд илүү олон сонгогдоно)"""
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def table_counts() -> Dict[str, int]:
+    """Хүснэгт бүрийн мөрийн тоо (хүснэгт байхгүй бол хасна)"""
+    counts = {}
+    for table in TABLES:
+        exists = db.execute_query("SELECT to_regclass(%s) IS NOT NULL as present", (table,))
+        if exists[0]["present"]:
+            counts[table] = db.execute_query(f"SELECT COUNT(*) as n FROM {table}")[0]["n"]
+    return counts
+
+
+class DataGenerator:
+    """Seed-тэй, давтагдах synthetic өгөгдөл үүсгэгч (мөр бүр нь tab-аар тусгаарласан текст)"""
+
+    def __init__(self, scale: float = 1.0, seed: int = 42, end_date: Optional[date] = None):
+        self.sizes = sizes_for(scale)
+        self.seed = seed
+        self.end_date = end_date or date.today()
+        self.rng = random.Random(seed)
+        self.sku_prices: List[float] = []
+
+    def sales_reps(self) -> Iterator[str]:
+        for rep_id in range(1, self.sizes["sales_reps"] + 1):
+            yield f"{rep_id}\tSales rep {rep_id}\n"
+
+    def merchants(self) -> Iterator[str]:
+        rng = self.rng
+        districts = rng.choices(DISTRICTS, cum_weights=zipf_weights(len(DISTRICTS), 0.8), k=self.sizes["merchants"])
+        for merchant_id, district in enumerate(districts, start=1):
+            yield f"{merchant_id}\tMerchant {merchant_id}\t{district}\n"
+
+    def skus(self) -> Iterator[str]:
+        rng = self.rng
+        categories = rng.choices(CATEGORIES, cum_weights=zipf_weights(len(CATEGORIES), 0.7), k=self.sizes["sku"])
+        self.sku_prices = [0.0]
+        for sku_id, category in enumerate(categories, start=1):
+            low, high = PRICE_RANGES[category]
+            self.sku_prices.append(round(rng.uniform(low, high), -1))
+            yield f"{sku_id}\tSKU {sku_id}\t{category}\n"
+
+    def orders_and_items(self, write_order: Callable[[str], None], write_item: Callable[[str], None]):
+        """Захиалга болон түүний мөрүүдийг зэрэг үүсгэх (order_items нь order id-г мэдэх ёстой)"""
+        rng = self.rng
+        sizes = self.sizes
+        merchants = range(1, sizes["merchants"] + 1)
+        reps = range(1, sizes["sales_reps"] + 1)
+        skus = range(1, sizes["sku"] + 1)
+        merchant_weights = zipf_weights(sizes["merchants"], 0.9)
+        rep_weights = zipf_weights(sizes["sales_reps"], 0.6)
+        sku_weights = zipf_weights(sizes["sku"], 1.1)
+        start = datetime.combine(self.end_date - timedelta(days=DAYS), datetime.min.time())
+        # Долоо хоногийн өдрөөр хазайлгах (амралтын өдөр цөөн захиалга)
+        day_weights = list(accumulate(0.6 if (start + timedelta(days=d)).weekday() >= 5 else 1.0 for d in range(DAYS)))
+        max_items = max(ITEMS_PER_ORDER * 2 - 1, 1)
+
+        item_id = 0
+        remaining = sizes["orders"]
+        order_id = 0
+        while remaining:
+            batch = min(remaining, BATCH_ROWS)
+            remaining -= batch
+            merchant_ids = rng.choices(merchants, cum_weights=merchant_weights, k=batch)
+            rep_ids = rng.choices(reps, cum_weights=rep_weights, k=batch)
+            days = rng.choices(range(DAYS), cum_weights=day_weights, k=batch)
+            for merchant_id, rep_id, day in zip(merchant_ids, rep_ids, days):
+                order_id += 1
+                order_date = start + timedelta(days=day, seconds=rng.randrange(8 * 3600, 20 * 3600))
+                write_order(f"{order_id}\t{merchant_id}\t{rep_id}\t{order_date:%Y-%m-%d %H:%M:%S}\n")
+                count = rng.randint(1, max_items)
+                for sku_id in rng.choices(skus, cum_weights=sku_weights, k=count):
+                    item_id += 1
+                    quantity = 1 + int(rng.expovariate(0.25))
+                    price = self.sku_prices[sku_id] * rng.choice((1.0, 1.0, 1.0, 0.95, 0.9))
+                    write_item(f"{item_id}\t{order_id}\t{sku_id}\t{quantity}\t{price:.2f}\n")
+
+
+class CopyWriter:
+    """Мөрүүдийг buffer-т цуглуулж batch бүрийг COPY FROM STDIN-ээр илгээх"""
+
+    def __init__(self, cursor, table: str, batch_rows: int = BATCH_ROWS):
+        self.cursor = cursor
+        self.table = table
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._buffer: List[str] = []
+
+    def write(self, line: str):
+        self._buffer.append(line)
+        if len(self._buffer) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        self.cursor.copy_expert(f"COPY {self.table} FROM STDIN", io.StringIO("".join(self._buffer)))
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+
+def generate(scale: float = 1.0, seed: int = 42, reset: bool = False,
+             end_date: Optional[date] = None) -> Dict[str, int]:
+    """Schema үүсгэж synthetic өгөгдлийг COPY-оор ачаалах"""
+    generator = DataGenerator(scale, seed, end_date)
+    started = time.monotonic()
+    with db.transaction() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM pg_class WHERE relname = ANY(%s) AND relkind = 'r'", (TABLES,))
+            if cur.fetchone()[0] and not reset:
+                raise RuntimeError("Хүснэгтүүд аль хэдийн байна. Дахин үүсгэх бол --reset өгнө үү.")
+            cur.execute(f"DROP TABLE IF EXISTS {', '.join(TABLES)} CASCADE")
+            # Index-үүд хүснэгттэй хамт устсан тул migrations.py дахин үүсгэх ёстой
+            cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+            if cur.fetchone()[0]:
+                cur.execute("DELETE FROM schema_migrations")
+            for table, columns in reversed(SCHEMA.items()):
+                cur.execute(f"CREATE TABLE {table} ({columns})")
+
+            for table, rows in (("sales_reps", generator.sales_reps()), ("merchants", generator.merchants()),
+                                ("sku", generator.skus())):
+                writer = CopyWriter(cur, table)
+                for line in rows:
+                    writer.write(line)
+                writer.flush()
+
+            orders, items = CopyWriter(cur, "orders"), CopyWriter(cur, "order_items")
+            generator.orders_and_items(orders.write, items.write)
+            orders.flush()
+            items.flush()
+            print(f"  COPY дууслаа ({time.monotonic() - started:.1f}s): "
+                  f"{orders.rows} захиалга, {items.rows} order_items")
+
+            for statement in CONSTRAINTS:
+                cur.execute(statement)
+            for table in SEQUENCES:
+                cur.execute(f"CREATE SEQUENCE {table}_id_seq OWNED BY {table}.id")
+                cur.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')")
+                cur.execute(f"SELECT setval('{table}_id_seq', COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)")
+    # ANALYZE transaction-ий гадна (commit хийгдсэн өгөгдөл дээр)
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"ANALYZE {', '.join(TABLES)}")
+    counts = table_counts()
+    print(f"✓ Өгөгдөл үүслээ ({time.monotonic() - started:.1f}s): {counts}")
+    print("  Index-үүд: python migrations.py migrate")
+    print("  Rollup ашигладаг бол: python rollups.py rebuild")
+    return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark-ийн synthetic өгөгдөл үүсгэх (COPY)")
+    parser.add_argument("--scale", type=float, default=1.0, help="хэмжээний коэффициент (1 = ~1M order_items)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-date", type=date.fromisoformat, help="хамгийн сүүлийн захиалгын огноо (default өнөөдөр)")
+    parser.add_argument("--reset", action="store_true", help="байгаа хүснэгтүүдийг устгаад дахин үүсгэх")
+    args = parser.parse_args(argv)
+    generate(args.scale, args.seed, args.reset, args.end_date)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
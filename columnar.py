@@ -0,0 +1,698 @@
+"""
+Борлуулалтын aggregation-уудыг санах ойд NumPy багануудаар тооцох (сонголтоор)
+
+Ашиглах:
+    python columnar.py verify [start end]   # engine-ийн үр дүнг SQL-тэй харьцуулах
+    python columnar.py verify --after-refresh [start end]   # хагас ачаалж refresh хийсний дараа
+    python columnar.py stats                # ачаалсан мөр, санах ойн хэмжээ
+
+COLUMNAR_ENABLED=1 үед order_items × orders fact-ийг багана бүрээр нь NumPy
+массивт ачаалж (sku, merchant, sales rep нь dictionary код), get_sales_by_sku,
+get_sales_by_merchant, get_sales_by_district, get_sales_by_time_period,
+get_sales_rep_performance, get_category_summary, get_top_skus-ийг database руу
+query явуулалгүй vectorized group-by-оор тооцно. Database-ийн API өөрчлөгдөхгүй.
+
+COLUMNAR_REFRESH_INTERVAL секунд тутамд сүүлийн order id-аас хойш орсон
+захиалгуудыг нэмж ачаална. Хуучин захиалгын засвар/устгал болон хожим нэмэгдсэн
+мөрийг зөвхөн бүтэн reload (COLUMNAR_RELOAD_INTERVAL) барина. numpy суугаагүй
+бол engine унтарч, бүх query SQL-ээр явна.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from database import SalesQueries, db, decode_page_token
+import metrics
+from dotenv import load_dotenv
+load_dotenv()
+
+# numpy-г зөвхөн engine идэвхжихэд import хийнэ (процессын эхлэлийг удаашруулахгүй)
+np = None
+
+
+def _import_numpy() -> bool:
+    """numpy-г ачаалах. Суугаагүй бол False"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+DAY_US = 86_400_000_000
+EPOCH = datetime(1970, 1, 1)
+FETCH_CHUNK = 200_000
+
+# PostgreSQL-д timestamp (цагийн бүсгүй) болж хувирах огнооны бичлэг
+_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?$")
+
+# Fact-ийн баганууд (SELECT-ийн дарааллаар) ба NumPy төрөл
+FACT_COLUMNS = [
+    ("order_id", "int64"),
+    ("has_order", "bool"),
+    ("merchant", "int64"),
+    ("sales_rep", "int64"),
+    ("ts", "int64"),
+    ("sku", "int64"),
+    ("quantity", "int64"),
+    ("cents", "int64"),
+]
+
+# Мөнгөн дүнг цент (бүхэл тоо) болгож уншдаг тул price-ийн scale <= 2 байх ёстой
+FACTS_QUERY = """
+    SELECT
+        COALESCE(o.id, 0),
+        (o.id IS NOT NULL)::int,
+        COALESCE(o.merchant_id, -1),
+        COALESCE(o.sales_rep_id, -1),
+        COALESCE((EXTRACT(EPOCH FROM o.order_date) * 1000000)::bigint, 0),
+        COALESCE(oi.sku_id, -1),
+        COALESCE(oi.quantity, 0),
+        COALESCE((oi.quantity * oi.price * 100)::bigint, 0)
+    FROM {source}
+"""
+# Бүтэн ачаалал: SQL-ийн LEFT JOIN-уудтай адил захиалгагүй item, item-гүй захиалгыг хоёуланг нь авна
+FULL_SOURCE = "orders o FULL JOIN order_items oi ON oi.order_id = o.id"
+TAIL_SOURCE = "orders o LEFT JOIN order_items oi ON oi.order_id = o.id WHERE o.id > %s"
+# Зөвхөн тодорхой order id хүртэлх ачаалал (verify --after-refresh: үлдсэнийг refresh шинэ захиалга болгон авна)
+UNTIL_SOURCE = FULL_SOURCE + " WHERE o.id IS NULL OR o.id <= %s"
+
+# Dimension: (query, fact дээрх багана). Гурав дахь багана нь бүлэглэх атрибут.
+DIMENSIONS = {
+    "sku": ("SELECT id, name, category FROM sku", "sku"),
+    "merchant": ("SELECT id, name, district FROM merchants", "merchant"),
+    "sales_rep": ("SELECT id, name, NULL FROM sales_reps", "sales_rep"),
+}
+
+# Engine-ээр тооцож болох Database method-ууд
+METHODS = {
+    "get_sales_by_sku": "sales_by_sku",
+    "get_sales_by_merchant": "sales_by_merchant",
+    "get_sales_by_district": "sales_by_district",
+    "get_sales_by_time_period": "sales_by_time_period",
+    "get_sales_rep_performance": "sales_rep_performance",
+    "get_category_summary": "category_summary",
+    "get_top_skus": "top_skus",
+}
+ID_PARAMS = ("sku_id", "merchant_id", "sales_rep_id", "limit", "page_size")
+
+
+def _timestamp_us(value: str) -> int:
+    """'YYYY-MM-DD[ HH:MM[:SS]]' -> epoch-оос хойшхи микросекунд (PostgreSQL-ийн timestamp-тай адил)"""
+    return (datetime.fromisoformat(value) - EPOCH) // timedelta(microseconds=1)
+
+
+def _money(cents) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def _distinct_count(group, values, size: int):
+    """Бүлэг бүрийн COUNT(DISTINCT value)"""
+    if not len(group):
+        return np.zeros(size, dtype=np.int64)
+    values = values - values.min()
+    span = int(values.max()) + 1
+    keys = group.astype(np.int64) * span + values
+    # Мөрүүд захиалгаараа бөөгнөрсөн тул stable (timsort) эрэмбэлэлт бараг шугаман
+    keys.sort(kind="stable")
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    return np.bincount(keys[first] // span, minlength=size)
+
+
+def _encode_dimension(rows: List[tuple], previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Dimension-ийг dictionary-encode хийх
+
+    Өмнөх ачааллын код хэвээр үлдэнэ (fact-ууд түүнийг заадаг), шинэ id төгсгөлд нэмэгдэнэ.
+    Устгагдсан мөр alive=False болно.
+    """
+    ids = list(previous["ids"]) if previous else []
+    names = list(previous["names"]) if previous else []
+    attrs = list(previous["attrs"]) if previous else []
+    index = {id_: code for code, id_ in enumerate(ids)}
+    alive = [False] * len(ids)
+    for id_, name, attr in sorted(rows, key=lambda row: row[0]):
+        code = index.get(id_)
+        if code is None:
+            index[id_] = len(ids)
+            ids.append(id_)
+            names.append(name)
+            attrs.append(attr)
+            alive.append(True)
+        else:
+            names[code] = name
+            attrs[code] = attr
+            alive[code] = True
+    groups = list(dict.fromkeys(attrs))
+    group_index = {value: code for code, value in enumerate(groups)}
+    id_array = np.array(ids, dtype=np.int64)
+    order = np.argsort(id_array, kind="stable")
+    return {
+        "ids": ids,
+        "names": names,
+        "attrs": attrs,
+        "alive": np.array(alive, dtype=bool),
+        "all_alive": all(alive),
+        "groups": groups,
+        "group_codes": np.array([group_index[attr] for attr in attrs], dtype=np.int64),
+        "sorted_ids": id_array[order],
+        "sorted_codes": order,
+    }
+
+
+def _lookup(dimension: Dict[str, Any], ids):
+    """Fact дээрх id-уудыг dimension-ий код болгох (байхгүй бол -1)"""
+    sorted_ids = dimension["sorted_ids"]
+    if not len(sorted_ids):
+        return np.full(len(ids), -1, dtype=np.int32)
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[pos] == ids, dimension["sorted_codes"][pos], -1).astype(np.int32)
+
+
+def _order_rows(rows: List[Dict], id_column: str, page_size: Optional[int] = None,
+                after: Optional[str] = None) -> List[Dict]:
+    """ORDER BY total_sales DESC, id + SalesQueries._paginate-тэй адил keyset pagination"""
+    rows.sort(key=lambda row: (-row["total_sales"], row[id_column]))
+    if not page_size:
+        return rows
+    if after:
+        total_sales, last_id = decode_page_token(after)
+        total_sales = Decimal(total_sales)
+        rows = [row for row in rows
+                if row["total_sales"] < total_sales or (row["total_sales"] == total_sales and row[id_column] > last_id)]
+    return rows[:page_size]
+
+
+class ColumnarEngine:
+    """order_items × orders fact-ийг NumPy багануудаар хадгалж aggregation хийх"""
+
+    def __init__(self, database=db):
+        self.db = database
+        self.ready = False
+        # Query-нүүд энэ snapshot-ийг уншина, refresh шинийг бүтээгээд солино
+        self._data: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.last_refresh: Dict[str, Any] = {}
+
+    # ---------- Ачаалах ----------
+
+    def _fetch_rows(self, query: str, params: Optional[tuple] = None) -> List[tuple]:
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchall()
+
+    def _check_schema(self):
+        """Engine SQL-тэй яг ижил төрөл, утга гаргаж чадах schema эсэхийг шалгах"""
+        rows = self._fetch_rows("""
+            SELECT table_name, column_name, data_type, numeric_scale
+            FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND (table_name, column_name) IN (('orders', 'order_date'), ('order_items', 'quantity'), ('order_items', 'price'))
+        """)
+        types = {f"{table}.{column}": (data_type, scale) for table, column, data_type, scale in rows}
+        problems = []
+        if types.get("orders.order_date", (None,))[0] != "timestamp without time zone":
+            problems.append("orders.order_date нь timestamp without time zone биш")
+        # SUM(bigint/numeric) нь numeric буцаадаг тул зөвхөн integer/smallint
+        if types.get("order_items.quantity", (None,))[0] not in ("integer", "smallint"):
+            problems.append("order_items.quantity нь integer биш")
+        price_type, price_scale = types.get("order_items.price", (None, None))
+        if not (price_type in ("integer", "smallint", "bigint")
+                or (price_type == "numeric" and price_scale is not None and price_scale <= 2)):
+            problems.append("order_items.price нь numeric(p, <=2) биш")
+        if problems:
+            raise RuntimeError("Columnar engine энэ schema-г дэмжихгүй: " + "; ".join(problems))
+
+    def _load_facts(self, source: str, params: Optional[tuple], dimensions: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Fact мөрүүдийг server-side cursor-оор хэсэгчлэн уншиж багана болгох"""
+        chunks = []
+        with self.db.transaction() as conn:
+            with conn.cursor(name="columnar_facts") as cur:
+                cur.itersize = FETCH_CHUNK
+                cur.execute(FACTS_QUERY.format(source=source), params)
+                while True:
+                    rows = cur.fetchmany(FETCH_CHUNK)
+                    if not rows:
+                        break
+                    chunks.append(np.array(rows, dtype=np.int64))
+        matrix = np.concatenate(chunks) if chunks else np.zeros((0, len(FACT_COLUMNS)), dtype=np.int64)
+        del chunks
+        facts = {name: matrix[:, i].astype(dtype) for i, (name, dtype) in enumerate(FACT_COLUMNS)}
+        del matrix
+        for name, (_, column) in DIMENSIONS.items():
+            facts[column] = _lookup(dimensions[name], facts[column])
+        facts["quantity"] = facts["quantity"].astype(np.int32)
+        # Захиалга бүрийн эхний мөр: захиалгын түвшний бүлгүүдийн COUNT(DISTINCT o.id)
+        first = np.zeros(len(facts["order_id"]), dtype=bool)
+        real = np.flatnonzero(facts["has_order"])
+        _, index = np.unique(facts["order_id"][real], return_index=True)
+        first[real[index]] = True
+        facts["order_first"] = first
+        return facts
+
+    def _load_dimensions(self, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: _encode_dimension(self._fetch_rows(query), previous["dims"][name] if previous else None)
+            for name, (query, _) in DIMENSIONS.items()
+        }
+
+    def load(self, until_order_id: Optional[int] = None) -> Dict[str, Any]:
+        """Бүх fact-ийг эхнээс нь ачаалах (until_order_id өгвөл тэр id хүртэлх захиалгууд)"""
+        if not _import_numpy():
+            raise RuntimeError("Columnar engine-д numpy хэрэгтэй: pip install numpy")
+        started = time.monotonic()
+        self._check_schema()
+        with self._lock:
+            dimensions = self._load_dimensions()
+            if until_order_id is None:
+                facts = self._load_facts(FULL_SOURCE, None, dimensions)
+            else:
+                facts = self._load_facts(UNTIL_SOURCE, (until_order_id,), dimensions)
+            self._data = self._snapshot(facts, dimensions)
+        return self._report("full", started, len(facts["order_id"]))
+
+    def refresh(self) -> Dict[str, Any]:
+        """Watermark (хамгийн их order id)-аас хойшхи захиалгуудыг нэмэх"""
+        if self._data is None:
+            return self.load()
+        started = time.monotonic()
+        with self._lock:
+            previous = self._data
+            dimensions = self._load_dimensions(previous)
+            tail = self._load_facts(TAIL_SOURCE, (previous["watermark"],), dimensions)
+            facts = {name: np.concatenate([previous[name], tail[name]]) for name in tail}
+            self._data = self._snapshot(facts, dimensions)
+        return self._report("incremental", started, len(tail["order_id"]))
+
+    def _snapshot(self, facts: Dict[str, Any], dimensions: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        order_ids = facts["order_id"][facts["has_order"]]
+        return {
+            **facts,
+            "dims": dimensions,
+            "rows": len(facts["order_id"]),
+            "watermark": int(order_ids.max()) if len(order_ids) else -(2 ** 63),
+            "loaded_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def _report(self, mode: str, started: float, rows: int) -> Dict[str, Any]:
+        self.last_refresh = {"mode": mode, "rows": rows, "seconds": round(time.monotonic() - started, 3)}
+        return self.last_refresh
+
+    def stats(self) -> Dict[str, Any]:
+        data = self._data
+        if data is None:
+            return {"ready": False}
+        return {
+            "ready": self.ready,
+            "rows": data["rows"],
+            "memory_bytes": sum(value.nbytes for value in data.values() if hasattr(value, "nbytes")),
+            "watermark": data["watermark"],
+            "loaded_at": data["loaded_at"],
+            "last_refresh": self.last_refresh,
+        }
+
+    def enable(self, refresh_interval: Optional[float] = None, reload_interval: Optional[float] = None,
+               background: bool = True):
+        """Fact-ийг ачаалж, query-нүүдэд ашиглуулж эхлэх, тогтмол refresh хийх"""
+        if refresh_interval is None:
+            refresh_interval = float(os.getenv("COLUMNAR_REFRESH_INTERVAL", "60"))
+        if reload_interval is None:
+            reload_interval = float(os.getenv("COLUMNAR_RELOAD_INTERVAL", "3600"))
+
+        def run():
+            try:
+                result = self.load()
+                self.ready = True
+                SalesQueries.columnar = self
+                print(f"✓ Columnar engine бэлэн боллоо ({result['rows']} мөр, {result['seconds']}s)", file=sys.stderr)
+            except Exception as e:
+                print(f"⚠ Columnar engine ачаалж чадсангүй, SQL-ээр тооцно: {e}", file=sys.stderr)
+                return
+            loaded = time.monotonic()
+            while refresh_interval > 0:
+                time.sleep(refresh_interval)
+                try:
+                    if reload_interval > 0 and time.monotonic() - loaded >= reload_interval:
+                        self.load()
+                        loaded = time.monotonic()
+                    else:
+                        self.refresh()
+                except Exception as e:
+                    print(f"⚠ Columnar refresh алдаа: {e}", file=sys.stderr)
+
+        if not background:
+            run()
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=run, name="columnar-refresh", daemon=True)
+            self._thread.start()
+
+    # ---------- Query ----------
+
+    def can_serve(self, method: str, params: Dict[str, Any]) -> bool:
+        """Энэ method/параметрийг SQL-тэй яг ижил үр дүнгээр тооцож чадах эсэх"""
+        if not self.ready or self._data is None or method not in METHODS:
+            return False
+        # timeseries_cache-ийн bucket хил (before)-ийг engine дэмжихгүй
+        if params.get("before"):
+            return False
+        for key in ("start_date", "end_date"):
+            value = params.get(key)
+            if value:
+                if not isinstance(value, str) or not _TIMESTAMP.match(value):
+                    return False
+                try:
+                    _timestamp_us(value)
+                except ValueError:
+                    return False
+        for key in ID_PARAMS:
+            value = params.get(key)
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+                return False
+        if params.get("page_size") and params.get("after"):
+            try:
+                decode_page_token(params["after"])
+            except ValueError:
+                return False
+        return True
+
+    def query(self, method: str, **params) -> List[Dict[str, Any]]:
+        """Database-ийн method-той ижил мөрүүд (metrics-д columnar.<method> гэж бүртгэнэ)"""
+        started = time.perf_counter()
+        rows = getattr(self, METHODS[method])(**params)
+        metrics.observe_query(f"columnar.{method}", time.perf_counter() - started, len(rows))
+        return rows
+
+    @staticmethod
+    def _date_mask(data: Dict[str, Any], start_date: Optional[str], end_date: Optional[str]):
+        """o.order_date-ийн шүүлтүүр. Шүүлтүүргүй бол None (LEFT JOIN-ийн хоосон бүлгүүд үлдэнэ)"""
+        if not start_date and not end_date:
+            return None
+        mask = data["has_order"].copy()
+        if start_date:
+            mask &= data["ts"] >= _timestamp_us(start_date)
+        if end_date:
+            mask &= data["ts"] <= _timestamp_us(end_date)
+        return mask
+
+    @staticmethod
+    def _valid(data: Dict[str, Any], dimension: str, dated):
+        """Тухайн dimension-д холбогдох (INNER JOIN-той адил) мөрүүд"""
+        codes = data[DIMENSIONS[dimension][1]]
+        valid = codes >= 0
+        dim = data["dims"][dimension]
+        if not dim["all_alive"]:
+            valid &= dim["alive"][np.maximum(codes, 0)]
+        if dated is not None:
+            valid &= dated
+        return valid
+
+    @staticmethod
+    def _sums(data: Dict[str, Any], group, valid, size: int):
+        """Бүлэг бүрийн (total_sales цент, total_quantity, мөрийн тоо)"""
+        g = group[valid]
+        # float64 нь 2^53 хүртэл бүхэл тоог яг хадгална
+        sales = np.bincount(g, weights=data["cents"][valid], minlength=size)
+        quantity = np.bincount(g, weights=data["quantity"][valid], minlength=size)
+        return np.rint(sales).astype(np.int64), np.rint(quantity).astype(np.int64), np.bincount(g, minlength=size)
+
+    @staticmethod
+    def _order_count(data: Dict[str, Any], group, valid, size: int):
+        """Захиалгын түвшний бүлгийн (merchant, sales rep, district, хугацаа) COUNT(DISTINCT o.id)"""
+        first = valid & data["order_first"]
+        return np.bincount(group[first], minlength=size)
+
+    def _by_dimension(self, dimension: str, start_date: Optional[str], end_date: Optional[str], order_level: bool):
+        """Dimension-ий мөр бүрээр бүлэглэсэн нийлбэрүүд ба гаргах кодууд"""
+        data = self._data
+        dim = data["dims"][dimension]
+        dated = self._date_mask(data, start_date, end_date)
+        valid = self._valid(data, dimension, dated)
+        codes = data[DIMENSIONS[dimension][1]]
+        size = len(dim["ids"])
+        sales, quantity, count = self._sums(data, codes, valid, size)
+        if order_level:
+            orders = self._order_count(data, codes, valid, size)
+        else:
+            with_order = valid & data["has_order"]
+            orders = _distinct_count(codes[with_order], data["order_id"][with_order], size)
+        include = count > 0 if dated is not None else dim["alive"]
+        return data, dim, valid, sales, quantity, orders, np.flatnonzero(include)
+
+    def sales_by_sku(self, sku_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     page_size: Optional[int] = None, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        _, dim, _, sales, quantity, orders, codes = self._by_dimension("sku", start_date, end_date, order_level=False)
+        rows = [{
+            "sku_id": dim["ids"][code],
+            "sku_name": dim["names"][code],
+            "category": dim["attrs"][code],
+            "total_sales": _money(sales[code]),
+            "total_quantity": int(quantity[code]),
+            "order_count": int(orders[code]),
+        } for code in codes if not sku_id or dim["ids"][code] == sku_id]
+        return _order_rows(rows, "sku_id", page_size, after)
+
+    def sales_by_merchant(self, merchant_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                          page_size: Optional[int] = None, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        _, dim, _, sales, quantity, orders, codes = self._by_dimension("merchant", start_date, end_date, order_level=True)
+        rows = [{
+            "merchant_id": dim["ids"][code],
+            "merchant_name": dim["names"][code],
+            "district": dim["attrs"][code],
+            "total_sales": _money(sales[code]),
+            "total_quantity": int(quantity[code]),
+            "order_count": int(orders[code]),
+        } for code in codes if not merchant_id or dim["ids"][code] == merchant_id]
+        return _order_rows(rows, "merchant_id", page_size, after)
+
+    def sales_rep_performance(self, sales_rep_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                              page_size: Optional[int] = None, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        data, dim, valid, sales, quantity, orders, codes = self._by_dimension("sales_rep", start_date, end_date, order_level=True)
+        # COUNT(DISTINCT o.merchant_id): merchants хүснэгтэд байхгүй merchant_id-г тоолохгүй
+        with_merchant = valid & (data["merchant"] >= 0)
+        merchants = _distinct_count(data["sales_rep"][with_merchant], data["merchant"][with_merchant], len(dim["ids"]))
+        rows = [{
+            "sales_rep_id": dim["ids"][code],
+            "sales_rep_name": dim["names"][code],
+            "total_sales": _money(sales[code]),
+            "total_quantity": int(quantity[code]),
+            "order_count": int(orders[code]),
+            "merchant_count": int(merchants[code]),
+        } for code in codes if not sales_rep_id or dim["ids"][code] == sales_rep_id]
+        return _order_rows(rows, "sales_rep_id", page_size, after)
+
+    def _by_group(self, dimension: str, start_date: Optional[str], end_date: Optional[str], order_level: bool):
+        """Dimension-ий атрибутаар (district, category) бүлэглэх, атрибут бүрийн dimension-ий тоотой"""
+        data = self._data
+        dim = data["dims"][dimension]
+        size = len(dim["groups"])
+        if not size:
+            return dim, None, None, None, None, []
+        dated = self._date_mask(data, start_date, end_date)
+        valid = self._valid(data, dimension, dated)
+        codes = data[DIMENSIONS[dimension][1]]
+        group = dim["group_codes"][np.maximum(codes, 0)]
+        sales, quantity, _ = self._sums(data, group, valid, size)
+        if order_level:
+            orders = self._order_count(data, group, valid, size)
+        else:
+            with_order = valid & data["has_order"]
+            orders = _distinct_count(group[with_order], data["order_id"][with_order], size)
+        # COUNT(DISTINCT dimension.id): шүүлтүүргүй бол LEFT JOIN тул бүх мөр орно
+        if dated is None:
+            present = dim["alive"]
+        else:
+            present = np.bincount(codes[valid], minlength=len(dim["ids"])) > 0
+        members = np.bincount(dim["group_codes"][present], minlength=size)
+        return dim, sales, quantity, orders, members, np.flatnonzero(members > 0)
+
+    def sales_by_district(self, district: Optional[str] = None, start_date: Optional[str] = None,
+                          end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        dim, sales, quantity, orders, merchants, codes = self._by_group("merchant", start_date, end_date, order_level=True)
+        rows = [{
+            "district": dim["groups"][code],
+            "total_sales": _money(sales[code]),
+            "total_quantity": int(quantity[code]),
+            "order_count": int(orders[code]),
+            "merchant_count": int(merchants[code]),
+        } for code in codes if not district or dim["groups"][code] == district]
+        rows.sort(key=lambda row: -row["total_sales"])
+        return rows
+
+    def category_summary(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        dim, sales, quantity, orders, skus, codes = self._by_group("sku", start_date, end_date, order_level=False)
+        rows = [{
+            "category": dim["groups"][code],
+            "total_sales": _money(sales[code]),
+            "total_quantity": int(quantity[code]),
+            "order_count": int(orders[code]),
+            "sku_count": int(skus[code]),
+        } for code in codes]
+        rows.sort(key=lambda row: -row["total_sales"])
+        return rows
+
+    def sales_by_time_period(self, period: str = "daily", start_date: Optional[str] = None,
+                             end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        data = self._data
+        valid = self._date_mask(data, start_date, end_date)
+        if valid is None:
+            valid = data["has_order"]
+        ts = data["ts"][valid]
+        if period == "monthly":
+            keys = ts.astype("datetime64[us]").astype("datetime64[M]").astype(np.int64)
+        else:
+            keys = np.floor_divide(ts, DAY_US)
+            if period == "weekly":
+                # 1970-01-01 нь пүрэв гараг; DATE_TRUNC('week') даваа гарагаас эхэлнэ
+                keys -= (keys + 3) % 7
+        if not len(keys):
+            return []
+        offset = int(keys.min())
+        group = np.zeros(len(data["ts"]), dtype=np.int64)
+        group[valid] = keys - offset
+        size = int(keys.max()) - offset + 1
+        sales, quantity, count = self._sums(data, group, valid, size)
+        orders = self._order_count(data, group, valid, size)
+        rows = []
+        for code in np.flatnonzero(count)[::-1]:
+            key = offset + int(code)
+            if period == "monthly":
+                value = datetime(1970 + key // 12, key % 12 + 1, 1)
+            elif period == "weekly":
+                value = EPOCH + timedelta(days=key)
+            else:
+                value = date(1970, 1, 1) + timedelta(days=key)
+            rows.append({
+                "period": value,
+                "total_sales": _money(sales[code]),
+                "total_quantity": int(quantity[code]),
+                "order_count": int(orders[code]),
+            })
+        return rows
+
+    def top_skus(self, limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.sales_by_sku(start_date=start_date, end_date=end_date)[:limit]
+
+    # ---------- Шалгах ----------
+
+    def verify(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
+        """Engine-ийн үр дүнг raw SQL-ээр (rollup-гүй) тооцсонтой харьцуулах"""
+        end_date = end_date or date.today().isoformat()
+        start_date = start_date or (date.fromisoformat(end_date[:10]) - timedelta(days=30)).isoformat()
+        dated = {"start_date": start_date, "end_date": end_date}
+        data = self._data
+        first_sku = data["dims"]["sku"]["ids"][0] if data["dims"]["sku"]["ids"] else None
+        checks = {
+            "get_sales_by_sku": ("build_sales_by_sku", {}),
+            "get_sales_by_sku (dated)": ("build_sales_by_sku", dated),
+            "get_sales_by_sku (sku_id)": ("build_sales_by_sku", {"sku_id": first_sku, **dated}),
+            "get_sales_by_sku (page)": ("build_sales_by_sku", {"page_size": 5, **dated}),
+            "get_sales_by_merchant": ("build_sales_by_merchant", {}),
+            "get_sales_by_merchant (dated)": ("build_sales_by_merchant", dated),
+            "get_sales_by_district": ("build_sales_by_district", {}),
+            "get_sales_by_district (dated)": ("build_sales_by_district", dated),
+            "get_sales_by_time_period (daily)": ("build_sales_by_time_period", {"period": "daily", **dated}),
+            "get_sales_by_time_period (weekly)": ("build_sales_by_time_period", {"period": "weekly", **dated}),
+            "get_sales_by_time_period (monthly)": ("build_sales_by_time_period", {"period": "monthly"}),
+            "get_sales_rep_performance": ("build_sales_rep_performance", {}),
+            "get_sales_rep_performance (dated)": ("build_sales_rep_performance", dated),
+            "get_category_summary": ("build_category_summary", {}),
+            "get_category_summary (dated)": ("build_category_summary", dated),
+            "get_top_skus": ("build_top_skus", {"limit": 10, **dated}),
+        }
+        report = {}
+        for name, (builder, params) in checks.items():
+            method = name.split(" ", 1)[0]
+            builder_params = dict(params)
+            if "use_rollups" in getattr(self.db, builder).__code__.co_varnames:
+                builder_params["use_rollups"] = False
+            started = time.perf_counter()
+            raw = self.db.execute_query(*getattr(self.db, builder)(**builder_params))
+            sql_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            computed = getattr(self, METHODS[method])(**params)
+            engine_ms = (time.perf_counter() - started) * 1000
+            raw_rows = sorted(repr(sorted(self._canonical(r).items())) for r in raw)
+            engine_rows = sorted(repr(sorted(self._canonical(r).items())) for r in computed)
+            report[name] = {
+                "ok": raw_rows == engine_rows,
+                "raw_rows": len(raw_rows),
+                "engine_rows": len(engine_rows),
+                "sql_ms": round(sql_ms, 1),
+                "engine_ms": round(engine_ms, 1),
+                "missing": sorted(set(raw_rows) - set(engine_rows))[:5],
+                "unexpected": sorted(set(engine_rows) - set(raw_rows))[:5],
+            }
+        return report
+
+    def verify_after_refresh(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
+        """Захиалгын эхний хагасыг ачаалж, үлдсэнийг refresh()-ээр нэмсний дараа verify хийх"""
+        median = self._fetch_rows("SELECT percentile_disc(0.5) WITHIN GROUP (ORDER BY id) FROM orders")[0][0]
+        self.load(until_order_id=median)
+        refreshed = self.refresh()
+        if median is not None and refreshed["rows"] == 0:
+            print("⚠ refresh шинэ мөр нэмсэнгүй (median-аас хойш захиалга алга)", file=sys.stderr)
+        return self.verify(start_date, end_date)
+
+    @staticmethod
+    def _canonical(row: Dict[str, Any]) -> Dict[str, Any]:
+        # Decimal('0') ба Decimal('0.00') ижил утга
+        return {key: value.normalize() if isinstance(value, Decimal) else value for key, value in dict(row).items()}
+
+
+# Global columnar engine
+columnar = ColumnarEngine(db)
+
+
+def enable_from_env():
+    """COLUMNAR_ENABLED=1 бол engine-ийг background-д ачаалж идэвхжүүлэх"""
+    if os.getenv("COLUMNAR_ENABLED", "0") != "1":
+        return
+    if not _import_numpy():
+        print("⚠ COLUMNAR_ENABLED=1 боловч numpy суугаагүй тул SQL-ээр тооцно (pip install numpy)", file=sys.stderr)
+        return
+    columnar.enable()
+
+
+def main(argv: List[str]) -> int:
+    command = argv[1] if len(argv) > 1 else "stats"
+    if not _import_numpy():
+        print("numpy суугаагүй байна: pip install numpy")
+        return 2
+    if command == "verify":
+        dates = [arg for arg in argv[2:] if arg != "--after-refresh"][:2]
+        if "--after-refresh" in argv[2:]:
+            report = columnar.verify_after_refresh(*dates)
+        else:
+            columnar.load()
+            report = columnar.verify(*dates)
+        print(columnar.last_refresh)
+        for name, result in report.items():
+            status = "✓" if result["ok"] else "✗"
+            print(f"{status} {name}: raw={result['raw_rows']} engine={result['engine_rows']} "
+                  f"sql={result['sql_ms']}ms engine={result['engine_ms']}ms")
+            for row in result["missing"]:
+                print(f"    - {row}")
+            for row in result["unexpected"]:
+                print(f"    + {row}")
+        return 0 if all(r["ok"] for r in report.values()) else 1
+    elif command == "stats":
+        columnar.load()
+        columnar.ready = True
+        print(columnar.stats())
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,62 +1,365 @@
 import psycopg2
 import psycopg2.extras
-from typing import List, Dict, Any, Optional
+import psycopg2.extensions
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from collections import deque
+from contextlib import contextmanager
 import os
+import threading
+import time
+import uuid
+import base64
+import json
+from decimal import Decimal
+from result_cache import result_cache
+from timeseries_cache import timeseries_cache
+import metrics
 from dotenv import load_dotenv
 load_dotenv()
 
-class Database:
-    def __init__(self):
-        self.conn = None
-        self._connected = False
-    
-    def _ensure_connection(self):
-        """Холболт байгаа эсэхийг шалгаж, байхгүй бол холбогдох"""
+
+def connection_params() -> Dict[str, Any]:
+    """Environment-оос PostgreSQL холболтын параметрүүд"""
+    return {
+        "host": os.getenv("DATABASE_HOST"),
+        "port": os.getenv("DATABASE_PORT"),
+        "user": os.getenv("DATABASE_USER"),
+        "password": os.getenv("DATABASE_PASSWORD"),
+        "dbname": os.getenv("DATABASE_NAME"),
+        "connect_timeout": 5,  # 5 секундын timeout
+    }
+
+
+class PoolTimeout(ConnectionError):
+    """Pool-оос холболт авах хугацаа дууссан"""
+
+
+class ConnectionPool:
+    """Thread-safe, хэмжээ нь хязгаартай psycopg2 холболтын pool
+
+    Холболтууд autocommit горимд ажиллана. Гаргаж өгөхийн өмнө эрүүл эсэхийг
+    шалгаж, тасарсан холболтыг шинээр үүсгэнэ.
+    """
+
+    def __init__(self, minconn: int = 1, maxconn: int = 10, timeout: float = 10.0,
+                 health_check_idle: float = 5.0, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool-ийн хэмжээ буруу: minconn <= maxconn, maxconn >= 1 байх ёстой")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        # Энэ хугацаанаас удаан сул байсан холболтыг SELECT 1-ээр шалгана
+        self.health_check_idle = health_check_idle
+        self._connect_kwargs = connect_kwargs
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, буцаагдсан цаг)
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "health_check_failures": 0,
+        }
+
+    def _new_connection(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        conn.autocommit = True
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _is_healthy(self, conn, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        status = conn.get_transaction_status()
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - idle_since < self.health_check_idle:
+            return True
         try:
-            if self.conn is None:
-                self.connect()
-            elif hasattr(self.conn, 'closed') and self.conn.closed:
-                self.connect()
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
         except Exception:
-            # Холболт хийж чадсангүй, дараа query хийхэд алдаа өгнө
             pass
-    
-    def connect(self):
-        """PostgreSQL холболт үүсгэх"""
+
+    def getconn(self, timeout: Optional[float] = None):
+        """Pool-оос холболт авах (timeout хүртэл хүлээнэ)"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        conn = None
+        idle_since = 0.0
+        with self._cond:
+            if self._closed:
+                raise ConnectionError("Connection pool хаагдсан байна")
+            waited = False
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    break
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"{timeout:.1f} секундын дотор сул холболт олдсонгүй (max={self.maxconn})"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+
+        if conn is not None and not self._is_healthy(conn, idle_since):
+            # Тасарсан/эвдэрсэн холболтыг шинээр солих
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+                self._stats["discarded"] += 1
+            self._close_quietly(conn)
+            conn = None
+
+        if conn is None:
+            try:
+                conn = self._new_connection()
+            except Exception as e:
+                self._release_slot()
+                raise ConnectionError(f"Database холболт үүсгэж чадсангүй: {e}") from e
+        return conn
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    def putconn(self, conn, discard: bool = False):
+        """Холболтыг pool руу буцаах"""
+        if not discard and not conn.closed:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+        discard = discard or bool(conn.closed)
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._size -= 1
+                self._stats["discarded"] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard or self._closed:
+            self._close_quietly(conn)
+
+    def warm_up(self):
+        """minconn хүртэл холболт үүсгэж бэлдэх"""
+        conns = []
         try:
-            self.conn = psycopg2.connect(
-                host=os.getenv("DATABASE_HOST"),
-                port=os.getenv("DATABASE_PORT"),
-                user=os.getenv("DATABASE_USER"),
-                password=os.getenv("DATABASE_PASSWORD"),
-                database=os.getenv("DATABASE_NAME"),
-                connect_timeout=5  # 5 секундын timeout
-            )
-            self._connected = True
-            print("✓ Database холбогдлоо")
-        except Exception as e:
-            self._connected = False
-            print(f"⚠ Database холболт алдаатай: {e}")
-            print("⚠ Database холболтгүйгээр систем ажиллахгүй байж магадгүй.")
-            # Холболтгүй байхад raise хийхгүй, зөвхөн query хийхэд алдаа өгөх
-            self.conn = None
+            for _ in range(max(self.minconn, 1)):
+                conns.append(self.getconn())
+        finally:
+            for conn in conns:
+                self.putconn(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool-ийн статистик"""
+        with self._cond:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                **self._stats,
+            }
+
+    def close(self):
+        """Бүх сул холболтыг хаах"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+
+# get_top_skus_by_group-ийн бүлэглэх боломжтой талбарууд
+TOP_SKU_GROUPS = {
+    "district": ["district"],
+    "category": ["category"],
+    "sales_rep": ["sales_rep_id"],
+}
+
+
+# execute_query / get_* method-уудын result_format:
+#   dicts    - [{"sku_id": 1, ...}, ...] (анхдагч)
+#   tuples   - [(1, ...), ...] багануудын дарааллаар
+#   columnar - {"columns": ["sku_id", ...], "data": [(1, ...), ...]}
+#   arrays   - {"sku_id": [1, 2, ...], ...} багана бүр нэг жагсаалт
+RESULT_FORMATS = ("dicts", "tuples", "columnar", "arrays")
+
+
+def check_result_format(result_format: str):
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(f"Үр дүнгийн формат буруу: {result_format} ({', '.join(RESULT_FORMATS)})")
+
+
+# Top SKU-ийн limit (LIMIT болон ROW_NUMBER() <= limit)-ийн дээд хязгаар
+MAX_TOP_LIMIT = 1000
+
+
+def check_limit(limit: Any):
+    if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= MAX_TOP_LIMIT:
+        raise ValueError(f"limit буруу: {limit!r} (1-{MAX_TOP_LIMIT} хооронд бүхэл тоо)")
+
+
+def shape_rows(columns: List[str], rows: List[tuple], result_format: str) -> Any:
+    """Tuple мөрүүдийг (cursor-оос) result_format хэлбэрт оруулах"""
+    if result_format == "tuples":
+        return rows
+    if result_format == "columnar":
+        return {"columns": columns, "data": rows}
+    if result_format == "arrays":
+        if not rows:
+            return {name: [] for name in columns}
+        return {name: list(values) for name, values in zip(columns, zip(*rows))}
+    return [dict(zip(columns, row)) for row in rows]
+
+
+# SQL-ийн бус замаар (columnar engine, timeseries cache) тооцогдож болох method-уудын баганууд.
+# Хоосон үр дүнд ч SQL-тэй ижил columns/arrays бүтэц гаргахад хэрэглэнэ.
+RESULT_COLUMNS = {
+    "get_sales_by_sku": ["sku_id", "sku_name", "category", "total_sales", "total_quantity", "order_count"],
+    "get_sales_by_merchant": ["merchant_id", "merchant_name", "district", "total_sales", "total_quantity", "order_count"],
+    "get_sales_by_district": ["district", "total_sales", "total_quantity", "order_count", "merchant_count"],
+    "get_sales_by_time_period": ["period", "total_sales", "total_quantity", "order_count"],
+    "get_sales_rep_performance": ["sales_rep_id", "sales_rep_name", "total_sales", "total_quantity", "order_count", "merchant_count"],
+    "get_category_summary": ["category", "total_sales", "total_quantity", "order_count", "sku_count"],
+    "get_top_skus": ["sku_id", "sku_name", "category", "total_sales", "total_quantity", "order_count"],
+}
+
+
+def format_rows(rows: List[Dict[str, Any]], result_format: str, method: Optional[str] = None) -> Any:
+    """Dict мөрүүдийг (columnar engine, timeseries cache-ийн үр дүн) result_format болгох
+
+    Мөргүй бол баганын нэрийг method-ийн RESULT_COLUMNS-аас авна.
+    """
+    if result_format == "dicts":
+        return rows
+    columns = list(rows[0].keys()) if rows else list(RESULT_COLUMNS.get(method, []))
+    return shape_rows(columns, [tuple(row[name] for name in columns) for row in rows], result_format)
+
+
+def _copy_row(row: Any) -> Any:
+    # tuple мөр өөрчлөгдөхгүй тул хуулахгүй
+    if isinstance(row, dict):
+        return dict(row)
+    if isinstance(row, list):
+        return list(row)
+    return row
+
+
+def copy_result(result: Any) -> Any:
+    """Cache-д байгаа үр дүнг дуудагч өөрчилж болохоор хуулах (мөр бүрийг ч мөн - cache-тай хуваалцахгүй)"""
+    if isinstance(result, list):
+        return [_copy_row(row) for row in result]
+    if "columns" in result and "data" in result and len(result) == 2:
+        return {"columns": list(result["columns"]), "data": [_copy_row(row) for row in result["data"]]}
+    return {name: list(values) for name, values in result.items()}
+
+
+def encode_page_token(total_sales: Any, entity_id: Any) -> str:
+    """Keyset pagination-ий үргэлжлэлийн token (сүүлийн мөрийн total_sales, id)"""
+    raw = json.dumps([str(total_sales), entity_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_page_token(token: str) -> Tuple[str, Any]:
+    """encode_page_token-ийн эсрэг. Буруу token бол ValueError"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        total_sales, entity_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        Decimal(total_sales)
+        return total_sales, entity_id
+    except Exception as e:
+        raise ValueError(f"Pagination token буруу байна: {token}") from e
+
+
+def next_page_token(rows: Any, id_column: str, page_size: Optional[int]) -> Optional[str]:
+    """Хуудас дүүрсэн бол дараагийн хуудасны token, үгүй бол None (dicts/columnar/arrays формат)"""
+    if not page_size or not rows:
+        return None
+    if isinstance(rows, list):
+        if len(rows) < page_size:
+            return None
+        last = rows[-1]
+    elif "columns" in rows and "data" in rows and len(rows) == 2:
+        if len(rows["data"]) < page_size:
+            return None
+        last = dict(zip(rows["columns"], rows["data"][-1]))
+    else:
+        if len(rows.get("total_sales", ())) < page_size:
+            return None
+        last = {"total_sales": rows["total_sales"][-1], id_column: rows[id_column][-1]}
+    return encode_page_token(last["total_sales"], last[id_column])
+
+
+class SalesQueries:
+    """Борлуулалтын query-нүүдийг SQL + params болгон бүтээх
+
+    Database болон AsyncDatabase хоёулаа эдгээрийг ашигладаг тул SQL нэг л газар байна.
+    """
+    
+    # rollups.RollupManager идэвхжсэн үед энд онооно (rollups.py-г харна уу)
+    rollups = None
+    # columnar.ColumnarEngine идэвхжсэн үед энд онооно (columnar.py-г харна уу)
+    columnar = None
     
-    def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
-        """SQL query ажиллуулах"""
-        self._ensure_connection()
-        if self.conn is None:
-            raise ConnectionError("Database холболт байхгүй байна. Database серверийг шалгана уу.")
+    @staticmethod
+    def _paginate(query: str, params: Optional[tuple], id_column: str, page_size: Optional[int], after: Optional[str]) -> Tuple[str, Optional[tuple]]:
+        """(total_sales DESC, id) дээр keyset pagination нэмэх
         
-        try:
-            with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                cur.execute(query, params)
-                return cur.fetchall()
-        except Exception as e:
-            print(f"Query алдаа: {e}")
-            raise
+        OFFSET ашиглахгүй тул хэддүгээр хуудас ч эхний хуудастай ижил зардалтай.
+        """
+        if not page_size:
+            return query, params
+        params = list(params or ())
+        query = f"SELECT * FROM ({query}) page WHERE 1=1"
+        if after:
+            total_sales, last_id = decode_page_token(after)
+            query += f" AND (page.total_sales < %s::numeric OR (page.total_sales = %s::numeric AND page.{id_column} > %s))"
+            params += [total_sales, total_sales, last_id]
+        query += f" ORDER BY page.total_sales DESC, page.{id_column} LIMIT %s"
+        params.append(page_size)
+        return query, tuple(params)
     
-    def get_sales_by_sku(self, sku_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
-        """SKU-аар борлуулалт авах"""
+    def build_sales_by_sku(self, sku_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: Optional[int] = None, after: Optional[str] = None, use_rollups: bool = True) -> Tuple[str, Optional[tuple]]:
+        """SKU-аар борлуулалт - query бүтээх"""
+        if use_rollups and self.rollups is not None and self.rollups.can_serve(start_date, end_date):
+            return self._paginate(*self.rollups.build_sales_by_sku(sku_id, start_date, end_date), "sku_id", page_size, after)
+        
         query = """
             SELECT 
                 sku.id as sku_id,
@@ -86,10 +389,13 @@ class Database:
         
         query += " GROUP BY sku.id, sku.name, sku.category ORDER BY total_sales DESC"
         
-        return self.execute_query(query, tuple(params) if params else None)
+        return self._paginate(query, tuple(params) if params else None, "sku_id", page_size, after)
     
-    def get_sales_by_merchant(self, merchant_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
-        """Merchant-аар борлуулалт авах"""
+    def build_sales_by_merchant(self, merchant_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: Optional[int] = None, after: Optional[str] = None, use_rollups: bool = True) -> Tuple[str, Optional[tuple]]:
+        """Merchant-аар борлуулалт - query бүтээх"""
+        if use_rollups and self.rollups is not None and self.rollups.can_serve(start_date, end_date):
+            return self._paginate(*self.rollups.build_sales_by_merchant(merchant_id, start_date, end_date), "merchant_id", page_size, after)
+        
         query = """
             SELECT 
                 m.id as merchant_id,
@@ -119,10 +425,13 @@ class Database:
         
         query += " GROUP BY m.id, m.name, m.district ORDER BY total_sales DESC"
         
-        return self.execute_query(query, tuple(params) if params else None)
+        return self._paginate(query, tuple(params) if params else None, "merchant_id", page_size, after)
     
-    def get_sales_by_district(self, district: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
-        """District-аар борлуулалт авах"""
+    def build_sales_by_district(self, district: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, use_rollups: bool = True) -> Tuple[str, Optional[tuple]]:
+        """District-аар борлуулалт - query бүтээх"""
+        if use_rollups and self.rollups is not None and self.rollups.can_serve(start_date, end_date):
+            return self.rollups.build_sales_by_district(district, start_date, end_date)
+        
         query = """
             SELECT 
                 m.district,
@@ -151,10 +460,16 @@ class Database:
         
         query += " GROUP BY m.district ORDER BY total_sales DESC"
         
-        return self.execute_query(query, tuple(params) if params else None)
+        return query, tuple(params) if params else None
     
-    def get_sales_by_time_period(self, period: str = "daily", start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
-        """Цаг хугацааны дагуу борлуулалт авах (daily/weekly/monthly)"""
+    def build_sales_by_time_period(self, period: str = "daily", start_date: Optional[str] = None, end_date: Optional[str] = None, use_rollups: bool = True, before: Optional[str] = None) -> Tuple[str, Optional[tuple]]:
+        """Цаг хугацааны дагуу борлуулалт (daily/weekly/monthly) - query бүтээх
+        
+        before нь end_date-ээс ялгаатай нь тухайн мөчийг оруулахгүй (timeseries_cache-ийн bucket-ийн хил).
+        """
+        if use_rollups and not before and self.rollups is not None and self.rollups.can_serve(start_date, end_date):
+            return self.rollups.build_sales_by_time_period(period, start_date, end_date)
+        
         if period == "daily":
             date_format = "DATE(o.order_date)"
         elif period == "weekly":
@@ -184,12 +499,19 @@ class Database:
             query += " AND o.order_date <= %s"
             params.append(end_date)
         
+        if before:
+            query += " AND o.order_date < %s"
+            params.append(before)
+        
         query += f" GROUP BY {date_format} ORDER BY period DESC"
         
-        return self.execute_query(query, tuple(params) if params else None)
+        return query, tuple(params) if params else None
     
-    def get_sales_rep_performance(self, sales_rep_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
-        """Sales rep-ийн гүйцэтгэл авах"""
+    def build_sales_rep_performance(self, sales_rep_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: Optional[int] = None, after: Optional[str] = None, use_rollups: bool = True) -> Tuple[str, Optional[tuple]]:
+        """Sales rep-ийн гүйцэтгэл - query бүтээх"""
+        if use_rollups and self.rollups is not None and self.rollups.can_serve(start_date, end_date):
+            return self._paginate(*self.rollups.build_sales_rep_performance(sales_rep_id, start_date, end_date), "sales_rep_id", page_size, after)
+        
         query = """
             SELECT 
                 sr.id as sales_rep_id,
@@ -219,18 +541,81 @@ class Database:
         
         query += " GROUP BY sr.id, sr.name ORDER BY total_sales DESC"
         
-        return self.execute_query(query, tuple(params) if params else None)
+        return self._paginate(query, tuple(params) if params else None, "sales_rep_id", page_size, after)
     
-    def get_top_skus(self, limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
-        """Хамгийн их борлуулалттай SKU-ууд"""
-        return self.get_sales_by_sku(start_date=start_date, end_date=end_date)[:limit]
+    def build_top_skus(self, limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Tuple[str, Optional[tuple]]:
+        """Top SKU - query бүтээх (LIMIT database дээр)"""
+        check_limit(limit)
+        query, params = self.build_sales_by_sku(start_date=start_date, end_date=end_date)
+        # Дотоод query-ийн ORDER BY-оос (rollup эсвэл raw) хамаарахгүйгээр эрэмбэлнэ
+        return f"SELECT * FROM ({query}) t ORDER BY total_sales DESC, sku_id LIMIT %s", (params or ()) + (limit,)
     
-    def get_district_trends(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
-        """District-ийн чиг хандлага"""
-        return self.get_sales_by_district(start_date=start_date, end_date=end_date)
+    def build_top_skus_by_group(self, group_by: str, limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Tuple[str, Optional[tuple]]:
+        """Бүлэг бүрийн top SKU (district/category/sales_rep) - window function-тэй query бүтээх"""
+        check_limit(limit)
+        if group_by not in TOP_SKU_GROUPS:
+            raise ValueError(f"group_by буруу: {group_by}. Боломжтой: {', '.join(TOP_SKU_GROUPS)}")
+        group_columns = TOP_SKU_GROUPS[group_by]
+        
+        if group_by == "category":
+            # SKU-ийн нийт борлуулалтаас category-оор эрэмбэлэх
+            inner, params = self.build_sales_by_sku(start_date=start_date, end_date=end_date)
+            params = list(params or ())
+        else:
+            joins = {
+                "district": "JOIN merchants m ON m.id = o.merchant_id",
+                "sales_rep": "JOIN sales_reps sr ON sr.id = o.sales_rep_id",
+            }[group_by]
+            group_select = {
+                "district": "m.district,",
+                "sales_rep": "sr.id as sales_rep_id, sr.name as sales_rep_name,",
+            }[group_by]
+            group_keys = {"district": "m.district", "sales_rep": "sr.id, sr.name"}[group_by]
+            inner = f"""
+                SELECT 
+                    {group_select}
+                    sku.id as sku_id,
+                    sku.name as sku_name,
+                    sku.category,
+                    COALESCE(SUM(oi.quantity * oi.price), 0) as total_sales,
+                    COALESCE(SUM(oi.quantity), 0) as total_quantity,
+                    COUNT(DISTINCT o.id) as order_count
+                FROM order_items oi
+                JOIN orders o ON oi.order_id = o.id
+                JOIN sku ON sku.id = oi.sku_id
+                {joins}
+                WHERE 1=1
+            """
+            params = []
+            
+            if start_date:
+                inner += " AND o.order_date >= %s"
+                params.append(start_date)
+            
+            if end_date:
+                inner += " AND o.order_date <= %s"
+                params.append(end_date)
+            
+            inner += f" GROUP BY {group_keys}, sku.id, sku.name, sku.category"
+        
+        partition = ", ".join(f"t.{c}" for c in group_columns)
+        order = ", ".join(group_columns)
+        query = f"""
+            SELECT * FROM (
+                SELECT 
+                    t.*,
+                    ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY t.total_sales DESC, t.sku_id) as sales_rank
+                FROM ({inner}) t
+            ) ranked
+            WHERE sales_rank <= %s
+            ORDER BY {order}, sales_rank
+        """
+        params.append(limit)
+        
+        return query, tuple(params)
     
-    def get_category_summary(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
-        """Категори-ийн хураангуй"""
+    def build_category_summary(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Tuple[str, Optional[tuple]]:
+        """Категори-ийн хураангуй - query бүтээх"""
         query = """
             SELECT 
                 sku.category,
@@ -255,10 +640,13 @@ class Database:
         
         query += " GROUP BY sku.category ORDER BY total_sales DESC"
         
-        return self.execute_query(query, tuple(params) if params else None)
+        return query, tuple(params) if params else None
     
-    def get_merchant_ordering_patterns(self, merchant_id: Optional[int] = None) -> List[Dict]:
-        """Merchant-ийн захиалгын хэв маяг"""
+    def build_merchant_ordering_patterns(self, merchant_id: Optional[int] = None, use_rollups: bool = True) -> Tuple[str, Optional[tuple]]:
+        """Merchant-ийн захиалгын хэв маяг - query бүтээх"""
+        if use_rollups and self.rollups is not None and self.rollups.can_serve():
+            return self.rollups.build_merchant_ordering_patterns(merchant_id)
+        
         query = """
             SELECT 
                 m.id as merchant_id,
@@ -279,16 +667,217 @@ class Database:
         
         query += " GROUP BY m.id, m.name, DATE_TRUNC('month', o.order_date) ORDER BY m.id, month DESC"
         
-        return self.execute_query(query, tuple(params) if params else None)
+        return query, tuple(params) if params else None
+
+
+class Database(SalesQueries):
+    def __init__(self):
+        self.pool = ConnectionPool(
+            minconn=int(os.getenv("DATABASE_POOL_MIN", "1")),
+            maxconn=int(os.getenv("DATABASE_POOL_MAX", "10")),
+            timeout=float(os.getenv("DATABASE_POOL_TIMEOUT", "10")),
+            health_check_idle=float(os.getenv("DATABASE_POOL_HEALTHCHECK_IDLE", "5")),
+            **connection_params()
+        )
+        self.cache = result_cache
+        self.timeseries = timeseries_cache
+        self._connected = False
+    
+    def _ensure_connection(self):
+        """Холболт байгаа эсэхийг шалгаж, байхгүй бол холбогдох"""
+        if not self._connected:
+            self.connect()
+    
+    def connect(self):
+        """PostgreSQL холболтын pool-ийг бэлдэх"""
+        try:
+            self.pool.warm_up()
+            self._connected = True
+            print("✓ Database холбогдлоо")
+        except Exception as e:
+            self._connected = False
+            print(f"⚠ Database холболт алдаатай: {e}")
+            print("⚠ Database холболтгүйгээр систем ажиллахгүй байж магадгүй.")
+            # Холболтгүй байхад raise хийхгүй, зөвхөн query хийхэд алдаа өгөх
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool-ийн статистик (in use, idle, waits)"""
+        return self.pool.stats()
+    
+    @contextmanager
+    def connection(self):
+        """Pool-оос холболт түр авах"""
+        conn = self.pool.getconn()
+        try:
+            yield conn
+        except BaseException:
+            # GeneratorExit (stream таслагдсан) үед ч холболтыг буцаана
+            self.pool.putconn(conn, discard=bool(conn.closed))
+            raise
+        else:
+            self.pool.putconn(conn)
+    
+    @contextmanager
+    def transaction(self):
+        """Transaction дотор ажиллах холболт (commit/rollback автоматаар)"""
+        with self.connection() as conn:
+            conn.autocommit = False
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                if not conn.closed:
+                    conn.autocommit = True
+    
+    def execute_query(self, query: str, params: Optional[tuple] = None, template: str = "custom",
+                      result_format: str = "dicts") -> Any:
+        """SQL query ажиллуулах (template нь metrics-ийн label, result_format-ийг RESULT_FORMATS-аас харна уу)"""
+        check_result_format(result_format)
+        started = time.perf_counter()
+        for attempt in range(2):
+            conn = self.pool.getconn()
+            try:
+                if result_format == "dicts":
+                    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                        cur.execute(query, params)
+                        rows = cur.fetchall()
+                else:
+                    # Мөр бүрт баганын нэрийг давтахгүй - энгийн tuple cursor
+                    with conn.cursor() as cur:
+                        cur.execute(query, params)
+                        rows = cur.fetchall()
+                        columns = [column[0] for column in cur.description]
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                broken = bool(conn.closed)
+                self.pool.putconn(conn, discard=broken)
+                if broken and attempt == 0:
+                    # Холболт тасарсан бол шинэ холболтоор нэг удаа дахин оролдох
+                    print(f"⚠ Database холболт тасарсан, дахин холбогдож байна: {e}")
+                    continue
+                print(f"Query алдаа: {e}")
+                metrics.observe_query(template, time.perf_counter() - started, error=True)
+                raise
+            except Exception as e:
+                self.pool.putconn(conn)
+                print(f"Query алдаа: {e}")
+                metrics.observe_query(template, time.perf_counter() - started, error=True)
+                raise
+            self._connected = True
+            self.pool.putconn(conn)
+            metrics.observe_query(template, time.perf_counter() - started, len(rows))
+            return rows if result_format == "dicts" else shape_rows(columns, rows, result_format)
+    
+    def stream_query(self, query: str, params: Optional[tuple] = None, chunk_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Server-side (named) cursor ашиглан мөрүүдийг fetchmany-аар хэсэгчлэн буцаах generator
+        
+        Үр дүн хэдий их байсан ч санах ойд зөвхөн нэг chunk байна.
+        """
+        chunk_size = chunk_size or int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+        with self.transaction() as conn:
+            name = f"stream_{uuid.uuid4().hex}"
+            with conn.cursor(name=name, cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.itersize = chunk_size
+                cur.execute(query, params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+    
+    def stream(self, builder, **params) -> Iterator[Dict[str, Any]]:
+        """build_* method-ийн query-г cache-гүйгээр stream хийх"""
+        return self.stream_query(*builder(**params))
+    
+    def _fetch(self, method: str, builder, result_format: str = "dicts", **params) -> Any:
+        """Query-г cache-ээс эсвэл database-ээс авах (формат бүр cache-д тусдаа)"""
+        check_result_format(result_format)
+        key = self.cache.make_key(method, params if result_format == "dicts" else {**params, "result_format": result_format})
+        hit, rows = self.cache.get(key)
+        if not hit:
+            if self.columnar is not None and self.columnar.can_serve(method, params):
+                rows = format_rows(self.columnar.query(method, **params), result_format, method)
+            else:
+                rows = self.execute_query(*builder(**params), template=method, result_format=result_format)
+            self.cache.set(key, rows)
+        return copy_result(rows)
+    
+    def invalidate_cache(self, method: Optional[str] = None) -> int:
+        """Үр дүнгийн cache цэвэрлэх (хаагдсан bucket-уудын cache-ийг ч мөн)"""
+        removed = self.cache.invalidate(method)
+        if method in (None, "get_sales_by_time_period"):
+            removed += self.timeseries.invalidate()
+        return removed
+    
+    def get_sales_by_sku(self, sku_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: Optional[int] = None, after: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """SKU-аар борлуулалт авах"""
+        return self._fetch("get_sales_by_sku", self.build_sales_by_sku, result_format=result_format, sku_id=sku_id, start_date=start_date, end_date=end_date, page_size=page_size, after=after)
+    
+    def get_sales_by_merchant(self, merchant_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: Optional[int] = None, after: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """Merchant-аар борлуулалт авах"""
+        return self._fetch("get_sales_by_merchant", self.build_sales_by_merchant, result_format=result_format, merchant_id=merchant_id, start_date=start_date, end_date=end_date, page_size=page_size, after=after)
+    
+    def get_sales_by_district(self, district: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """District-аар борлуулалт авах"""
+        return self._fetch("get_sales_by_district", self.build_sales_by_district, result_format=result_format, district=district, start_date=start_date, end_date=end_date)
+    
+    def get_sales_by_time_period(self, period: str = "daily", start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """Цаг хугацааны дагуу борлуулалт авах (daily/weekly/monthly)
+        
+        Хаагдсан bucket-уудыг timeseries_cache-ээс, бусдыг нь database-ээс авна.
+        """
+        check_result_format(result_format)
+        params = {"period": period, "start_date": start_date, "end_date": end_date}
+        # Columnar engine бүх хугацааг санах ойд тооцдог тул bucket-д хуваах шаардлагагүй
+        if self.columnar is not None and self.columnar.can_serve("get_sales_by_time_period", params):
+            plan = None
+        else:
+            plan = self.timeseries.plan(period, start_date, end_date)
+        if plan is None:
+            return self._fetch("get_sales_by_time_period", self.build_sales_by_time_period, result_format=result_format, **params)
+        # Үлдсэн хэсгүүд ч үр дүнгийн cache-ээр дамжина (before нь cache key-д орно)
+        results = [
+            self._fetch("get_sales_by_time_period", self.build_sales_by_time_period, period=period, **query["params"])
+            for query in plan["queries"]
+        ]
+        return format_rows(self.timeseries.merge(plan, results), result_format, "get_sales_by_time_period")
+    
+    def get_sales_rep_performance(self, sales_rep_id: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: Optional[int] = None, after: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """Sales rep-ийн гүйцэтгэл авах"""
+        return self._fetch("get_sales_rep_performance", self.build_sales_rep_performance, result_format=result_format, sales_rep_id=sales_rep_id, start_date=start_date, end_date=end_date, page_size=page_size, after=after)
+    
+    def get_top_skus(self, limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """Хамгийн их борлуулалттай SKU-ууд"""
+        check_limit(limit)
+        return self._fetch("get_top_skus", self.build_top_skus, result_format=result_format, limit=limit, start_date=start_date, end_date=end_date)
+    
+    def get_top_skus_by_group(self, group_by: str, limit: int = 10, start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """District/category/sales rep бүрийн top SKU-ууд (нэг query-гээр)"""
+        check_limit(limit)
+        return self._fetch("get_top_skus_by_group", self.build_top_skus_by_group, result_format=result_format, group_by=group_by, limit=limit, start_date=start_date, end_date=end_date)
+    
+    def get_district_trends(self, start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """District-ийн чиг хандлага"""
+        return self.get_sales_by_district(start_date=start_date, end_date=end_date, result_format=result_format)
+    
+    def get_category_summary(self, start_date: Optional[str] = None, end_date: Optional[str] = None, result_format: str = "dicts") -> Any:
+        """Категори-ийн хураангуй"""
+        return self._fetch("get_category_summary", self.build_category_summary, result_format=result_format, start_date=start_date, end_date=end_date)
+    
+    def get_merchant_ordering_patterns(self, merchant_id: Optional[int] = None, result_format: str = "dicts") -> Any:
+        """Merchant-ийн захиалгын хэв маяг"""
+        return self._fetch("get_merchant_ordering_patterns", self.build_merchant_ordering_patterns, result_format=result_format, merchant_id=merchant_id)
     
     def execute_custom_query(self, query: str) -> List[Dict]:
         """Custom SQL query ажиллуулах"""
         return self.execute_query(query)
     
     def close(self):
-        """Холболт хаах"""
-        if self.conn:
-            self.conn.close()
+        """Холболтын pool хаах"""
+        self.pool.close()
 
 # Global database instance (lazy connection)
 db = Database()
@@ -0,0 +1,185 @@
+"""
+Асуултын төрлийг (intent) LLM-гүйгээр хурдан тодорхойлох classifier
+
+Монгол, англи түлхүүр үгсийг урьдчилан compile хийсэн regex бүлгүүдээр шалгаж,
+тохирсон intent-үүдээс хамгийн өндөр оноотойг сонгоно. Юу ч тохирохгүй үед л
+LLM-ээс асууж, хариуг нь normalize хийсэн асуултаар нь санаж авна.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# execute_query-д дэмжигдсэн intent-үүд
+KNOWN_INTENTS = {
+    "sku", "merchant", "district", "time_period", "sales_rep",
+    "top_skus", "district_trends", "category_summary",
+}
+
+# Түлхүүр үгсийн бүлгүүд (англи үгс үгийн эхнээс, монгол үгс залгавартай тул язгуураар)
+KEYWORDS = {
+    "sku": [r"\bsku", r"бүтээгдэхүүн", r"\bproduct", r"\bitem", r"\bбараа"],
+    "merchant": [r"\bmerchant", r"худалдаачин", r"\bclient", r"\bcustomer", r"харилцагч", r"дэлгүүр"],
+    "district": [r"\bdistrict", r"\bбүс", r"\bregion", r"\barea", r"дүүрэг"],
+    "daily": [r"\bdaily\b", r"өдөр", r"өдр"],
+    "weekly": [r"\bweek", r"долоо хоног"],
+    "monthly": [r"\bmonth", r"\bсар"],
+    "sales_rep": [r"sales ?reps?\b", r"\breps?\b", r"төлөөлөгч", r"salesperson", r"борлуулагч"],
+    "top": [r"\btop\b", r"\bbest\b", r"\bhighest\b", r"дээд", r"хамгийн", r"шилдэг"],
+    "trend": [r"\btrend", r"чиг хандлага"],
+    "category": [r"\bcategor", r"категори", r"ангилал"],
+}
+
+# (intent, оноо, заавал тохирох бүлгүүд). Өндөр оноотой нь давуу.
+# Оноонуудын дараалал өмнөх parse_query-гийн "сүүлд тохирсон нь давуу" дүрэмтэй ижил.
+INTENT_RULES: List[Tuple[str, int, List[str]]] = [
+    ("sku", 10, ["sku"]),
+    ("merchant", 20, ["merchant"]),
+    ("district", 30, ["district"]),
+    ("time_period", 40, ["daily"]),
+    ("time_period", 40, ["weekly"]),
+    ("time_period", 40, ["monthly"]),
+    ("sales_rep", 50, ["sales_rep"]),
+    ("category_summary", 55, ["category"]),
+    ("district_trends", 58, ["district", "trend"]),
+    ("top_skus", 62, ["top", "sku"]),
+    ("district_trends", 61, ["top", "district"]),
+    ("district_trends", 61, ["top", "trend"]),
+    ("category_summary", 60, ["top", "category"]),
+]
+
+# Intent тус бүрийн шүүлтүүр гаргах regex
+FILTER_PATTERNS = {
+    "sku": [("sku_id", re.compile(r"sku(?:\s*id)?[:\s#]+(\d+)"), int)],
+    "merchant": [("merchant_id", re.compile(r"merchant(?:\s*id)?[:\s#]+(\d+)"), int)],
+    "district": [("district", re.compile(r"district[:\s]+([a-zа-я\s]+)", re.IGNORECASE), str.strip)],
+    "sales_rep": [("sales_rep_id", re.compile(r"rep(?:\s*id)?[:\s#]+(\d+)"), int)],
+}
+
+DATE_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})")
+_NORMALIZE_SPACES = re.compile(r"\s+")
+_NORMALIZE_DIGITS = re.compile(r"\d+")
+_NORMALIZE_PUNCT = re.compile(r"[^\w\s-]")
+
+
+class IntentClassifier:
+    """Хүснэгтээр удирдагдах intent classifier + LLM ангиллын memo"""
+
+    def __init__(self, keywords: Dict[str, List[str]] = KEYWORDS,
+                 rules: List[Tuple[str, int, List[str]]] = INTENT_RULES, memo_size: int = 2048):
+        self.keywords = {name: re.compile("|".join(patterns)) for name, patterns in keywords.items()}
+        self.rules = sorted(rules, key=lambda rule: -rule[1])
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"total": 0, "fast_path": 0, "memo_hits": 0, "llm_calls": 0}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Memo-д зориулж асуултыг normalize хийх (тоо, цэг таслал, зайг үл тооно)"""
+        text = _NORMALIZE_PUNCT.sub(" ", query.lower())
+        text = _NORMALIZE_DIGITS.sub("#", text)
+        return _NORMALIZE_SPACES.sub(" ", text).strip()
+
+    def match(self, query: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Түлхүүр үгсээр intent болон шүүлтүүр гаргах (тохирохгүй бол intent None)"""
+        query_lower = query.lower()
+        hits = {name: bool(pattern.search(query_lower)) for name, pattern in self.keywords.items()}
+
+        intent = None
+        for name, _, groups in self.rules:
+            if all(hits[group] for group in groups):
+                intent = name
+                break
+
+        filters: Dict[str, Any] = {}
+        if intent == "time_period":
+            for period in ("daily", "weekly", "monthly"):
+                if hits[period]:
+                    filters["period"] = period
+                    break
+        for key, pattern, convert in FILTER_PATTERNS.get(intent, []):
+            found = pattern.search(query_lower)
+            if found:
+                filters[key] = convert(found.group(1))
+
+        dates = DATE_PATTERN.findall(query)
+        if len(dates) >= 2:
+            filters["start_date"] = dates[0]
+            filters["end_date"] = dates[1]
+        elif len(dates) == 1:
+            filters["start_date"] = dates[0]
+        return intent, filters
+
+    def _lookup(self, query: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Түлхүүр үг, дараа нь memo-оос хайх (олдохгүй бол intent None)"""
+        intent, filters = self.match(query)
+        with self._lock:
+            self._stats["total"] += 1
+            if intent:
+                self._stats["fast_path"] += 1
+                return intent, filters
+            key = self.normalize(query)
+            remembered = self._memo.get(key)
+            if remembered is not None:
+                self._memo.move_to_end(key)
+                self._stats["memo_hits"] += 1
+                return remembered, filters
+            self._stats["llm_calls"] += 1
+        return None, filters
+
+    def _learn(self, query: str, label: Optional[str]) -> str:
+        """LLM-ийн хариуг санах (general ч гэсэн). None бол LLM алдаа - санахгүй, дараа дахин асууна"""
+        if label is None:
+            return "general"
+        label = self.clean_label(label)
+        self.remember(query, label)
+        return label
+
+    def classify(self, query: str, fallback: Optional[Callable[[str], Optional[str]]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Intent тодорхойлох. Түлхүүр үг тохирохгүй бол memo, дараа нь fallback (LLM)"""
+        intent, filters = self._lookup(query)
+        if intent:
+            return intent, filters
+        if fallback is None:
+            return "general", filters
+        return self._learn(query, fallback(query)), filters
+
+    async def classify_async(self, query: str,
+                             fallback: Optional[Callable[[str], Awaitable[Optional[str]]]] = None) -> Tuple[str, Dict[str, Any]]:
+        """classify-тай ижил, fallback нь async (LLMClient) үед"""
+        intent, filters = self._lookup(query)
+        if intent:
+            return intent, filters
+        if fallback is None:
+            return "general", filters
+        return self._learn(query, await fallback(query)), filters
+
+    @staticmethod
+    def clean_label(label: Optional[str]) -> str:
+        """LLM-ийн хариуг мэдэгдэж буй intent болгох (танигдахгүй бол general)"""
+        label = (label or "").strip().strip("`'\".").lower()
+        return label if label in KNOWN_INTENTS else "general"
+
+    def remember(self, query: str, label: str):
+        """LLM-ийн ангиллыг санах"""
+        with self._lock:
+            key = self.normalize(query)
+            self._memo[key] = label
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Хэдэн асуулт LLM-ээр ангилагдсан тухай статистик"""
+        with self._lock:
+            total = self._stats["total"]
+            return {
+                **self._stats,
+                "memo_entries": len(self._memo),
+                "llm_share": round(self._stats["llm_calls"] / total, 4) if total else 0.0,
+            }
+
+
+# Global classifier instance
+intent_classifier = IntentClassifier()
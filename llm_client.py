@@ -0,0 +1,231 @@
+"""
+Async Gemini client: deadline, concurrency хязгаар, jitter-тэй retry, cancellation
+
+LLM_FAKE=1 үед жинхэнэ Gemini-ийн оронд FakeGenerativeModel ашиглана
+(local тест, benchmark-д зориулсан).
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+import metrics
+from dotenv import load_dotenv
+load_dotenv()
+
+# Дахин оролдож болох (түр зуурын) алдаанууд - google.api_core import хийхгүйн тулд нэрээр нь
+RETRYABLE_ERRORS = {
+    "DeadlineExceeded", "ServiceUnavailable", "ResourceExhausted",
+    "InternalServerError", "TooManyRequests", "Aborted", "ServerError",
+}
+
+
+def extract_text(response: Any) -> Optional[str]:
+    """Gemini response-оос текст авах"""
+    try:
+        if hasattr(response, 'text') and response.text:
+            return response.text
+    except ValueError:
+        # Блоклогдсон хариунд .text нь ValueError өгдөг
+        pass
+    if hasattr(response, 'candidates') and response.candidates:
+        parts = response.candidates[0].content.parts
+        if parts:
+            return parts[0].text
+    return None
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStream:
+    """stream=True үед Gemini-ийн хариуг үгээр хуваан дуурайх"""
+
+    def __init__(self, text: str, latency: float):
+        words = text.split(" ")
+        self._chunks = [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+        self._delay = latency / max(len(self._chunks), 1)
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            time.sleep(self._delay)
+            yield FakeResponse(chunk)
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._delay)
+            yield FakeResponse(chunk)
+
+
+class FakeGenerativeModel:
+    """Сүлжээгүй ажиллах Gemini загварын орлуулга (latency-г дуурайна)"""
+
+    def __init__(self, latency: float = 0.05, reply: Optional[str] = None):
+        self.latency = latency
+        self.reply = reply
+        self.calls = 0
+
+    def _reply(self, prompt: str) -> str:
+        self.calls += 1
+        if self.reply is not None:
+            return self.reply
+        return f"[fake] {len(prompt)} тэмдэгттэй prompt-д хариулав."
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs) -> Any:
+        if stream:
+            return FakeStream(self._reply(prompt), self.latency)
+        time.sleep(self.latency)
+        return FakeResponse(self._reply(prompt))
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs) -> Any:
+        if stream:
+            return FakeStream(self._reply(prompt), self.latency)
+        await asyncio.sleep(self.latency)
+        return FakeResponse(self._reply(prompt))
+
+
+class LLMClient:
+    """Gemini загварыг async байдлаар, хязгаартай, timeout-той дуудах давхарга"""
+
+    def __init__(self, model: Any, max_concurrency: int = 4, timeout: float = 30.0,
+                 retries: int = 2, backoff: float = 0.5):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self._in_flight = 0
+        self._stats = {"calls": 0, "retries": 0, "timeouts": 0, "errors": 0, "cancelled": 0}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphore нь event loop-той холбогддог тул loop солигдвол шинээр үүсгэнэ
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _call(self, prompt: str, **kwargs) -> Any:
+        if hasattr(self.model, "generate_content_async"):
+            return await self.model.generate_content_async(prompt, **kwargs)
+        # Async дэмжихгүй SDK бол thread дээр (cancel хийхэд thread дуусахыг хүлээхгүй)
+        return await asyncio.to_thread(self.model.generate_content, prompt, **kwargs)
+
+    @staticmethod
+    def _is_retryable(error: BaseException) -> bool:
+        if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+            return True
+        return type(error).__name__ in RETRYABLE_ERRORS
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None, operation: str = "generate") -> Optional[str]:
+        """Prompt-д хариу авах. Оролдлого бүр timeout-той, түр зуурын алдаанд retry хийнэ."""
+        timeout = self.timeout if timeout is None else timeout
+        async with self._get_semaphore():
+            self._in_flight += 1
+            try:
+                with metrics.track_llm(operation):
+                    for attempt in range(self.retries + 1):
+                        self._stats["calls"] += 1
+                        try:
+                            response = await asyncio.wait_for(self._call(prompt), timeout)
+                            return extract_text(response)
+                        except asyncio.CancelledError:
+                            self._stats["cancelled"] += 1
+                            raise
+                        except Exception as e:
+                            if isinstance(e, asyncio.TimeoutError):
+                                self._stats["timeouts"] += 1
+                            else:
+                                self._stats["errors"] += 1
+                            if attempt >= self.retries or not self._is_retryable(e):
+                                raise
+                            self._stats["retries"] += 1
+                            # Exponential backoff + jitter
+                            await asyncio.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+            finally:
+                self._in_flight -= 1
+
+    async def _open_stream(self, prompt: str) -> AsyncIterator[Any]:
+        if hasattr(self.model, "generate_content_async"):
+            response = await self.model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                yield chunk
+            return
+        # Sync SDK: chunk бүрийг thread дээр авна
+        response = await asyncio.to_thread(self.model.generate_content, prompt, stream=True)
+        iterator = iter(response)
+        done = object()
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, done)
+            if chunk is done:
+                return
+            yield chunk
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None, operation: str = "stream") -> AsyncIterator[str]:
+        """Хариуг хэсэг хэсгээр (token) авах. Timeout нь chunk хоорондын хугацаа.
+        Эхний chunk ирэхээс өмнөх түр зуурын алдаанд retry хийнэ."""
+        timeout = self.timeout if timeout is None else timeout
+        async with self._get_semaphore():
+            self._in_flight += 1
+            try:
+                with metrics.track_llm(operation):
+                    for attempt in range(self.retries + 1):
+                        self._stats["calls"] += 1
+                        chunks = self._open_stream(prompt)
+                        emitted = False
+                        try:
+                            while True:
+                                try:
+                                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                                except StopAsyncIteration:
+                                    return
+                                text = extract_text(chunk)
+                                if text:
+                                    emitted = True
+                                    yield text
+                        except asyncio.CancelledError:
+                            self._stats["cancelled"] += 1
+                            raise
+                        except Exception as e:
+                            if isinstance(e, asyncio.TimeoutError):
+                                self._stats["timeouts"] += 1
+                            else:
+                                self._stats["errors"] += 1
+                            # Хэсэгчлэн илгээсэн бол дахин эхлүүлэхгүй (давхардна)
+                            if emitted or attempt >= self.retries or not self._is_retryable(e):
+                                raise
+                            self._stats["retries"] += 1
+                            await asyncio.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+                        finally:
+                            await chunks.aclose()
+            finally:
+                self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Дуудлагын статистик"""
+        return {**self._stats, "in_flight": self._in_flight, "max_concurrency": self.max_concurrency}
+
+
+def create_model(api_key: str, model_name: str = 'gemini-pro') -> Any:
+    """Gemini загвар үүсгэх (LLM_FAKE=1 бол fake загвар)"""
+    if os.getenv("LLM_FAKE", "0") == "1":
+        return FakeGenerativeModel(latency=float(os.getenv("LLM_FAKE_LATENCY", "0.05")))
+    # SDK-г (grpc, protobuf) анх загвар үүсгэхэд л import хийнэ - процессын эхлэлийг удаашруулахгүй
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+
+def create_client(model: Any) -> LLMClient:
+    """Environment-оос тохиргоо авч LLMClient үүсгэх"""
+    return LLMClient(
+        model,
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+        timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+        retries=int(os.getenv("LLM_RETRIES", "2")),
+        backoff=float(os.getenv("LLM_RETRY_BACKOFF", "0.5")),
+    )
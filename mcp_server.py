@@ -4,12 +4,19 @@ Model Context Protocol сервер
 """
 import asyncio
 import json
+import sys
+import uuid
 from typing import Any, Optional
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
-from database import db
-from ai_agent import BusinessAIAgent
+from database import db, MAX_TOP_LIMIT
+from ai_agent import get_agent
+import rollups
+import columnar
+import batch
+import metrics
+import serialization
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -17,9 +24,6 @@ load_dotenv()
 # MCP сервер үүсгэх
 server = Server("retail-beverage-assistant")
 
-# AI agent үүсгэх
-agent = BusinessAIAgent(os.getenv("GEMINI_API_KEY", ""))
-
 @server.list_tools()
 async def list_tools() -> list[Tool]:
     """Боломжтой tool-уудыг жагсаах"""
@@ -90,7 +94,8 @@ async def list_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "limit": {"type": "integer", "description": "Хэмжээ (default: 10)"},
+                    "limit": {"type": "integer", "minimum": 1, "maximum": MAX_TOP_LIMIT, "description": "Хэмжээ (default: 10, group_by өгвөл бүлэг бүрт)"},
+                    "group_by": {"type": "string", "enum": ["district", "category", "sales_rep"], "description": "Бүлэг бүрийн top SKU (optional)"},
                     "start_date": {"type": "string", "description": "Эхлэх огноо (YYYY-MM-DD)"},
                     "end_date": {"type": "string", "description": "Дуусах огноо (YYYY-MM-DD)"}
                 }
@@ -118,6 +123,51 @@ async def list_tools() -> list[Tool]:
                 }
             }
         ),
+        Tool(
+            name="batch_query",
+            description="Олон борлуулалтын query-г нэг дуудлагаар зэрэг ажиллуулах",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "description": "Query-нүүдийн жагсаалт",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {"type": "string", "description": "Үр дүнгийн нэр (optional)"},
+                                "query": {"type": "string", "enum": list(batch.BATCH_QUERIES)},
+                                "params": {"type": "object", "description": "Шүүлтүүр (start_date, end_date гэх мэт)"}
+                            },
+                            "required": ["query"]
+                        }
+                    }
+                },
+                "required": ["queries"]
+            }
+        ),
+        Tool(
+            name="call_tools",
+            description="Хэд хэдэн борлуулалтын tool-ыг нэг дуудлагаар зэрэг ажиллуулж, үр дүнг дарааллаар нь буцаах",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "calls": {
+                        "type": "array",
+                        "description": "Tool дуудлагуудын жагсаалт",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {"type": "string", "enum": list(batch.SALES_TOOLS)},
+                                "arguments": {"type": "object", "description": "Тухайн tool-ын arguments"}
+                            },
+                            "required": ["name"]
+                        }
+                    }
+                },
+                "required": ["calls"]
+            }
+        ),
         Tool(
             name="answer_business_question",
             description="Байгалийн хэл дээрх бизнесийн асуултанд хариулах",
@@ -131,77 +181,224 @@ async def list_tools() -> list[Tool]:
         )
     ]
 
-@server.call_tool()
-async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-    """Tool дуудах"""
-    try:
-        if name == "get_sales_by_sku":
-            result = db.get_sales_by_sku(
-                sku_id=arguments.get("sku_id"),
-                start_date=arguments.get("start_date"),
-                end_date=arguments.get("end_date")
-            )
-        elif name == "get_sales_by_merchant":
-            result = db.get_sales_by_merchant(
-                merchant_id=arguments.get("merchant_id"),
-                start_date=arguments.get("start_date"),
-                end_date=arguments.get("end_date")
-            )
-        elif name == "get_sales_by_district":
-            result = db.get_sales_by_district(
-                district=arguments.get("district"),
-                start_date=arguments.get("start_date"),
-                end_date=arguments.get("end_date")
-            )
-        elif name == "get_sales_by_time_period":
-            result = db.get_sales_by_time_period(
-                period=arguments.get("period", "daily"),
-                start_date=arguments.get("start_date"),
-                end_date=arguments.get("end_date")
-            )
-        elif name == "get_sales_rep_performance":
-            result = db.get_sales_rep_performance(
-                sales_rep_id=arguments.get("sales_rep_id"),
+def run_tool(name: str, arguments: dict) -> Any:
+    """Database-ийн tool ажиллуулах (sync, thread дээр дуудагдана)"""
+    if name == "get_sales_by_sku":
+        result = db.get_sales_by_sku(
+            sku_id=arguments.get("sku_id"),
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif name == "get_sales_by_merchant":
+        result = db.get_sales_by_merchant(
+            merchant_id=arguments.get("merchant_id"),
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif name == "get_sales_by_district":
+        result = db.get_sales_by_district(
+            district=arguments.get("district"),
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif name == "get_sales_by_time_period":
+        result = db.get_sales_by_time_period(
+            period=arguments.get("period", "daily"),
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif name == "get_sales_rep_performance":
+        result = db.get_sales_rep_performance(
+            sales_rep_id=arguments.get("sales_rep_id"),
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif name == "get_top_skus":
+        if arguments.get("group_by"):
+            result = db.get_top_skus_by_group(
+                group_by=arguments["group_by"],
+                limit=arguments.get("limit", 10),
                 start_date=arguments.get("start_date"),
                 end_date=arguments.get("end_date")
             )
-        elif name == "get_top_skus":
+        else:
             result = db.get_top_skus(
                 limit=arguments.get("limit", 10),
                 start_date=arguments.get("start_date"),
                 end_date=arguments.get("end_date")
             )
-        elif name == "get_district_trends":
-            result = db.get_district_trends(
-                start_date=arguments.get("start_date"),
-                end_date=arguments.get("end_date")
-            )
-        elif name == "get_category_summary":
-            result = db.get_category_summary(
-                start_date=arguments.get("start_date"),
-                end_date=arguments.get("end_date")
-            )
+    elif name == "get_district_trends":
+        result = db.get_district_trends(
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif name == "get_category_summary":
+        result = db.get_category_summary(
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    else:
+        raise ValueError(f"Unknown tool: {name}")
+    return result
+
+@server.call_tool()
+async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+    """Tool дуудах"""
+    try:
+        if name == "batch_query":
+            result = await asyncio.to_thread(batch.run_batch, db, arguments.get("queries", []))
+        elif name == "call_tools":
+            result = await batch.run_tool_calls_async(run_tool, arguments.get("calls", []))
         elif name == "answer_business_question":
             question = arguments.get("question", "")
-            result = agent.answer(question)
+            result = await get_agent().answer_async(question)
         else:
-            result = {"error": f"Unknown tool: {name}"}
+            # Database query event loop-ийг блоклохгүй
+            result = await asyncio.to_thread(run_tool, name, arguments)
         
         return [TextContent(
             type="text",
-            text=json.dumps(result, indent=2, default=str)
+            text=serialization.dumps_str(result)
         )]
     except Exception as e:
         return [TextContent(
             type="text",
-            text=json.dumps({"error": str(e)}, indent=2)
+            text=serialization.dumps_str({"error": str(e)})
         )]
 
+def _id_key(request_id: Any) -> str:
+    # 1 ба "1" өөр id
+    return json.dumps(request_id)
+
+
+class BatchingStdout:
+    """JSON-RPC batch-ийн гишүүдийн хариуг цуглуулж, бүгд ирмэгц нэг массив болгон бичих
+
+    Гишүүд SDK-д давтагдашгүй дотоод id-тай очдог тул өөр batch эсвэл дангаар
+    ирсэн хүсэлт ижил id-тай байсан ч хариунууд холилдохгүй.
+    """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        # дотоод id -> (batch, slot-ийн индекс, client-ийн анхны id)
+        self._pending = {}
+        self._prefix = f"batch-{uuid.uuid4().hex[:12]}-"
+        self._counter = 0
+
+    def member_id(self) -> str:
+        """Batch-ийн гишүүнд SDK-д өгөх дотоод id"""
+        self._counter += 1
+        return f"{self._prefix}{self._counter}"
+
+    async def expect(self, slots: list):
+        """slots: хүсэлтийн дарааллаар ("id", (дотоод id, анхны id)) эсвэл ("response", бэлэн хариу)"""
+        batch = {"responses": [None] * len(slots), "waiting": 0}
+        for index, (kind, value) in enumerate(slots):
+            if kind == "id":
+                internal, original = value
+                self._pending[internal] = (batch, index, original)
+                batch["waiting"] += 1
+            else:
+                batch["responses"][index] = value
+        if not batch["waiting"]:
+            await self._write_batch(batch)
+
+    async def _write_batch(self, batch: dict):
+        if batch["responses"]:
+            await self.send(batch["responses"])
+
+    async def send(self, message: Any):
+        await self.stdout.write(json.dumps(message) + "\n")
+        await self.stdout.flush()
+
+    async def write(self, text: str):
+        try:
+            message = json.loads(text)
+        except ValueError:
+            message = None
+        entry = None
+        if isinstance(message, dict) and "method" not in message and isinstance(message.get("id"), str):
+            entry = self._pending.pop(message["id"], None)
+        if entry is None:
+            await self.stdout.write(text)
+            return
+        batch, index, original = entry
+        message["id"] = original
+        batch["responses"][index] = message
+        batch["waiting"] -= 1
+        if not batch["waiting"]:
+            await self._write_batch(batch)
+
+    async def flush(self):
+        await self.stdout.flush()
+
+
+class BatchingStdin:
+    """stdin-ийн JSON-RPC batch массивыг тусдаа мессеж болгон SDK-д дамжуулах (SDK batch дэмждэггүй)
+
+    SDK мессежүүдийг дарааллаар боловсруулдаг тул гишүүд нэг нэгээрээ ажиллана.
+    Зэрэг ажиллуулах бол call_tools tool ашиглана.
+    """
+
+    def __init__(self, stdin, stdout: BatchingStdout):
+        self.stdin = stdin
+        self.stdout = stdout
+
+    def __aiter__(self):
+        return self._lines()
+
+    async def _lines(self):
+        async for line in self.stdin:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                yield line
+                continue
+            if not isinstance(message, list):
+                yield line
+                continue
+            invalid = {"code": -32600, "message": "Invalid Request"}
+            if not message:
+                # Хоосон batch-д массив биш, ганц error хариу
+                await self.stdout.send({"jsonrpc": "2.0", "id": None, "error": invalid})
+                continue
+            slots, requests, seen = [], [], set()
+            for request in message:
+                if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                    request_id = request.get("id") if isinstance(request, dict) else None
+                    slots.append(("response", {"jsonrpc": "2.0", "id": request_id, "error": invalid}))
+                    continue
+                if "id" in request:
+                    key = _id_key(request["id"])
+                    if key in seen:
+                        # Нэг batch дотор давтагдсан id
+                        slots.append(("response", {"jsonrpc": "2.0", "id": request["id"], "error": invalid}))
+                        continue
+                    seen.add(key)
+                    internal = self.stdout.member_id()
+                    slots.append(("id", (internal, request["id"])))
+                    request = {**request, "id": internal}
+                requests.append(request)
+            # Хариу бичигдэхээс өмнө id-уудыг бүртгэнэ
+            await self.stdout.expect(slots)
+            for request in requests:
+                yield json.dumps(request) + "\n"
+
+
 async def main():
     """MCP серверийг ажиллуулах"""
+    rollups.enable_from_env()
+    columnar.enable_from_env()
+    # stdout нь MCP протоколынх тул metrics-ийн хураангуйг stderr-т бичнэ
+    metrics.start_reporter()
     try:
+        from io import TextIOWrapper
+        import anyio
         from mcp.server.stdio import stdio_server
-        async with stdio_server() as (read_stream, write_stream):
+        # JSON-RPC batch массивыг SDK-ийн өмнө/дараа задалж нийлүүлнэ (гишүүд SDK-д дарааллаар ажиллана)
+        stdout = BatchingStdout(anyio.wrap_file(TextIOWrapper(sys.stdout.buffer, encoding="utf-8")))
+        stdin = BatchingStdin(anyio.wrap_file(TextIOWrapper(sys.stdin.buffer, encoding="utf-8")), stdout)
+        async with stdio_server(stdin, stdout) as (read_stream, write_stream):
             await server.run(
                 read_stream,
                 write_stream,
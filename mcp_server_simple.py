@@ -1,174 +1,354 @@
 """
 Энгийн MCP Server (SDK шаардахгүй)
 JSON-RPC протокол ашиглах
+
+Хүсэлт бүр зэрэг боловсруулагдаж, дуусмагцаа өөрийн id-тай хариу буцаана
+(дараалал нь хүсэлтийнхээс өөр байж болно). JSON-RPC batch массивын хариу
+нэг массив, хүсэлтийн дарааллаар. Database-ийн tool-ууд worker
+thread pool дээр, answer_business_question event loop дээр async ажиллана.
+MCP_MAX_CONCURRENCY зэрэг ажиллах дээд хязгаар, MCP_MAX_PENDING-ээс олон
+хүсэлт хүлээгдэж байвал stdin-ээс уншихаа түр зогсооно (backpressure).
 """
-import json
+import asyncio
 import sys
-from database import db
-from ai_agent import BusinessAIAgent
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from database import db, MAX_TOP_LIMIT
+from ai_agent import get_agent
+import rollups
+import columnar
+import batch
+import metrics
+import serialization
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
-# AI agent үүсгэх
-agent = BusinessAIAgent(os.getenv("GEMINI_API_KEY", ""))
+# Зэрэг ажиллах tool дуудлагын тоо (worker thread-ийн тоо)
+MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", "8"))
+# Хариу хүлээж буй хүсэлтийн дээд тоо, хэтэрвэл stdin-ээс уншихгүй
+MAX_PENDING = int(os.getenv("MCP_MAX_PENDING", str(MAX_CONCURRENCY * 4)))
 
-def handle_request(request):
-    """Request боловсруулах"""
-    try:
-        method = request.get("method", "")
-        params = request.get("params", {})
-        
-        if method == "tools/list":
-            return {
-                "tools": [
-                    {
-                        "name": "get_sales_by_sku",
-                        "description": "SKU-аар борлуулалтын мэдээлэл авах",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "sku_id": {"type": "integer"},
-                                "start_date": {"type": "string"},
-                                "end_date": {"type": "string"}
-                            }
-                        }
-                    },
-                    {
-                        "name": "get_sales_by_merchant",
-                        "description": "Merchant-аар борлуулалтын мэдээлэл авах",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "merchant_id": {"type": "integer"},
-                                "start_date": {"type": "string"},
-                                "end_date": {"type": "string"}
-                            }
-                        }
-                    },
-                    {
-                        "name": "get_sales_by_district",
-                        "description": "District-аар борлуулалтын мэдээлэл авах",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "district": {"type": "string"},
-                                "start_date": {"type": "string"},
-                                "end_date": {"type": "string"}
-                            }
-                        }
-                    },
-                    {
-                        "name": "get_sales_by_time_period",
-                        "description": "Цаг хугацааны дагуу борлуулалтын мэдээлэл авах",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "period": {"type": "string", "enum": ["daily", "weekly", "monthly"]},
-                                "start_date": {"type": "string"},
-                                "end_date": {"type": "string"}
-                            }
-                        }
-                    },
-                    {
-                        "name": "get_sales_rep_performance",
-                        "description": "Sales rep-ийн гүйцэтгэлийн мэдээлэл авах",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "sales_rep_id": {"type": "integer"},
-                                "start_date": {"type": "string"},
-                                "end_date": {"type": "string"}
-                            }
-                        }
-                    },
-                    {
-                        "name": "answer_business_question",
-                        "description": "Байгалийн хэл дээрх бизнесийн асуултанд хариулах",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "question": {"type": "string"}
-                            },
-                            "required": ["question"]
-                        }
-                    }
-                ]
+# JSON-RPC 2.0 алдааны кодууд
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+
+class RPCError(Exception):
+    """JSON-RPC error хариу болгон буцаах алдаа"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+# call_tools-оор нэг дуудлагад нийлүүлж болох tool-ууд
+COMPOSITE_TOOLS = tuple(name for name in batch.SALES_TOOLS
+                        if name not in ("get_district_trends", "get_category_summary"))
+
+TOOLS = [
+    {
+        "name": "get_sales_by_sku",
+        "description": "SKU-аар борлуулалтын мэдээлэл авах",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "sku_id": {"type": "integer"},
+                "start_date": {"type": "string"},
+                "end_date": {"type": "string"}
             }
-        
-        elif method == "tools/call":
-            tool_name = params.get("name", "")
-            arguments = params.get("arguments", {})
-            
-            if tool_name == "get_sales_by_sku":
-                result = db.get_sales_by_sku(
-                    sku_id=arguments.get("sku_id"),
-                    start_date=arguments.get("start_date"),
-                    end_date=arguments.get("end_date")
-                )
-            elif tool_name == "get_sales_by_merchant":
-                result = db.get_sales_by_merchant(
-                    merchant_id=arguments.get("merchant_id"),
-                    start_date=arguments.get("start_date"),
-                    end_date=arguments.get("end_date")
-                )
-            elif tool_name == "get_sales_by_district":
-                result = db.get_sales_by_district(
-                    district=arguments.get("district"),
-                    start_date=arguments.get("start_date"),
-                    end_date=arguments.get("end_date")
-                )
-            elif tool_name == "get_sales_by_time_period":
-                result = db.get_sales_by_time_period(
-                    period=arguments.get("period", "daily"),
-                    start_date=arguments.get("start_date"),
-                    end_date=arguments.get("end_date")
-                )
-            elif tool_name == "get_sales_rep_performance":
-                result = db.get_sales_rep_performance(
-                    sales_rep_id=arguments.get("sales_rep_id"),
-                    start_date=arguments.get("start_date"),
-                    end_date=arguments.get("end_date")
-                )
-            elif tool_name == "answer_business_question":
-                question = arguments.get("question", "")
-                result = agent.answer(question)
-            else:
-                result = {"error": f"Unknown tool: {tool_name}"}
-            
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps(result, indent=2, default=str)
-                    }
-                ]
+        }
+    },
+    {
+        "name": "get_sales_by_merchant",
+        "description": "Merchant-аар борлуулалтын мэдээлэл авах",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "merchant_id": {"type": "integer"},
+                "start_date": {"type": "string"},
+                "end_date": {"type": "string"}
+            }
+        }
+    },
+    {
+        "name": "get_sales_by_district",
+        "description": "District-аар борлуулалтын мэдээлэл авах",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "district": {"type": "string"},
+                "start_date": {"type": "string"},
+                "end_date": {"type": "string"}
             }
-        
+        }
+    },
+    {
+        "name": "get_sales_by_time_period",
+        "description": "Цаг хугацааны дагуу борлуулалтын мэдээлэл авах",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "period": {"type": "string", "enum": ["daily", "weekly", "monthly"]},
+                "start_date": {"type": "string"},
+                "end_date": {"type": "string"}
+            }
+        }
+    },
+    {
+        "name": "get_sales_rep_performance",
+        "description": "Sales rep-ийн гүйцэтгэлийн мэдээлэл авах",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "sales_rep_id": {"type": "integer"},
+                "start_date": {"type": "string"},
+                "end_date": {"type": "string"}
+            }
+        }
+    },
+    {
+        "name": "get_top_skus",
+        "description": "Хамгийн их борлуулалттай SKU-ууд (group_by өгвөл бүлэг бүрийн)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {"type": "integer", "minimum": 1, "maximum": MAX_TOP_LIMIT},
+                "group_by": {"type": "string", "enum": ["district", "category", "sales_rep"]},
+                "start_date": {"type": "string"},
+                "end_date": {"type": "string"}
+            }
+        }
+    },
+    {
+        "name": "batch_query",
+        "description": "Олон борлуулалтын query-г нэг дуудлагаар зэрэг ажиллуулах",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "queries": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "query": {"type": "string", "enum": list(batch.BATCH_QUERIES)},
+                            "params": {"type": "object"}
+                        },
+                        "required": ["query"]
+                    }
+                }
+            },
+            "required": ["queries"]
+        }
+    },
+    {
+        "name": "call_tools",
+        "description": "Хэд хэдэн борлуулалтын tool-ыг нэг дуудлагаар зэрэг ажиллуулж, үр дүнг дарааллаар нь буцаах",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "calls": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string", "enum": list(COMPOSITE_TOOLS)},
+                            "arguments": {"type": "object"}
+                        },
+                        "required": ["name"]
+                    }
+                }
+            },
+            "required": ["calls"]
+        }
+    },
+    {
+        "name": "answer_business_question",
+        "description": "Байгалийн хэл дээрх бизнесийн асуултанд хариулах",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "question": {"type": "string"}
+            },
+            "required": ["question"]
+        }
+    }
+]
+
+
+def call_tool(tool_name: str, arguments: Dict[str, Any]) -> Any:
+    """Database-ийн tool ажиллуулах (sync, worker thread дээр дуудагдана)"""
+    if tool_name == "get_sales_by_sku":
+        result = db.get_sales_by_sku(
+            sku_id=arguments.get("sku_id"),
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif tool_name == "get_sales_by_merchant":
+        result = db.get_sales_by_merchant(
+            merchant_id=arguments.get("merchant_id"),
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif tool_name == "get_sales_by_district":
+        result = db.get_sales_by_district(
+            district=arguments.get("district"),
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif tool_name == "get_sales_by_time_period":
+        result = db.get_sales_by_time_period(
+            period=arguments.get("period", "daily"),
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif tool_name == "get_sales_rep_performance":
+        result = db.get_sales_rep_performance(
+            sales_rep_id=arguments.get("sales_rep_id"),
+            start_date=arguments.get("start_date"),
+            end_date=arguments.get("end_date")
+        )
+    elif tool_name == "get_top_skus":
+        if arguments.get("group_by"):
+            result = db.get_top_skus_by_group(
+                group_by=arguments["group_by"],
+                limit=arguments.get("limit", 10),
+                start_date=arguments.get("start_date"),
+                end_date=arguments.get("end_date")
+            )
         else:
-            return {"error": f"Unknown method: {method}"}
-    
+            result = db.get_top_skus(
+                limit=arguments.get("limit", 10),
+                start_date=arguments.get("start_date"),
+                end_date=arguments.get("end_date")
+            )
+    elif tool_name == "batch_query":
+        result = batch.run_batch(db, arguments.get("queries", []))
+    elif tool_name == "call_tools":
+        result = batch.run_tool_calls(call_tool, arguments.get("calls", []), COMPOSITE_TOOLS)
+    elif tool_name == "answer_business_question":
+        result = get_agent().answer(arguments.get("question", ""))
+    else:
+        raise ValueError(f"Unknown tool: {tool_name}")
+    return result
+
+
+def tool_content(result: Any, is_error: bool = False) -> Dict[str, Any]:
+    """tools/call-ийн MCP хариу"""
+    content = {"content": [{"type": "text", "text": serialization.dumps_str(result)}]}
+    if is_error:
+        content["isError"] = True
+    return content
+
+
+def handle_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Request боловсруулах (answer_business_question-оос бусад нь sync)"""
+    method = request.get("method", "")
+    params = request.get("params") or {}
+    if method == "tools/list":
+        return {"tools": TOOLS}
+    if method == "tools/call":
+        try:
+            return tool_content(call_tool(params.get("name", ""), params.get("arguments") or {}))
+        except Exception as e:
+            return tool_content({"error": str(e)}, is_error=True)
+    raise RPCError(METHOD_NOT_FOUND, f"Unknown method: {method}")
+
+
+async def handle_request_async(request: Dict[str, Any], executor: ThreadPoolExecutor) -> Dict[str, Any]:
+    """answer_business_question-ийг event loop дээр, бусдыг worker thread дээр ажиллуулах"""
+    params = request.get("params") or {}
+    if request.get("method") == "tools/call" and params.get("name") == "answer_business_question":
+        try:
+            question = (params.get("arguments") or {}).get("question", "")
+            return tool_content(await get_agent().answer_async(question))
+        except Exception as e:
+            return tool_content({"error": str(e)}, is_error=True)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, handle_request, request)
+
+
+async def process_message(request: Any, running: asyncio.Semaphore, executor: ThreadPoolExecutor) -> Optional[Dict[str, Any]]:
+    """Нэг JSON-RPC хүсэлтийг боловсруулж хариуг буцаах (notification бол None)"""
+    if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+        request_id = request.get("id") if isinstance(request, dict) else None
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": INVALID_REQUEST, "message": "Invalid Request"}}
+    try:
+        async with running:
+            response = {"jsonrpc": "2.0", "id": request.get("id"), "result": await handle_request_async(request, executor)}
+    except RPCError as e:
+        response = {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": e.code, "message": e.message}}
     except Exception as e:
-        return {"error": str(e)}
+        response = {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": INTERNAL_ERROR, "message": str(e)}}
+    # id-гүй хүсэлт нь notification - хариу буцаахгүй
+    return response if "id" in request else None
+
+
+async def process_line(line: str, running: asyncio.Semaphore, executor: ThreadPoolExecutor) -> Any:
+    """Нэг мөрийг (хүсэлт эсвэл batch массив) боловсруулах. Буцаах хариугүй бол None"""
+    try:
+        message = serialization.loads(line)
+    except ValueError:
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": "Invalid JSON"}}
+    if not isinstance(message, list):
+        return await process_message(message, running, executor)
+    if not message:
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": INVALID_REQUEST, "message": "Invalid Request"}}
+    # Batch: гишүүд зэрэг ажиллаж, хариунууд хүсэлтийн дарааллаар нэг массив болно
+    responses = await asyncio.gather(*(process_message(request, running, executor) for request in message))
+    responses = [response for response in responses if response is not None]
+    return responses or None
+
+
+async def serve(stdin=sys.stdin, stdout=sys.stdout, concurrency: int = MAX_CONCURRENCY, max_pending: int = MAX_PENDING):
+    """stdin-ээс хүсэлт уншиж зэрэг боловсруулах, хариу бүрийг дуусмагц stdout-д бичих"""
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="mcp-worker")
+    running = asyncio.Semaphore(concurrency)
+    pending = asyncio.Semaphore(max_pending)
+    tasks = set()
+
+    async def respond(line: str):
+        try:
+            response = await process_line(line, running, executor)
+            if response is not None:
+                # Зөвхөн event loop бичдэг тул мөрүүд холилдохгүй
+                print(serialization.dumps_str(response, pretty=False), file=stdout, flush=True)
+        finally:
+            pending.release()
+
+    try:
+        while True:
+            # Хүлээгдэж буй хүсэлт хязгаарт хүрвэл нэг нь дуустал уншихгүй
+            await pending.acquire()
+            line = await loop.run_in_executor(None, stdin.readline)
+            if not line:
+                pending.release()
+                break
+            if not line.strip():
+                pending.release()
+                continue
+            task = asyncio.create_task(respond(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        # stdin хаагдсан ч эхэлсэн хүсэлтүүдийн хариуг бичнэ
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        executor.shutdown(wait=False)
+
 
 def main():
     """Main loop - stdin/stdout ашиглах"""
-    for line in sys.stdin:
-        try:
-            request = json.loads(line.strip())
-            response = handle_request(request)
-            
-            # Response илгээх
-            response_json = json.dumps(response)
-            print(response_json, flush=True)
-        
-        except json.JSONDecodeError:
-            error_response = {"error": "Invalid JSON"}
-            print(json.dumps(error_response), flush=True)
-        except Exception as e:
-            error_response = {"error": str(e)}
-            print(json.dumps(error_response), flush=True)
+    rollups.enable_from_env()
+    columnar.enable_from_env()
+    # stdout нь протоколынх тул metrics-ийн хураангуйг stderr-т бичнэ
+    metrics.start_reporter()
+    asyncio.run(serve())
 
 if __name__ == "__main__":
     main()
-
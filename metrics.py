@@ -0,0 +1,208 @@
+"""
+Query болон LLM дуудлагын instrumentation (Prometheus text format)
+
+Histogram/counter-ууд санах ойд хадгалагдаж, api.py-ийн /metrics endpoint
+Prometheus-ийн text exposition format-аар гаргана. MCP серверүүд
+METRICS_REPORT_INTERVAL секунд тутамд stderr-т товч хураангуй бичнэ.
+Нэг бичилт нь нэг lock + bisect тул production-д асаалттай байлгаж болно.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+load_dotenv()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Label тус бүрээр өсөх тоолуур"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {_format_value(total)}")
+        return lines
+
+
+class Histogram:
+    """Тогтмол bucket-тай histogram (Prometheus-ийн cumulative bucket-аар гаргана)"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label -> [bucket бүрийн тоо..., +Inf тоо, sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[LabelValues, Tuple[List[float], float]]:
+        """label -> (bucket бүрийн (cumulative биш) тоо, sum)"""
+        with self._lock:
+            return {values: (series[:-1], series[-1]) for values, series in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total) in sorted(self.snapshot().items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labels, values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            cumulative += counts[-1]
+            labels = _format_labels(self.labels, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {repr(float(total))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Бүх metric-ийг нэг дор гаргах"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_duration_seconds", "Database query-ийн хугацаа", ("template",))
+DB_QUERY_ROWS = registry.histogram(
+    "db_query_rows", "Query-ийн буцаасан мөрийн тоо", ("template",), ROW_BUCKETS)
+DB_QUERY_ERRORS = registry.counter(
+    "db_query_errors_total", "Алдаа гарсан query-ийн тоо", ("template",))
+LLM_SECONDS = registry.histogram(
+    "llm_request_duration_seconds", "Gemini дуудлагын хугацаа", ("operation",))
+LLM_ERRORS = registry.counter(
+    "llm_errors_total", "Алдаа/timeout гарсан Gemini дуудлагын тоо", ("operation",))
+AGENT_SECONDS = registry.histogram(
+    "agent_answer_duration_seconds", "Асуултанд хариулах нийт хугацаа", ("intent",))
+HTTP_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP хүсэлтийн хугацаа", ("endpoint", "method", "status"))
+
+
+def observe_query(template: str, seconds: float, rows: Optional[int] = None, error: bool = False):
+    """Нэг query-ийн хэмжилтийг бүртгэх"""
+    DB_QUERY_SECONDS.observe(seconds, template)
+    if error:
+        DB_QUERY_ERRORS.inc(template)
+    elif rows is not None:
+        DB_QUERY_ROWS.observe(rows, template)
+
+
+@contextmanager
+def track_llm(operation: str):
+    """Gemini дуудлагын хугацаа, алдааг бүртгэх"""
+    started = time.perf_counter()
+    try:
+        yield
+    except (asyncio.CancelledError, GeneratorExit):
+        # Client салсан - алдаа биш
+        raise
+    except BaseException:
+        LLM_ERRORS.inc(operation)
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, operation)
+
+
+def summary() -> List[str]:
+    """Template бүрийн тоо, дундаж хугацаа, алдааны товч хураангуй (stderr-т зориулсан)"""
+    lines = []
+    for histogram, counter, label in ((DB_QUERY_SECONDS, DB_QUERY_ERRORS, "query"), (LLM_SECONDS, LLM_ERRORS, "llm")):
+        errors = counter.snapshot()
+        for values, (counts, total) in sorted(histogram.snapshot().items()):
+            count = int(sum(counts))
+            if not count:
+                continue
+            failed = int(errors.get(values, 0))
+            lines.append(f"{label} {values[0]}: n={count} avg={total / count * 1000:.1f}ms errors={failed}")
+    return lines
+
+
+def start_reporter(interval: Optional[float] = None, stream=None) -> Optional[threading.Thread]:
+    """interval секунд тутамд хураангуйг stderr-т бичих background thread (0 бол унтраана)"""
+    interval = float(os.getenv("METRICS_REPORT_INTERVAL", "60")) if interval is None else interval
+    if interval <= 0:
+        return None
+
+    def report():
+        while True:
+            time.sleep(interval)
+            lines = summary()
+            if lines:
+                out = stream or sys.stderr
+                out.write("[metrics] " + "\n[metrics] ".join(lines) + "\n")
+                out.flush()
+
+    thread = threading.Thread(target=report, name="metrics-reporter", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,200 @@
+"""
+Schema index migration болон EXPLAIN-д суурилсан index advisor
+
+Ашиглах:
+    python migrations.py migrate              # дутуу index-үүдийг үүсгэх
+    python migrations.py status               # аль migration хийгдсэнийг харах
+    python migrations.py advise [start end]   # query template бүрийг EXPLAIN хийж seq scan илрүүлэх
+
+Index-үүдийг CREATE INDEX CONCURRENTLY-аар үүсгэдэг тул ажиллаж буй системд
+бичилтийг түгжихгүй. Хийгдсэн migration-ууд schema_migrations хүснэгтэд бичигдэнэ.
+"""
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from database import db
+from dotenv import load_dotenv
+load_dotenv()
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+# (id, тайлбар, index-ийн тодорхойлолтууд). Шинэ migration-ыг зөвхөн төгсгөлд нэмнэ.
+MIGRATIONS: List[Tuple[str, str, List[str]]] = [
+    ("0001_orders_indexes", "orders-ийн огноо болон FK index-үүд", [
+        "orders_order_date_idx ON orders (order_date)",
+        "orders_merchant_id_idx ON orders (merchant_id, order_date)",
+        "orders_sales_rep_id_idx ON orders (sales_rep_id, order_date)",
+    ]),
+    ("0002_order_items_indexes", "order_items-ийн FK index-үүд", [
+        "order_items_order_id_idx ON order_items (order_id)",
+        "order_items_sku_id_idx ON order_items (sku_id)",
+    ]),
+    # Covering (INCLUDE) index-үүд: aggregation-д хэрэгтэй баганууд index-д байгаа тул
+    # heap-ээс уншихгүй (index-only scan). PostgreSQL 11+ шаардана.
+    ("0003_covering_indexes", "Aggregation-д зориулсан covering index-үүд", [
+        "orders_order_date_covering_idx ON orders (order_date) INCLUDE (id, merchant_id, sales_rep_id)",
+        "order_items_order_id_covering_idx ON order_items (order_id) INCLUDE (sku_id, quantity, price)",
+        "order_items_sku_id_covering_idx ON order_items (sku_id) INCLUDE (order_id, quantity, price)",
+    ]),
+    ("0004_merchants_district", "District шүүлтүүрийн index", [
+        "merchants_district_idx ON merchants (district)",
+    ]),
+]
+
+# Энэ тооноос олон мөртэй хүснэгт дээрх Seq Scan-ийг анхааруулна
+ADVISOR_MIN_ROWS = int(os.getenv("ADVISOR_MIN_ROWS", "10000"))
+
+
+def _execute(sql: str, params: Optional[tuple] = None) -> List[tuple]:
+    """Autocommit холболт дээр ажиллуулах (CONCURRENTLY transaction дотор ажилладаггүй)"""
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall() if cur.description else []
+
+
+def ensure_migrations_table():
+    _execute(f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            id TEXT PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+def applied_migrations() -> Dict[str, Any]:
+    ensure_migrations_table()
+    return dict(_execute(f"SELECT id, applied_at FROM {MIGRATIONS_TABLE}"))
+
+
+def _drop_invalid_index(name: str):
+    # CONCURRENTLY тасалдвал INVALID index үлддэг, IF NOT EXISTS түүнийг алгасах тул устгана
+    rows = _execute("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND NOT i.indisvalid
+    """, (name,))
+    if rows:
+        print(f"⚠ {name} INVALID байсан тул дахин үүсгэнэ")
+        _execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def migrate() -> List[str]:
+    """Хийгдээгүй migration-уудыг дарааллаар нь хийх"""
+    done = applied_migrations()
+    applied = []
+    for migration_id, description, indexes in MIGRATIONS:
+        if migration_id in done:
+            continue
+        started = time.monotonic()
+        for definition in indexes:
+            name = definition.split(" ", 1)[0]
+            _drop_invalid_index(name)
+            _execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {definition}")
+        tables = sorted({definition.split(" ON ", 1)[1].split(" ", 1)[0] for definition in indexes})
+        _execute(f"ANALYZE {', '.join(tables)}")
+        _execute(f"INSERT INTO {MIGRATIONS_TABLE} (id) VALUES (%s) ON CONFLICT DO NOTHING", (migration_id,))
+        applied.append(migration_id)
+        print(f"✓ {migration_id}: {description} ({time.monotonic() - started:.1f}s)")
+    return applied
+
+
+# ---------- Index advisor ----------
+
+def query_templates(start_date: str, end_date: str) -> Dict[str, Tuple[str, Optional[tuple]]]:
+    """database.py-ийн raw query template-үүд (rollup-гүй), жишээ параметртэй"""
+    dates = {"start_date": start_date, "end_date": end_date}
+    templates = {
+        "sales_by_sku": db.build_sales_by_sku(use_rollups=False, **dates),
+        "sales_by_sku (sku_id)": db.build_sales_by_sku(sku_id=1, use_rollups=False, **dates),
+        "sales_by_merchant": db.build_sales_by_merchant(use_rollups=False, **dates),
+        "sales_by_merchant (merchant_id)": db.build_sales_by_merchant(merchant_id=1, use_rollups=False, **dates),
+        "sales_by_district": db.build_sales_by_district(use_rollups=False, **dates),
+        "sales_by_time_period": db.build_sales_by_time_period("daily", use_rollups=False, **dates),
+        "sales_rep_performance": db.build_sales_rep_performance(use_rollups=False, **dates),
+        "sales_rep_performance (sales_rep_id)": db.build_sales_rep_performance(sales_rep_id=1, use_rollups=False, **dates),
+        "category_summary": db.build_category_summary(**dates),
+        "merchant_patterns (merchant_id)": db.build_merchant_ordering_patterns(merchant_id=1, use_rollups=False),
+    }
+    for group_by in ("district", "category", "sales_rep"):
+        templates[f"top_skus_by_group ({group_by})"] = db.build_top_skus_by_group(group_by, 5, **dates)
+    return templates
+
+
+def _table_sizes() -> Dict[str, int]:
+    rows = _execute("""
+        SELECT c.relname, c.reltuples::bigint
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind = 'r' AND n.nspname = current_schema()
+    """)
+    return {name: max(int(tuples), 0) for name, tuples in rows}
+
+
+def _walk(plan: Dict[str, Any]):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _walk(child)
+
+
+def explain(query: str, params: Optional[tuple]) -> Dict[str, Any]:
+    """EXPLAIN (FORMAT JSON)-ийн root plan"""
+    rows = _execute("EXPLAIN (FORMAT JSON) " + query, params)
+    plan = rows[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def advise(start_date: Optional[str] = None, end_date: Optional[str] = None,
+           min_rows: int = ADVISOR_MIN_ROWS) -> Dict[str, Dict[str, Any]]:
+    """Template бүрийн plan-аас том хүснэгт дээрх Seq Scan-уудыг олох"""
+    end_date = end_date or date.today().isoformat()
+    start_date = start_date or (date.fromisoformat(end_date) - timedelta(days=30)).isoformat()
+    sizes = _table_sizes()
+    report = {}
+    for name, (query, params) in query_templates(start_date, end_date).items():
+        plan = explain(query, params)
+        seq_scans = [
+            {"table": node["Relation Name"], "rows": sizes.get(node["Relation Name"], 0),
+             "filter": node.get("Filter")}
+            for node in _walk(plan)
+            if node.get("Node Type") == "Seq Scan" and sizes.get(node.get("Relation Name"), 0) >= min_rows
+        ]
+        report[name] = {"cost": plan.get("Total Cost"), "seq_scans": seq_scans}
+    return report
+
+
+def main(argv: List[str]) -> int:
+    command = argv[1] if len(argv) > 1 else "status"
+    if command == "migrate":
+        applied = migrate()
+        print(f"{len(applied)} migration хийгдлээ" if applied else "Бүх migration хийгдсэн байна")
+    elif command == "status":
+        done = applied_migrations()
+        for migration_id, description, _ in MIGRATIONS:
+            applied_at = done.get(migration_id)
+            print(f"{'✓' if applied_at else '·'} {migration_id}: {description}"
+                  + (f" ({applied_at:%Y-%m-%d %H:%M})" if applied_at else ""))
+    elif command == "advise":
+        report = advise(*argv[2:4])
+        for name, result in report.items():
+            status = "✗" if result["seq_scans"] else "✓"
+            print(f"{status} {name}: cost={result['cost']}")
+            for scan in result["seq_scans"]:
+                print(f"    Seq Scan {scan['table']} (~{scan['rows']} мөр)"
+                      + (f" filter: {scan['filter']}" if scan["filter"] else ""))
+        flagged = sum(bool(r["seq_scans"]) for r in report.values())
+        if flagged:
+            print(f"\n{flagged} template том хүснэгтийг бүтнээр уншиж байна. "
+                  f"'python migrations.py migrate' хийсэн эсэхээ шалгана уу.")
+        return 1 if flagged else 0
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,151 @@
+"""
+Database aggregation-уудын үр дүнгийн cache (TTL + LRU, санах ойн хязгаартай)
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from dotenv import load_dotenv
+load_dotenv()
+
+# Method тус бүрийн TTL (секунд). Энд байхгүй method default TTL-ийг авна.
+DEFAULT_METHOD_TTLS = {
+    "get_sales_by_time_period": 60,
+    "get_merchant_ordering_patterns": 600,
+    "get_category_summary": 600,
+}
+
+
+def _estimate_size(value: Any) -> int:
+    """Үр дүнгийн ойролцоо санах ойн хэмжээ (byte)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        # columnar/arrays форматын үр дүнд утга нь жагсаалт байна
+        items = value.values()
+    elif isinstance(value, (list, tuple)):
+        items = value
+    else:
+        return size
+    for item in items:
+        size += _estimate_size(item) if isinstance(item, (dict, list, tuple)) else sys.getsizeof(item)
+    return size
+
+
+def _normalize(value: Any) -> Hashable:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+
+
+class ResultCache:
+    """Thread-safe LRU cache: method тус бүрийн TTL, нийт санах ойн хязгаар, hit/miss тоолуур"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, default_ttl: float = 300.0,
+                 method_ttls: Optional[Dict[str, float]] = None, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.method_ttls = dict(DEFAULT_METHOD_TTLS if method_ttls is None else method_ttls)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int, str]]" = OrderedDict()
+        self._bytes = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(method: str, params: Dict[str, Any]) -> Hashable:
+        """Method нэр + normalize хийсэн параметрүүдээс түлхүүр үүсгэх"""
+        return (method, _normalize(params))
+
+    def ttl_for(self, method: str) -> float:
+        return self.method_ttls.get(method, self.default_ttl)
+
+    def set_ttl(self, method: str, ttl: float):
+        """Method-ийн TTL-ийг өөрчлөх (0 бол cache хийхгүй)"""
+        with self._lock:
+            self.method_ttls[method] = ttl
+
+    def _counter(self, method: str) -> Dict[str, int]:
+        counter = self._stats.get(method)
+        if counter is None:
+            counter = self._stats[method] = {"hits": 0, "misses": 0, "evictions": 0}
+        return counter
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(hit эсэх, утга) буцаана"""
+        if not self.enabled:
+            return False, None
+        method = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, size, _ = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._counter(method)["hits"] += 1
+                    return True, value
+                self._remove(key)
+            self._counter(method)["misses"] += 1
+        return False, None
+
+    def set(self, key: Hashable, value: Any):
+        """Үр дүнг хадгалах (хязгаар хэтэрвэл хамгийн удаан хэрэглэгдээгүйг хасна)"""
+        if not self.enabled:
+            return
+        method = key[0]
+        ttl = self.ttl_for(method)
+        if ttl <= 0:
+            return
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size, method)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._counter(self._entries[oldest][3])["evictions"] += 1
+                self._remove(oldest)
+
+    def _remove(self, key: Hashable):
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, method: Optional[str] = None) -> int:
+        """Cache цэвэрлэх (method өгвөл зөвхөн тэр method-ийнх). Устгасан тоог буцаана."""
+        with self._lock:
+            keys = [k for k, entry in self._entries.items() if method is None or entry[3] == method]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss тоолуур болон санах ойн хэрэглээ"""
+        with self._lock:
+            hits = sum(c["hits"] for c in self._stats.values())
+            misses = sum(c["misses"] for c in self._stats.values())
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "methods": {m: dict(c) for m, c in self._stats.items()},
+            }
+
+
+# Global cache instance (Database, AsyncDatabase хоёулаа хуваалцана)
+result_cache = ResultCache(
+    max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", "64")) * 1024 * 1024),
+    default_ttl=float(os.getenv("RESULT_CACHE_TTL", "300")),
+    enabled=os.getenv("RESULT_CACHE_ENABLED", "1") != "0",
+)
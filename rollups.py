@@ -0,0 +1,441 @@
+"""
+Борлуулалтын өдрийн rollup хүснэгтүүд (incremental refresh, rebuild, verify)
+
+Ашиглах:
+    python rollups.py rebuild   # хүснэгтүүдийг эхнээс нь дахин тооцох
+    python rollups.py refresh   # watermark-аас хойшхи өдрүүдийг шинэчлэх
+    python rollups.py verify    # rollup-ийн үр дүнг raw хүснэгттэй харьцуулах
+
+ROLLUPS_ENABLED=1 үед Database-ийн get_sales_* method-ууд боломжтой бол эдгээр
+хүснэгтээс уншина. Watermark-аас хойш орсон захиалгуудыг (tail) raw хүснэгтээс
+нэмж тооцдог тул refresh хоорондын хугацаанд ч үр дүн зөв байна. Watermark-аас
+өмнөх огноотой хожим орсон захиалгыг зөвхөн rebuild барина.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from database import SalesQueries, db
+from dotenv import load_dotenv
+load_dotenv()
+
+# Rollup-ийн grain бүрийн тодорхойлолт: хүснэгт, түлхүүр багана, raw эх үүсвэр
+GRAINS = {
+    "sku": {
+        "table": "sales_daily_sku",
+        "columns": ["sku_id"],
+        "expressions": ["oi.sku_id"],
+        "source": "orders o JOIN order_items oi ON oi.order_id = o.id",
+        "condition": "",
+    },
+    # District нь merchant-ийн атрибут тул district-ийн query-нүүд энэ хүснэгтийг ашиглана
+    "merchant": {
+        "table": "sales_daily_merchant",
+        "columns": ["merchant_id"],
+        "expressions": ["o.merchant_id"],
+        "source": "orders o LEFT JOIN order_items oi ON oi.order_id = o.id",
+        "condition": "",
+    },
+    "sales_rep": {
+        "table": "sales_daily_sales_rep",
+        "columns": ["sales_rep_id", "merchant_id"],
+        "expressions": ["o.sales_rep_id", "o.merchant_id"],
+        "source": "orders o LEFT JOIN order_items oi ON oi.order_id = o.id",
+        "condition": " AND o.sales_rep_id IS NOT NULL",
+    },
+}
+
+STATE_TABLE = "sales_rollup_state"
+# Олон процесс зэрэг refresh хийхээс сэргийлэх advisory lock
+ADVISORY_LOCK_ID = 7300424
+
+_PLAIN_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _aggregate_select(grain: str) -> str:
+    spec = GRAINS[grain]
+    keys = ", ".join(spec["expressions"])
+    return f"""
+        SELECT
+            DATE(o.order_date) as day,
+            {keys},
+            SUM(oi.quantity * oi.price) as revenue,
+            SUM(oi.quantity) as quantity,
+            COUNT(DISTINCT o.id) as order_count
+        FROM {spec["source"]}
+        WHERE 1=1{spec["condition"]}"""
+
+
+def _group_by(grain: str) -> str:
+    return " GROUP BY DATE(o.order_date), " + ", ".join(GRAINS[grain]["expressions"])
+
+
+class RollupManager:
+    """Өдрийн rollup хүснэгтүүдийг удирдах, тэдгээрээс унших SQL бүтээх"""
+
+    def __init__(self, database=db):
+        self.db = database
+        self.ready = False
+        self.revenue_type = "numeric"
+        self.quantity_type = "bigint"
+        self.order_date_type = "timestamp without time zone"
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- Schema / refresh ----------
+
+    def ensure_schema(self):
+        """Rollup хүснэгтүүдийг үүсгэх (төрлүүд raw aggregation-тай ижил байна)"""
+        with self.db.transaction() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (ADVISORY_LOCK_ID,))
+                for grain, spec in GRAINS.items():
+                    cur.execute(
+                        f"CREATE TABLE IF NOT EXISTS {spec['table']} AS "
+                        f"{_aggregate_select(grain)}{_group_by(grain)} WITH NO DATA"
+                    )
+                    cur.execute(f"CREATE INDEX IF NOT EXISTS {spec['table']}_day_idx ON {spec['table']} (day)")
+                    key = spec["columns"][0]
+                    cur.execute(
+                        f"CREATE INDEX IF NOT EXISTS {spec['table']}_{key}_idx ON {spec['table']} ({key}, day)"
+                    )
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                        id INTEGER PRIMARY KEY,
+                        watermark TIMESTAMP,
+                        refreshed_at TIMESTAMP NOT NULL DEFAULT NOW()
+                    )
+                """)
+                cur.execute("""
+                    SELECT attname, format_type(atttypid, atttypmod)
+                    FROM pg_attribute
+                    WHERE attrelid = %s::regclass AND attname IN ('revenue', 'quantity')
+                """, (GRAINS["sku"]["table"],))
+                types = dict(cur.fetchall())
+                self.revenue_type = types.get("revenue", self.revenue_type)
+                self.quantity_type = types.get("quantity", self.quantity_type)
+                cur.execute("""
+                    SELECT data_type FROM information_schema.columns
+                    WHERE table_schema = current_schema() AND table_name = 'orders' AND column_name = 'order_date'
+                """)
+                row = cur.fetchone()
+                if row:
+                    self.order_date_type = row[0]
+
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Watermark-аас хойшхи өдрүүдийг дахин тооцох (full=True бол бүгдийг)"""
+        started = time.monotonic()
+        with self.db.transaction() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (ADVISORY_LOCK_ID,))
+                cur.execute(f"SELECT watermark FROM {STATE_TABLE} WHERE id = 1")
+                row = cur.fetchone()
+                old_watermark = row[0] if row else None
+                if old_watermark is None:
+                    full = True
+                cur.execute("SELECT MAX(order_date) FROM orders")
+                new_watermark = cur.fetchone()[0]
+                if new_watermark is None:
+                    # Захиалга байхгүй
+                    for spec in GRAINS.values():
+                        cur.execute(f"DELETE FROM {spec['table']}")
+                else:
+                    for grain, spec in GRAINS.items():
+                        columns = ", ".join(["day"] + spec["columns"] + ["revenue", "quantity", "order_count"])
+                        insert = f"INSERT INTO {spec['table']} ({columns}) {_aggregate_select(grain)}"
+                        if full:
+                            cur.execute(f"DELETE FROM {spec['table']}")
+                            cur.execute(
+                                insert + " AND (o.order_date <= %s OR o.order_date IS NULL)" + _group_by(grain),
+                                (new_watermark,)
+                            )
+                        else:
+                            # Watermark-ийн өдрийг бүхэлд нь дахин тооцно (тухайн өдрийн хожим орсон захиалгууд)
+                            cur.execute(f"DELETE FROM {spec['table']} WHERE day >= DATE(%s)", (old_watermark,))
+                            cur.execute(
+                                insert + " AND o.order_date >= DATE(%s) AND o.order_date <= %s" + _group_by(grain),
+                                (old_watermark, new_watermark)
+                            )
+                cur.execute(f"""
+                    INSERT INTO {STATE_TABLE} (id, watermark, refreshed_at) VALUES (1, %s, NOW())
+                    ON CONFLICT (id) DO UPDATE SET watermark = EXCLUDED.watermark, refreshed_at = EXCLUDED.refreshed_at
+                """, (new_watermark,))
+        return {
+            "mode": "rebuild" if full else "incremental",
+            "previous_watermark": old_watermark,
+            "watermark": new_watermark,
+            "seconds": round(time.monotonic() - started, 3),
+        }
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Rollup хүснэгтүүдийг эхнээс нь дахин тооцох"""
+        self.ensure_schema()
+        return self.refresh(full=True)
+
+    def enable(self, refresh_interval: Optional[float] = None, background: bool = True):
+        """Rollup-ийг бэлдэж, query-нүүдэд ашиглуулж эхлэх, тогтмол refresh хийх"""
+        if refresh_interval is None:
+            refresh_interval = float(os.getenv("ROLLUP_REFRESH_INTERVAL", "300"))
+
+        def run():
+            try:
+                self.ensure_schema()
+                result = self.refresh()
+                self.ready = True
+                SalesQueries.rollups = self
+                print(f"✓ Rollup бэлэн боллоо ({result['mode']}, {result['seconds']}s)", file=sys.stderr)
+            except Exception as e:
+                print(f"⚠ Rollup бэлдэж чадсангүй, raw хүснэгтээс уншина: {e}", file=sys.stderr)
+                return
+            while refresh_interval > 0:
+                time.sleep(refresh_interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠ Rollup refresh алдаа: {e}", file=sys.stderr)
+
+        if not background:
+            run()
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=run, name="rollup-refresh", daemon=True)
+            self._thread.start()
+
+    # ---------- Унших SQL ----------
+
+    def can_serve(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> bool:
+        """Өгөгдсөн огнооны шүүлтүүрийг rollup-аар яг ижил үр дүнтэй гүйцэтгэж чадах эсэх"""
+        if not self.ready:
+            return False
+        if start_date and not _PLAIN_DATE.match(start_date):
+            return False
+        if end_date:
+            # timestamp багана дээр "<= 'YYYY-MM-DD'" нь тухайн өдрийн 00:00 хүртэл л тул өдрийн rollup таарахгүй
+            return self.order_date_type == "date" and bool(_PLAIN_DATE.match(end_date))
+        return True
+
+    def _facts(self, grain: str, params: List[Any], start_date: Optional[str] = None,
+               end_date: Optional[str] = None, key: Optional[Tuple[str, Any]] = None) -> str:
+        """Rollup мөрүүд + watermark-аас хойшхи (tail) raw мөрүүд"""
+        spec = GRAINS[grain]
+        columns = ", ".join(["day"] + spec["columns"] + ["revenue", "quantity", "order_count"])
+        rollup = f"SELECT {columns} FROM {spec['table']} WHERE 1=1"
+        if key and key[1]:
+            rollup += f" AND {key[0]} = %s"
+            params.append(key[1])
+        if start_date:
+            rollup += " AND day >= %s"
+            params.append(start_date)
+        if end_date:
+            rollup += " AND day <= %s"
+            params.append(end_date)
+
+        # Watermark NULL (захиалгагүй үед refresh хийсэн, эсвэл state мөр алга) бол rollup хоосон тул бүх захиалга tail-д орно
+        watermark = f"(SELECT watermark FROM {STATE_TABLE} WHERE id = 1)"
+        tail = _aggregate_select(grain) + f" AND (o.order_date > {watermark} OR {watermark} IS NULL)"
+        if key and key[1]:
+            tail += f" AND {spec['expressions'][spec['columns'].index(key[0])]} = %s"
+            params.append(key[1])
+        if start_date:
+            tail += " AND o.order_date >= %s"
+            params.append(start_date)
+        if end_date:
+            tail += " AND o.order_date <= %s"
+            params.append(end_date)
+        tail += _group_by(grain)
+        return f"{rollup} UNION ALL {tail}"
+
+    def _totals(self) -> str:
+        return f"""
+                COALESCE(SUM(f.revenue), 0)::{self.revenue_type} as total_sales,
+                COALESCE(SUM(f.quantity), 0)::{self.quantity_type} as total_quantity,
+                COALESCE(SUM(f.order_count), 0)::bigint as order_count"""
+
+    @staticmethod
+    def _join(start_date: Optional[str], end_date: Optional[str]) -> str:
+        # Raw query-д огнооны шүүлтүүр LEFT JOIN-ийг INNER JOIN болгодог
+        return "JOIN" if start_date or end_date else "LEFT JOIN"
+
+    def build_sales_by_sku(self, sku_id: Optional[int] = None, start_date: Optional[str] = None,
+                           end_date: Optional[str] = None) -> Tuple[str, Optional[tuple]]:
+        params: List[Any] = []
+        facts = self._facts("sku", params, start_date, end_date, key=("sku_id", sku_id))
+        query = f"""
+            SELECT
+                sku.id as sku_id,
+                sku.name as sku_name,
+                sku.category,{self._totals()}
+            FROM sku
+            {self._join(start_date, end_date)} ({facts}) f ON f.sku_id = sku.id
+            WHERE 1=1
+        """
+        if sku_id:
+            query += " AND sku.id = %s"
+            params.append(sku_id)
+        query += " GROUP BY sku.id, sku.name, sku.category ORDER BY total_sales DESC"
+        return query, tuple(params) if params else None
+
+    def build_sales_by_merchant(self, merchant_id: Optional[int] = None, start_date: Optional[str] = None,
+                                end_date: Optional[str] = None) -> Tuple[str, Optional[tuple]]:
+        params: List[Any] = []
+        facts = self._facts("merchant", params, start_date, end_date, key=("merchant_id", merchant_id))
+        query = f"""
+            SELECT
+                m.id as merchant_id,
+                m.name as merchant_name,
+                m.district,{self._totals()}
+            FROM merchants m
+            {self._join(start_date, end_date)} ({facts}) f ON f.merchant_id = m.id
+            WHERE 1=1
+        """
+        if merchant_id:
+            query += " AND m.id = %s"
+            params.append(merchant_id)
+        query += " GROUP BY m.id, m.name, m.district ORDER BY total_sales DESC"
+        return query, tuple(params) if params else None
+
+    def build_sales_by_district(self, district: Optional[str] = None, start_date: Optional[str] = None,
+                                end_date: Optional[str] = None) -> Tuple[str, Optional[tuple]]:
+        params: List[Any] = []
+        facts = self._facts("merchant", params, start_date, end_date)
+        query = f"""
+            SELECT
+                m.district,{self._totals()},
+                COUNT(DISTINCT m.id) as merchant_count
+            FROM merchants m
+            {self._join(start_date, end_date)} ({facts}) f ON f.merchant_id = m.id
+            WHERE 1=1
+        """
+        if district:
+            query += " AND m.district = %s"
+            params.append(district)
+        query += " GROUP BY m.district ORDER BY total_sales DESC"
+        return query, tuple(params) if params else None
+
+    def build_sales_by_time_period(self, period: str = "daily", start_date: Optional[str] = None,
+                                   end_date: Optional[str] = None) -> Tuple[str, Optional[tuple]]:
+        if period == "weekly":
+            date_format = f"DATE_TRUNC('week', f.day::{self.order_date_type})"
+        elif period == "monthly":
+            date_format = f"DATE_TRUNC('month', f.day::{self.order_date_type})"
+        else:
+            date_format = "f.day"
+        params: List[Any] = []
+        facts = self._facts("merchant", params, start_date, end_date)
+        query = f"""
+            SELECT
+                {date_format} as period,{self._totals()}
+            FROM ({facts}) f
+            GROUP BY {date_format} ORDER BY period DESC
+        """
+        return query, tuple(params) if params else None
+
+    def build_sales_rep_performance(self, sales_rep_id: Optional[int] = None, start_date: Optional[str] = None,
+                                    end_date: Optional[str] = None) -> Tuple[str, Optional[tuple]]:
+        params: List[Any] = []
+        facts = self._facts("sales_rep", params, start_date, end_date, key=("sales_rep_id", sales_rep_id))
+        query = f"""
+            SELECT
+                sr.id as sales_rep_id,
+                sr.name as sales_rep_name,{self._totals()},
+                COUNT(DISTINCT f.merchant_id) as merchant_count
+            FROM sales_reps sr
+            {self._join(start_date, end_date)} ({facts}) f ON f.sales_rep_id = sr.id
+            WHERE 1=1
+        """
+        if sales_rep_id:
+            query += " AND sr.id = %s"
+            params.append(sales_rep_id)
+        query += " GROUP BY sr.id, sr.name ORDER BY total_sales DESC"
+        return query, tuple(params) if params else None
+
+    def build_merchant_ordering_patterns(self, merchant_id: Optional[int] = None) -> Tuple[str, Optional[tuple]]:
+        month = f"DATE_TRUNC('month', f.day::{self.order_date_type})"
+        params: List[Any] = []
+        facts = self._facts("merchant", params, key=("merchant_id", merchant_id))
+        query = f"""
+            SELECT
+                m.id as merchant_id,
+                m.name as merchant_name,
+                {month} as month,
+                COALESCE(SUM(f.order_count), 0)::bigint as orders_per_month,
+                COALESCE(SUM(f.revenue), 0)::{self.revenue_type} as monthly_sales
+            FROM merchants m
+            LEFT JOIN ({facts}) f ON f.merchant_id = m.id
+            WHERE 1=1
+        """
+        if merchant_id:
+            query += " AND m.id = %s"
+            params.append(merchant_id)
+        query += f" GROUP BY m.id, m.name, {month} ORDER BY m.id, month DESC"
+        return query, tuple(params) if params else None
+
+    # ---------- Шалгалт ----------
+
+    def verify(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
+        """Rollup-аас уншсан үр дүнг raw хүснэгтээс тооцсонтой харьцуулах"""
+        dated = {"start_date": start_date, "end_date": end_date}
+        checks = {
+            "get_sales_by_sku": ("build_sales_by_sku", dated),
+            "get_sales_by_merchant": ("build_sales_by_merchant", dated),
+            "get_sales_by_district": ("build_sales_by_district", dated),
+            "get_sales_by_time_period": ("build_sales_by_time_period", {"period": "daily", **dated}),
+            "get_sales_rep_performance": ("build_sales_rep_performance", dated),
+            "get_merchant_ordering_patterns": ("build_merchant_ordering_patterns", {}),
+        }
+        report = {}
+        for method, (builder, params) in checks.items():
+            raw = self.db.execute_query(*getattr(self.db, builder)(use_rollups=False, **params))
+            rolled = self.db.execute_query(*getattr(self, builder)(**params))
+            raw_rows = sorted(repr(sorted(dict(r).items())) for r in raw)
+            rolled_rows = sorted(repr(sorted(dict(r).items())) for r in rolled)
+            missing = sorted(set(raw_rows) - set(rolled_rows))
+            extra = sorted(set(rolled_rows) - set(raw_rows))
+            report[method] = {
+                "ok": raw_rows == rolled_rows,
+                "raw_rows": len(raw_rows),
+                "rollup_rows": len(rolled_rows),
+                "missing": missing[:5],
+                "unexpected": extra[:5],
+            }
+        return report
+
+
+# Global rollup manager
+rollups = RollupManager(db)
+
+
+def enable_from_env():
+    """ROLLUPS_ENABLED=1 бол rollup-ийг background-д бэлдэж идэвхжүүлэх"""
+    if os.getenv("ROLLUPS_ENABLED", "0") == "1":
+        rollups.enable()
+
+
+def main(argv: List[str]) -> int:
+    command = argv[1] if len(argv) > 1 else "refresh"
+    if command == "rebuild":
+        print(rollups.rebuild())
+    elif command == "refresh":
+        rollups.ensure_schema()
+        print(rollups.refresh())
+    elif command == "verify":
+        rollups.ensure_schema()
+        rollups.ready = True
+        report = rollups.verify(*argv[2:4])
+        for method, result in report.items():
+            status = "✓" if result["ok"] else "✗"
+            print(f"{status} {method}: raw={result['raw_rows']} rollup={result['rollup_rows']}")
+            for row in result["missing"]:
+                print(f"    - {row}")
+            for row in result["unexpected"]:
+                print(f"    + {row}")
+        return 0 if all(r["ok"] for r in report.values()) else 1
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,29 +1,32 @@
 """
 Retail Beverage AI Assistant - Main entry point
 """
+import threading
 import uvicorn
 from api import app
 
-if __name__ == "__main__":
-    print("🚀 Retail Beverage AI Assistant эхэлж байна...")
-    print("📊 Database холболтыг шалгаж байна...")
+def warm_up_database():
+    """Database pool-ийг background-д бэлдэх (холбогдохгүй бол connect_timeout хүртэл хүлээнэ)"""
     try:
         from database import db
         db._ensure_connection()
-        if db._connected:
-            print("✓ Database холбогдлоо")
-        else:
+        if not db._connected:
             print("⚠ Database холбогдож чадсангүй. Query хийхэд алдаа гарч магадгүй.")
     except Exception as e:
         print(f"⚠ Database холболт: {e}")
+
+if __name__ == "__main__":
+    print("🚀 Retail Beverage AI Assistant эхэлж байна...")
+    print("📊 Database холболтыг background-д шалгаж байна...")
+    # Server холболтыг хүлээлгүй шууд эхэлнэ (pool thread-safe тул эрт ирсэн query өөрөө холбогдоно)
+    threading.Thread(target=warm_up_database, name="db-warm-up", daemon=True).start()
     print("🌐 Web UI: http://localhost:8000/chat")
     print("📡 API: http://localhost:8000")
     print("\nЗогсоохын тулд Ctrl+C дараарай\n")
-    
+
     uvicorn.run(
         app,
         host="0.0.0.0",
         port=8000,
         log_level="info"
     )
-
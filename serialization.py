@@ -0,0 +1,71 @@
+"""
+API болон MCP хариултуудын нийтлэг JSON serialization
+
+orjson суусан бол түүгээр (RealDictRow, datetime/date, tuple-ийг шууд, Decimal-ийг
+float болгож), байхгүй бол стандарт json-оор ижил үр дүн гаргана. Анхдагчаар
+compact; pretty=True (эсвэл JSON_PRETTY=1) бол 2 зайтай мөр болгон догол мөрлөнө.
+
+Ашиглах:
+    from serialization import dumps, dumps_str
+    body = dumps({"data": rows})          # bytes (HTTP body)
+    text = dumps_str(result, pretty=True)  # str (MCP text content)
+"""
+import json
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Optional
+from dotenv import load_dotenv
+load_dotenv()
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pretty өгөөгүй үеийн анхдагч утга
+PRETTY = os.getenv("JSON_PRETTY", "0") == "1"
+
+ENGINE = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    _PRETTY_OPTIONS = _OPTIONS | orjson.OPT_INDENT_2
+
+
+def _default(value: Any) -> Any:
+    """Encoder шууд мэдэхгүй төрлүүд (Decimal -> float, бусад нь str)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    # numpy scalar (orjson-гүй үед)
+    if hasattr(value, "item") and callable(value.item):
+        return value.item()
+    return str(value)
+
+
+def dumps(obj: Any, pretty: Optional[bool] = None) -> bytes:
+    """obj-ийг UTF-8 JSON bytes болгох"""
+    pretty = PRETTY if pretty is None else pretty
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_PRETTY_OPTIONS if pretty else _OPTIONS)
+    if pretty:
+        text = json.dumps(obj, default=_default, ensure_ascii=False, indent=2)
+    else:
+        text = json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":"))
+    return text.encode("utf-8")
+
+
+def dumps_str(obj: Any, pretty: Optional[bool] = None) -> str:
+    """dumps-тай ижил, str буцаана (MCP text content, SSE data)"""
+    return dumps(obj, pretty).decode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """bytes/str JSON-ийг задлах"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
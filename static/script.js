@@ -4,7 +4,7 @@ const sendButton = document.getElementById("sendButton");
 const quickButtons = document.querySelectorAll(".quick-btn");
 
 // API endpoint
-const API_URL = "/api/query";
+const STREAM_URL = "/api/query/stream";
 
 // Хэрэглэгчийн мессеж нэмэх
 function addUserMessage(text) {
@@ -33,6 +33,52 @@ function addBotMessage(text, isError = false) {
   scrollToBottom();
 }
 
+// Хэсэг хэсгээр бичигдэх bot мессеж үүсгэх (текст span-ийг буцаана)
+function addStreamingBotMessage() {
+  const messageDiv = document.createElement("div");
+  messageDiv.className = "message bot-message";
+  messageDiv.innerHTML = `
+        <div class="message-content">
+            <strong>AI Туслах:</strong> <span class="answer-text"></span>
+        </div>
+    `;
+  chatMessages.appendChild(messageDiv);
+  scrollToBottom();
+  return messageDiv.querySelector(".answer-text");
+}
+
+// SSE stream-ийг уншиж event бүрийг onEvent-д дамжуулах
+async function readEventStream(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) {
+      break;
+    }
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = "message";
+      let data = "";
+      block.split("\n").forEach((line) => {
+        if (line.startsWith("event:")) {
+          event = line.slice(6).trim();
+        } else if (line.startsWith("data:")) {
+          data += line.slice(5).trim();
+        }
+      });
+      onEvent(event, data ? JSON.parse(data) : {});
+    }
+  }
+}
+
 // Loading indicator нэмэх
 function addLoadingMessage() {
   const messageDiv = document.createElement("div");
@@ -40,13 +86,21 @@ function addLoadingMessage() {
   messageDiv.id = "loadingMessage";
   messageDiv.innerHTML = `
         <div class="message-content">
-            <strong>AI Туслах:</strong> <span class="loading"></span> Бодож байна...
+            <strong>AI Туслах:</strong> <span class="loading"></span> <span class="loading-status">Бодож байна...</span>
         </div>
     `;
   chatMessages.appendChild(messageDiv);
   scrollToBottom();
 }
 
+// Loading message-ийн төлөв шинэчлэх
+function setLoadingStatus(text) {
+  const status = document.querySelector("#loadingMessage .loading-status");
+  if (status) {
+    status.textContent = text;
+  }
+}
+
 // Loading message устгах
 function removeLoadingMessage() {
   const loadingMsg = document.getElementById("loadingMessage");
@@ -84,7 +138,7 @@ async function sendMessage() {
   addLoadingMessage();
 
   try {
-    const response = await fetch(API_URL, {
+    const response = await fetch(STREAM_URL, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -92,14 +146,38 @@ async function sendMessage() {
       body: JSON.stringify({ question: question }),
     });
 
-    const data = await response.json();
+    if (!response.ok || !response.body) {
+      throw new Error(`HTTP ${response.status}`);
+    }
+
+    let answerText = null;
+    let failed = false;
+
+    await readEventStream(response, (event, data) => {
+      if (event === "parse") {
+        setLoadingStatus("Мэдээлэл татаж байна...");
+      } else if (event === "query") {
+        setLoadingStatus("Хариу бичиж байна...");
+      } else if (event === "token") {
+        // Эхний token ирэхэд loading-ийг солино
+        if (answerText === null) {
+          removeLoadingMessage();
+          answerText = addStreamingBotMessage();
+        }
+        answerText.textContent += data.text;
+        scrollToBottom();
+      } else if (event === "error") {
+        failed = true;
+        console.error("Stream error:", data.message);
+      }
+    });
 
     removeLoadingMessage();
 
-    if (data.status === "success") {
-      addBotMessage(data.answer);
-    } else {
+    if (failed) {
       addBotMessage("Уучлаарай, алдаа гарлаа. Дахин оролдоно уу.", true);
+    } else if (answerText === null) {
+      addBotMessage("Мэдээлэл олдсонгүй.");
     }
   } catch (error) {
     removeLoadingMessage();
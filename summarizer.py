@@ -0,0 +1,186 @@
+"""
+LLM-д илгээхээс өмнө query-ийн үр дүнг товчлох
+
+Бүх мөрийг indent-тэй JSON-оор биш, "багана|багана" хэлбэрийн нягт хүснэгтээр
+илгээнэ. Token budget-д багтахгүй бол нийт дүн, top/bottom N (эзлэх хувьтай),
+хугацааны өөрчлөлт (period-over-period) зэрэг хураангуй болгоно.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+load_dotenv()
+
+# Гол үзүүлэлт болон хугацааны баганыг нэрээр нь таних (эхэнд байгаа нь давуу)
+METRIC_COLUMNS = ["total_sales", "monthly_sales", "total_quantity", "order_count", "orders_per_month"]
+PERIOD_COLUMNS = ["period", "month", "day", "order_date"]
+# Тоо боловч үзүүлэлт биш баганууд
+ID_SUFFIXES = ("_id", "_rank")
+
+
+def estimate_tokens(text: str) -> int:
+    """Token-ий ойролцоо тоо (Gemini-д дунджаар ~4 тэмдэгт = 1 token)"""
+    return (len(text) + 3) // 4
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        return float(value)
+    return None
+
+
+def _cell(value: Any) -> str:
+    """Нэг нүдийг богино текст болгох"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (float, Decimal)):
+        number = float(value)
+        return str(int(number)) if number.is_integer() else f"{number:.2f}"
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _json_tokens(table_text: str, columns: List[str], row_count: int) -> int:
+    """Мөрүүдийг indent=2 JSON болгосон үеийн token-ийг хүснэгтийн уртаас тооцох (дахин serialize хийхгүй)"""
+    # Мөр бүрт: '  {', '  },' болон багана бүрт '    "key": ,' (string утгын хашилтыг оруулаад)
+    per_row = 9 + sum(len(col) + 10 for col in columns)
+    header = len("|".join(columns))
+    return (len(table_text) - header + row_count * per_row + 4 + 3) // 4
+
+
+def _pct(part: float, whole: float) -> str:
+    return f"{part / whole * 100:.1f}%" if whole else "-"
+
+
+class ResultSummarizer:
+    """Үр дүнг token budget-д багтаан нягт текст болгох"""
+
+    def __init__(self, token_budget: int = 1500, top_n: int = 10, max_periods: int = 24):
+        self.token_budget = token_budget
+        self.top_n = top_n
+        self.max_periods = max_periods
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "summarized": 0, "tokens_before": 0, "tokens_after": 0}
+
+    @staticmethod
+    def table(rows: List[Dict[str, Any]], columns: List[str]) -> str:
+        """Мөрүүдийг толгой мөртэй "a|b|c" хүснэгт болгох"""
+        lines = ["|".join(columns)]
+        lines.extend("|".join(_cell(row.get(col)) for col in columns) for row in rows)
+        return "\n".join(lines)
+
+    @staticmethod
+    def _pick(columns: List[str], preferred: List[str]) -> Optional[str]:
+        for name in preferred:
+            if name in columns:
+                return name
+        return None
+
+    def _metric_columns(self, rows: List[Dict[str, Any]], columns: List[str]) -> List[str]:
+        sample = rows[0]
+        return [col for col in columns
+                if _number(sample.get(col)) is not None and not col.endswith(ID_SUFFIXES) and col != "id"]
+
+    def _period_deltas(self, rows: List[Dict[str, Any]], period_col: str, metric: str, limit: int) -> List[str]:
+        """Хугацаа тус бүрийн нийт дүн ба өмнөхөөсөө өөрчлөлт (сүүлийн limit хугацаа)"""
+        totals: "OrderedDict[str, float]" = OrderedDict()
+        for row in sorted(rows, key=lambda r: _cell(r.get(period_col))):
+            key = _cell(row.get(period_col))
+            totals[key] = totals.get(key, 0.0) + (_number(row.get(metric)) or 0.0)
+        items = list(totals.items())
+        lines = [f"{period_col}|{metric}|change"]
+        previous = None
+        for i, (period, value) in enumerate(items):
+            change = "-" if previous in (None, 0) else f"{(value - previous) / previous * 100:+.1f}%"
+            previous = value
+            if i >= len(items) - limit:
+                lines.append(f"{period}|{_cell(value)}|{change}")
+        if len(items) > limit:
+            lines.insert(1, f"... өмнөх {len(items) - limit} хугацааг орхив")
+        return lines
+
+    def _summary(self, rows: List[Dict[str, Any]], columns: List[str], top_n: int, periods: int) -> str:
+        metrics = self._metric_columns(rows, columns)
+        metric = self._pick(metrics, METRIC_COLUMNS) or (metrics[0] if metrics else None)
+        period_col = self._pick(columns, PERIOD_COLUMNS)
+        parts = [f"Нийт мөр: {len(rows)} (хураангуйлсан)"]
+        if metrics:
+            totals = {col: sum(_number(row.get(col)) or 0.0 for row in rows) for col in metrics}
+            parts.append("Нийт: " + ", ".join(f"{col}={_cell(value)}" for col, value in totals.items()))
+        if metric is None:
+            parts.append(f"Эхний {top_n} мөр:\n" + self.table(rows[:top_n], columns))
+            return "\n".join(parts)
+
+        total = sum(_number(row.get(metric)) or 0.0 for row in rows)
+        ranked = sorted(rows, key=lambda r: _number(r.get(metric)) or 0.0, reverse=True)
+        share_cols = columns + [f"{metric}_share"]
+
+        def with_share(subset):
+            return [{**row, f"{metric}_share": _pct(_number(row.get(metric)) or 0.0, total)} for row in subset]
+
+        parts.append(f"Top {min(top_n, len(ranked))} ({metric}-ээр):\n" + self.table(with_share(ranked[:top_n]), share_cols))
+        if len(ranked) > top_n:
+            bottom = ranked[-min(top_n, len(ranked) - top_n):]
+            parts.append(f"Bottom {len(bottom)}:\n" + self.table(with_share(bottom), share_cols))
+            top_share = sum(_number(row.get(metric)) or 0.0 for row in ranked[:top_n])
+            parts.append(f"Top {top_n}-ийн эзлэх хувь: {_pct(top_share, total)}")
+        if period_col:
+            parts.append("Хугацааны өөрчлөлт:\n" + "\n".join(self._period_deltas(rows, period_col, metric, periods)))
+        return "\n".join(parts)
+
+    def summarize(self, data: Any, token_budget: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+        """Prompt-д оруулах текст болон хэмжээний мэдээлэл (before/after token) буцаах"""
+        budget = self.token_budget if token_budget is None else token_budget
+        info = {"rows": len(data) if isinstance(data, list) else None, "mode": "json"}
+
+        if isinstance(data, list) and data and all(isinstance(row, dict) for row in data):
+            columns = list(data[0].keys())
+            text = self.table(data, columns)
+            # tokens_before: хуучин indent=2 JSON prompt-ын ойролцоо хэмжээ
+            info["tokens_before"] = _json_tokens(text, columns, len(data))
+            info["mode"] = "table"
+            top_n, periods = self.top_n, self.max_periods
+            # Budget-д багтах хүртэл N-ийг багасгана
+            while estimate_tokens(text) > budget:
+                text = self._summary(data, columns, top_n, periods)
+                info["mode"] = "summary"
+                if estimate_tokens(text) <= budget or (top_n <= 1 and periods <= 1):
+                    break
+                top_n, periods = max(top_n // 2, 1), max(periods // 2, 1)
+        else:
+            text = json.dumps(data, separators=(",", ":"), default=str, ensure_ascii=False)
+            info["tokens_before"] = estimate_tokens(text)
+
+        info["tokens_after"] = estimate_tokens(text)
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["summarized"] += info["mode"] == "summary"
+            self._stats["tokens_before"] += info["tokens_before"]
+            self._stats["tokens_after"] += info["tokens_after"]
+        return text, info
+
+    def stats(self) -> Dict[str, Any]:
+        """Prompt-ын хэмжээ хэр багассан тухай статистик"""
+        with self._lock:
+            before = self._stats["tokens_before"]
+            return {
+                **self._stats,
+                "token_budget": self.token_budget,
+                "reduction": round(1 - self._stats["tokens_after"] / before, 4) if before else 0.0,
+            }
+
+
+# Global summarizer instance
+summarizer = ResultSummarizer(
+    token_budget=int(os.getenv("LLM_DATA_TOKEN_BUDGET", "1500")),
+    top_n=int(os.getenv("LLM_SUMMARY_TOP_N", "10")),
+)
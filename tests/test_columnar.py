@@ -0,0 +1,47 @@
+"""
+Columnar engine-ийн үр дүнг SQL-тэй харьцуулах (database шаардана)
+
+Ашиглах:
+    python -m pytest tests/test_columnar.py
+    python -m unittest tests.test_columnar
+
+DATABASE_* орчны хувьсагч (эсвэл .env) тохируулаагүй, numpy суугаагүй бол алгасна.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+DATABASE_CONFIGURED = all(os.getenv(name) for name in ("DATABASE_HOST", "DATABASE_USER", "DATABASE_NAME"))
+
+
+@unittest.skipUnless(DATABASE_CONFIGURED, "DATABASE_* тохируулаагүй")
+class ColumnarVerifyTest(unittest.TestCase):
+
+    def setUp(self):
+        import columnar
+        if not columnar._import_numpy():
+            self.skipTest("numpy суугаагүй")
+        self.engine = columnar.ColumnarEngine(columnar.db)
+
+    def assertParity(self, report):
+        failed = {name: result for name, result in report.items() if not result["ok"]}
+        self.assertFalse(failed, failed)
+
+    def test_verify_full_load(self):
+        self.engine.load()
+        self.assertParity(self.engine.verify())
+
+    def test_verify_after_refresh(self):
+        # Эхний хагасыг ачаалж, үлдсэн захиалгуудыг refresh() шинэ мөр болгон нэмнэ
+        report = self.engine.verify_after_refresh()
+        self.assertEqual(self.engine.last_refresh["mode"], "incremental")
+        self.assertParity(report)
+
+
+if __name__ == "__main__":
+    unittest.main()
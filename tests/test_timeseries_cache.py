@@ -0,0 +1,175 @@
+"""
+timeseries_cache-ийн plan/merge (database шаардахгүй)
+
+Ашиглах:
+    python -m pytest tests/test_timeseries_cache.py
+"""
+import os
+import sys
+import unittest
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timeseries_cache import TimeSeriesCache
+
+NOW = datetime(2024, 3, 10, 12, 0)
+
+
+def day_rows(*days):
+    """Өдөр бүрийн нэг мөр (DATE(o.order_date)-тэй адил date утга)"""
+    return [{"period": date(2024, 3, day), "total_sales": day * 10} for day in days]
+
+
+class PlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TimeSeriesCache(grace=0)
+
+    def test_disabled_or_unparseable_dates_bypass(self):
+        self.assertIsNone(TimeSeriesCache(enabled=False).plan("daily", "2024-03-01", now=NOW))
+        self.assertIsNone(self.cache.plan("daily", "2024-03-01+08", now=NOW))
+        self.assertIsNone(self.cache.plan("daily", "yesterday", now=NOW))
+
+    def test_range_without_closed_bucket_bypasses(self):
+        # Өнөөдрийн bucket нээлттэй, дотор нь хаагдсан bucket байхгүй
+        self.assertIsNone(self.cache.plan("daily", "2024-03-10", now=NOW))
+        self.assertIsNone(self.cache.plan("daily", "2024-03-01 06:00", "2024-03-01 18:00", now=NOW))
+        self.assertEqual(self.cache.stats()["bypassed"], 2)
+
+    def test_first_plan_is_single_query_with_partial_edges(self):
+        plan = self.cache.plan("daily", "2024-03-01 06:00", "2024-03-05", now=NOW)
+        self.assertEqual(plan["cached"], [])
+        self.assertEqual(len(plan["queries"]), 1)
+        query = plan["queries"][0]
+        # Захын дутуу bucket-ууд (03-01 06:00-оос, 03-05) хадгалагдахгүй
+        self.assertEqual(query["params"], {"start_date": "2024-03-01 06:00", "end_date": "2024-03-05"})
+        self.assertEqual(query["store"], [(datetime(2024, 3, 2), datetime(2024, 3, 5))])
+
+    def test_cached_buckets_leave_only_edge_queries(self):
+        plan = self.cache.plan("daily", "2024-03-01 06:00", "2024-03-05", now=NOW)
+        self.cache.merge(plan, [day_rows(1, 2, 3, 4, 5)])
+        plan = self.cache.plan("daily", "2024-03-01 06:00", "2024-03-05", now=NOW)
+        self.assertEqual([row["period"] for row in plan["cached"]], [date(2024, 3, d) for d in (2, 3, 4)])
+        self.assertEqual([query["params"] for query in plan["queries"]], [
+            {"start_date": "2024-03-01 06:00", "before": "2024-03-02"},
+            {"start_date": "2024-03-05", "end_date": "2024-03-05"},
+        ])
+        self.assertEqual([query["store"] for query in plan["queries"]], [[], []])
+
+    def test_plain_end_date_only_covers_midnight(self):
+        # o.order_date <= '2024-03-02' нь 03-02-ны зөвхөн 00:00 тул тэр өдөр хадгалагдахгүй
+        self.assertIsNone(self.cache.plan("daily", "2024-03-02", "2024-03-02", now=NOW))
+
+    def test_end_date_timestamp_keeps_its_bucket_open(self):
+        # end_date нь inclusive: 03-05 12:00 хүртэлх 03-05 bucket дутуу
+        plan = self.cache.plan("daily", "2024-03-02", "2024-03-05 12:00", now=NOW)
+        query = plan["queries"][0]
+        self.assertEqual(query["params"], {"start_date": "2024-03-02", "end_date": "2024-03-05 12:00"})
+        self.assertEqual(query["store"], [(datetime(2024, 3, 2), datetime(2024, 3, 5))])
+
+    def test_gap_between_covered_ranges(self):
+        plan = self.cache.plan("daily", "2024-03-02", "2024-03-03", now=NOW)
+        self.cache.merge(plan, [day_rows(2, 3)])
+        plan = self.cache.plan("daily", "2024-03-05", "2024-03-06", now=NOW)
+        self.cache.merge(plan, [day_rows(5, 6)])
+        plan = self.cache.plan("daily", "2024-03-01", "2024-03-07", now=NOW)
+        self.assertEqual([query["params"] for query in plan["queries"]], [
+            {"start_date": "2024-03-01", "before": "2024-03-02"},
+            {"start_date": "2024-03-03", "before": "2024-03-05"},
+            {"start_date": "2024-03-06", "end_date": "2024-03-07"},
+        ])
+        self.assertEqual(self.cache.stats()["coverage"]["daily"], [["2024-03-02", "2024-03-03"], ["2024-03-05", "2024-03-06"]])
+
+    def test_open_ended_range_without_start(self):
+        plan = self.cache.plan("monthly", now=NOW)
+        query = plan["queries"][0]
+        # start_date-гүй тул доод хязгааргүй, нээлттэй 3-р сар хүртэл хадгална
+        self.assertEqual(query["params"], {})
+        self.assertEqual(query["store"], [(datetime.min, datetime(2024, 3, 1))])
+
+    def test_monthly_partial_first_month(self):
+        plan = self.cache.plan("monthly", "2024-01-15", now=NOW)
+        query = plan["queries"][0]
+        self.assertEqual(query["params"], {"start_date": "2024-01-15"})
+        self.assertEqual(query["store"], [(datetime(2024, 2, 1), datetime(2024, 3, 1))])
+
+    def test_weekly_buckets_start_on_monday(self):
+        # 2024-03-10 нь ням гараг: 03-04-ний долоо хоног нээлттэй
+        plan = self.cache.plan("weekly", "2024-02-21", now=NOW)
+        self.assertEqual(plan["queries"][0]["store"], [(datetime(2024, 2, 26), datetime(2024, 3, 4))])
+
+    def test_grace_keeps_recent_bucket_open(self):
+        cache = TimeSeriesCache(grace=3600)
+        plan = cache.plan("daily", "2024-03-07", now=datetime(2024, 3, 10, 0, 30))
+        # 03-09 дууссанаас хойш 1 цаг өнгөрөөгүй
+        self.assertEqual(plan["queries"][0]["store"], [(datetime(2024, 3, 7), datetime(2024, 3, 9))])
+        plan = cache.plan("daily", "2024-03-07", now=datetime(2024, 3, 10, 1, 30))
+        self.assertEqual(plan["queries"][0]["store"], [(datetime(2024, 3, 7), datetime(2024, 3, 10))])
+
+    def test_unknown_period_falls_back_to_daily(self):
+        plan = self.cache.plan("hourly", "2024-03-08", now=NOW)
+        self.assertEqual(plan["period"], "daily")
+
+
+class MergeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TimeSeriesCache(grace=0)
+
+    def test_merge_stores_only_closed_buckets_and_sorts_desc(self):
+        plan = self.cache.plan("daily", "2024-03-01 06:00", "2024-03-05", now=NOW)
+        rows = self.cache.merge(plan, [day_rows(1, 3, 5, 2)])
+        self.assertEqual([row["period"].day for row in rows], [5, 3, 2, 1])
+        self.assertEqual(self.cache.stats()["buckets"]["daily"], 2)
+
+    def test_merge_combines_cached_and_queried_rows(self):
+        plan = self.cache.plan("daily", "2024-03-01 06:00", "2024-03-05", now=NOW)
+        self.cache.merge(plan, [day_rows(1, 2, 3, 4, 5)])
+        plan = self.cache.plan("daily", "2024-03-01 06:00", "2024-03-05", now=NOW)
+        rows = self.cache.merge(plan, [day_rows(1), day_rows(5)])
+        self.assertEqual(rows, list(reversed(day_rows(1, 2, 3, 4, 5))))
+
+    def test_days_without_sales_are_covered(self):
+        plan = self.cache.plan("daily", "2024-03-02", "2024-03-05", now=NOW)
+        self.cache.merge(plan, [day_rows(3)])
+        plan = self.cache.plan("daily", "2024-03-02", "2024-03-05", now=NOW)
+        # 03-02, 03-04 борлуулалтгүй ч дахин асуухгүй, зөвхөн дутуу 03-05
+        self.assertEqual([query["params"] for query in plan["queries"]], [{"start_date": "2024-03-05", "end_date": "2024-03-05"}])
+        self.assertEqual(self.cache.merge(plan, [[]]), day_rows(3))
+
+    def test_invalidate_between_plan_and_merge_discards_result(self):
+        plan = self.cache.plan("daily", "2024-03-02", "2024-03-05", now=NOW)
+        self.assertEqual(self.cache.invalidate(), 0)
+        rows = self.cache.merge(plan, [day_rows(2, 3, 4)])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(self.cache.stats()["buckets"]["daily"], 0)
+        self.assertEqual(self.cache.stats()["coverage"]["daily"], [])
+
+    def test_invalidate_clears_buckets(self):
+        plan = self.cache.plan("daily", "2024-03-02", "2024-03-05", now=NOW)
+        self.cache.merge(plan, [day_rows(2, 3, 4)])
+        self.assertEqual(self.cache.invalidate(), 3)
+        plan = self.cache.plan("daily", "2024-03-02", "2024-03-05", now=NOW)
+        self.assertEqual(plan["cached"], [])
+        self.assertEqual(len(plan["queries"]), 1)
+
+    def test_returned_rows_do_not_share_cache(self):
+        plan = self.cache.plan("daily", "2024-03-02", "2024-03-05", now=NOW)
+        self.cache.merge(plan, [day_rows(2, 3, 4)])
+        plan = self.cache.plan("daily", "2024-03-02", "2024-03-05", now=NOW)
+        for row in self.cache.merge(plan, []):
+            row["total_sales"] = 0
+        plan = self.cache.plan("daily", "2024-03-02", "2024-03-05", now=NOW)
+        self.assertEqual(sorted(row["total_sales"] for row in plan["cached"]), [20, 30, 40])
+
+    def test_datetime_period_keys(self):
+        # DATE_TRUNC нь timestamp (заримдаа tz-тэй) буцаана
+        plan = self.cache.plan("monthly", "2024-01-01", "2024-03-01", now=NOW)
+        rows = [{"period": datetime(2024, 1, 1), "total_sales": 1}, {"period": datetime(2024, 2, 1), "total_sales": 2}]
+        self.cache.merge(plan, [rows])
+        self.assertEqual(self.cache.stats()["buckets"]["monthly"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,229 @@
+"""
+get_sales_by_time_period-ийн хаагдсан (өнгөрсөн) bucket-уудын cache
+
+Өнгөрсөн өдөр/долоо хоног/сарын нийлбэр өөрчлөгддөггүй тул нэг удаа тооцоод
+хугацаагүй хадгална. Хүсэлт бүрт зөвхөн одоогийн (нээлттэй) bucket, хүрээний
+захын дутуу bucket-ууд болон cache-д хараахан ороогүй хэсгийг database-ээс
+уншиж нийлүүлнэ. Хамгийн сүүлийн cache-гүй хэсэг нь нээлттэй bucket-тай залгаа
+бол нэг query болгоно.
+
+Bucket дууссанаас хойш TIMESERIES_CACHE_GRACE секунд өнгөрсний дараа л
+хаагдсанд тооцно (хоцорч орсон захиалгад зориулсан). Өнгөрсөн огноотой
+өгөгдлийг засвал invalidate() (эсвэл POST /api/cache/invalidate) дуудна.
+"""
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+load_dotenv()
+
+PERIODS = ("daily", "weekly", "monthly")
+ONE_US = timedelta(microseconds=1)
+# Доод хязгааргүй (start_date өгөөгүй)
+BEGINNING = datetime.min
+
+_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?$")
+
+Range = Tuple[datetime, datetime]
+
+
+def bucket_start(period: str, value: datetime) -> datetime:
+    """value-г агуулсан bucket-ийн эхлэл (DATE / DATE_TRUNC('week'|'month')-тэй адил)"""
+    day = datetime(value.year, value.month, value.day)
+    if period == "weekly":
+        return day - timedelta(days=day.weekday())
+    if period == "monthly":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(period: str, start: datetime) -> datetime:
+    if period == "weekly":
+        return start + timedelta(days=7)
+    if period == "monthly":
+        return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start + timedelta(days=1)
+
+
+def _bucket_ceil(period: str, value: datetime) -> datetime:
+    start = bucket_start(period, value)
+    return start if start == value else next_bucket(period, start)
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    if not isinstance(value, str) or not _TIMESTAMP.match(value):
+        raise ValueError(value)
+    return datetime.fromisoformat(value)
+
+
+def _format(value: datetime) -> str:
+    # Bucket-ийн хил үргэлж шөнө дунд тул энгийн огноо (rollup ч ашиглаж чадна)
+    return value.date().isoformat()
+
+
+def _key(row: Dict[str, Any]) -> datetime:
+    period = row["period"]
+    if isinstance(period, datetime):
+        return period.replace(tzinfo=None)
+    if isinstance(period, date):
+        return datetime(period.year, period.month, period.day)
+    return datetime.fromisoformat(str(period))
+
+
+class TimeSeriesCache:
+    """Хаагдсан bucket-ууд болон period бүрийн бүрэн мэдэгдэж буй (coverage) интервалууд"""
+
+    def __init__(self, grace: float = 86400.0, enabled: bool = True):
+        self.grace = grace
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # period -> {bucket эхлэл: мөр}
+        self._buckets: Dict[str, Dict[datetime, Dict[str, Any]]] = {p: {} for p in PERIODS}
+        # period -> эрэмбэлсэн, давхцалгүй [lo, hi) интервалууд (дотор нь мөргүй bucket = борлуулалтгүй)
+        self._coverage: Dict[str, List[Range]] = {p: [] for p in PERIODS}
+        self._generation = 0
+        self._stats = {"requests": 0, "bypassed": 0, "cached_buckets": 0, "stored_buckets": 0, "queries": 0}
+
+    def horizon(self, period: str, now: Optional[datetime] = None) -> datetime:
+        """Энэ хугацаанаас өмнө дууссан bucket-ууд хаагдсан"""
+        return bucket_start(period, (now or datetime.now()) - timedelta(seconds=self.grace))
+
+    def _missing(self, period: str, lo: datetime, hi: datetime) -> List[Range]:
+        gaps = []
+        cursor = lo
+        for covered_lo, covered_hi in self._coverage[period]:
+            if covered_hi <= cursor:
+                continue
+            if covered_lo >= hi:
+                break
+            if covered_lo > cursor:
+                gaps.append((cursor, covered_lo))
+            cursor = max(cursor, covered_hi)
+            if cursor >= hi:
+                break
+        if cursor < hi:
+            gaps.append((cursor, hi))
+        return gaps
+
+    def plan(self, period: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+             now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """Cache-ээс авах мөрүүд ба database-д явуулах query-нүүд. Cache ашиглах боломжгүй бол None.
+
+        query бүр нь build_sales_by_time_period-ийн (start_date, end_date, before) параметр болон
+        үр дүнгээс хадгалах [lo, hi) интервалтай.
+        """
+        if not self.enabled:
+            return None
+        period = period if period in PERIODS else "daily"
+        try:
+            start, end = _parse(start_date), _parse(end_date)
+        except ValueError:
+            return None
+        with self._lock:
+            self._stats["requests"] += 1
+            lo = BEGINNING if start is None else _bucket_ceil(period, start)
+            hi = self.horizon(period, now)
+            if end is not None:
+                hi = min(hi, bucket_start(period, end + ONE_US))
+            if lo >= hi:
+                self._stats["bypassed"] += 1
+                return None
+
+            # (эхлэл, төгсгөл (exclusive, None = хязгааргүй), хадгалах эсэх) дарааллаар
+            segments: List[Tuple[datetime, Optional[datetime], bool]] = []
+            if start is not None and start < lo:
+                segments.append((start, lo, False))
+            segments.extend((gap_lo, gap_hi, True) for gap_lo, gap_hi in self._missing(period, lo, hi))
+            if end is None or end + ONE_US > hi:
+                segments.append((hi, None if end is None else end + ONE_US, False))
+
+            queries = []
+            for seg_lo, seg_hi, store in segments:
+                previous = queries[-1] if queries else None
+                if previous is not None and previous["hi"] == seg_lo:
+                    previous["hi"] = seg_hi
+                else:
+                    previous = {"lo": seg_lo, "hi": seg_hi, "store": []}
+                    queries.append(previous)
+                if store:
+                    previous["store"].append((seg_lo, seg_hi))
+            for query in queries:
+                query_lo, query_hi = query.pop("lo"), query.pop("hi")
+                params = {}
+                if query_lo == start:
+                    params["start_date"] = start_date
+                elif query_lo > BEGINNING:
+                    params["start_date"] = _format(query_lo)
+                if end is not None and query_hi == end + ONE_US:
+                    params["end_date"] = end_date
+                elif query_hi is not None:
+                    params["before"] = _format(query_hi)
+                query["params"] = params
+
+            buckets = self._buckets[period]
+            # Хуулбар: дуудагч мөрийг өөрчилсөн ч cache өөрчлөгдөхгүй
+            cached = [dict(row) for key, row in buckets.items() if lo <= key < hi]
+            self._stats["cached_buckets"] += len(cached)
+            self._stats["queries"] += len(queries)
+            return {"period": period, "generation": self._generation, "cached": cached, "queries": queries}
+
+    def merge(self, plan: Dict[str, Any], results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Query-нүүдийн үр дүнгээс хаагдсан bucket-уудыг хадгалж, cache-тэй нийлүүлэх (period DESC)"""
+        period = plan["period"]
+        rows = list(plan["cached"])
+        with self._lock:
+            # Хооронд нь invalidate хийгдсэн бол хуучин үр дүнг хадгалахгүй
+            store = plan["generation"] == self._generation
+            for query, result in zip(plan["queries"], results):
+                rows.extend(result)
+                if not store:
+                    continue
+                for lo, hi in query["store"]:
+                    for row in result:
+                        key = _key(row)
+                        if lo <= key < hi:
+                            self._buckets[period][key] = dict(row)
+                            self._stats["stored_buckets"] += 1
+                    self._add_coverage(period, lo, hi)
+        rows.sort(key=_key, reverse=True)
+        return rows
+
+    def _add_coverage(self, period: str, lo: datetime, hi: datetime):
+        merged = []
+        for covered_lo, covered_hi in sorted(self._coverage[period] + [(lo, hi)]):
+            if merged and covered_lo <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], covered_hi))
+            else:
+                merged.append((covered_lo, covered_hi))
+        self._coverage[period] = merged
+
+    def invalidate(self) -> int:
+        """Бүх хадгалсан bucket-ийг устгах. Устгасан тоог буцаана."""
+        with self._lock:
+            removed = sum(len(buckets) for buckets in self._buckets.values())
+            self._buckets = {p: {} for p in PERIODS}
+            self._coverage = {p: [] for p in PERIODS}
+            self._generation += 1
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "grace_seconds": self.grace,
+                "buckets": {p: len(b) for p, b in self._buckets.items()},
+                "coverage": {p: [[_format(lo) if lo > BEGINNING else None, _format(hi)] for lo, hi in ranges]
+                             for p, ranges in self._coverage.items()},
+                **self._stats,
+            }
+
+
+# Global instance (Database, AsyncDatabase хоёулаа хуваалцана)
+timeseries_cache = TimeSeriesCache(
+    grace=float(os.getenv("TIMESERIES_CACHE_GRACE", "86400")),
+    enabled=os.getenv("TIMESERIES_CACHE_ENABLED", "1") != "0",
+)
@@ -0,0 +1,112 @@
+"""
+Асуултанд хариулах явцын үе шат бүрийн хугацааг хэмжих (trace)
+
+Идэвхтэй trace нь contextvars-аар дамждаг тул asyncio task болон
+asyncio.to_thread дотор ч tracing.stage(...) шууд ажиллана. Trace идэвхгүй
+үед stage/annotate юу ч хийхгүй.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+load_dotenv()
+
+# Энэ хугацаанаас (ms) удаан хариултын trace-ийг бүтнээр нь log-д бичнэ
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "3000"))
+# Хоосон бол stderr
+SLOW_REQUEST_LOG = os.getenv("SLOW_REQUEST_LOG") or None
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_log_lock = threading.Lock()
+
+
+class Trace:
+    """Нэг хариултын үе шатуудын хугацаа болон нэмэлт мэдээлэл"""
+
+    def __init__(self, name: str = "answer"):
+        self.name = name
+        self.started = time.perf_counter()
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.stages: List[Dict[str, Any]] = []
+        self.attributes: Dict[str, Any] = {}
+        self.total_ms: Optional[float] = None
+
+    def add(self, stage: str, duration_ms: float, **attributes):
+        self.stages.append({"stage": stage, "ms": round(duration_ms, 2), **attributes})
+
+    def finish(self) -> float:
+        if self.total_ms is None:
+            self.total_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        return self.total_ms
+
+    def server_timing(self) -> str:
+        """Server-Timing header-ийн утга (parse;dur=12.3, db;dur=45.6, ...)"""
+        entries = [f"{item['stage']};dur={item['ms']}" for item in self.stages]
+        entries.append(f"total;dur={self.finish()}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_ms": self.finish(),
+            "stages": self.stages,
+            **self.attributes,
+        }
+
+
+@contextmanager
+def activate(trace: Trace):
+    """trace-ийг идэвхтэй болгох (дотор нь дуудагдсан stage/annotate түүнд бичигдэнэ)"""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """Үе шатны хугацааг идэвхтэй trace-д бичих"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, (time.perf_counter() - started) * 1000, **attributes)
+
+
+def annotate(**attributes):
+    """Идэвхтэй trace-д мэдээлэл нэмэх (prompt-ын хэмжээ, intent гэх мэт)"""
+    trace = _current.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def log_if_slow(trace: Trace, threshold_ms: float = SLOW_REQUEST_MS):
+    """Хугацаа threshold-оос хэтэрвэл trace-ийг JSON мөрөөр log-д бичих"""
+    if trace.finish() < threshold_ms:
+        return
+    line = json.dumps({"slow_request": trace.to_dict()}, default=str, ensure_ascii=False)
+    with _log_lock:
+        if SLOW_REQUEST_LOG:
+            try:
+                with open(SLOW_REQUEST_LOG, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                return
+            except OSError as e:
+                print(f"⚠ Slow request log бичиж чадсангүй ({SLOW_REQUEST_LOG}): {e}", file=sys.stderr)
+        print(line, file=sys.stderr, flush=True)